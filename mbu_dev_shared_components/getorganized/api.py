@@ -1,7 +1,6 @@
 """This module contains functionality to authenticate and health check GetOrganized api."""
 
-import requests
-from mbu_dev_shared_components.getorganized.auth import get_ntlm_go_api_credentials
+from mbu_dev_shared_components.getorganized.client import get_client
 
 
 def health_check(api_endpoint: str, api_username: str, api_password: str) -> bool:
@@ -10,10 +9,9 @@ def health_check(api_endpoint: str, api_username: str, api_password: str) -> boo
     To be used before starting a processing that requires the GO API,
     such that errors caused by the API being down can be registered.
     """
-    response = requests.request(
+    response = get_client(api_username, api_password).request(
         method="GET",
         url=api_endpoint,
-        auth=get_ntlm_go_api_credentials(api_username, api_password),
         timeout=60,
     )
 
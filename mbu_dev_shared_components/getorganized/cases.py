@@ -1,7 +1,7 @@
 """This module has functions to do with case related calls
 to the GetOrganized api."""
 import requests
-from mbu_dev_shared_components.getorganized.auth import get_ntlm_go_api_credentials
+from mbu_dev_shared_components.getorganized.client import get_client
 
 
 def get_case_metadata(api_endpoint: str, api_username: str, api_password: str) -> requests.Response:
@@ -19,7 +19,7 @@ def get_case_metadata(api_endpoint: str, api_username: str, api_password: str) -
 
     headers = {"Content-Type": "application/json"}
 
-    response = requests.request(method='GET', url=api_endpoint, headers=headers, auth=get_ntlm_go_api_credentials(api_username, api_password), timeout=60)
+    response = get_client(api_username, api_password).request(method='GET', url=api_endpoint, headers=headers, timeout=60)
 
     return response
 
@@ -46,7 +46,7 @@ def open_case(case_id: str, api_endpoint: str, api_username: str, api_password:
     if reason:
         payload["Reason"] = reason
 
-    response = requests.request(method='POST', url=api_endpoint, headers=headers, json=payload, auth=get_ntlm_go_api_credentials(api_username, api_password), timeout=60)
+    response = get_client(api_username, api_password).request(method='POST', url=api_endpoint, headers=headers, json=payload, timeout=60)
 
     return response
 
@@ -68,7 +68,7 @@ def find_case_by_case_properties(case_data: str, api_endpoint: str, api_username
     requests.RequestException: If the HTTP request fails for any reason.
     """
     headers = {"Content-Type": "application/json"}
-    response = requests.request(method='POST', url=api_endpoint, headers=headers, json=case_data, auth=get_ntlm_go_api_credentials(api_username, api_password), timeout=60)
+    response = get_client(api_username, api_password).request(method='POST', url=api_endpoint, headers=headers, json=case_data, timeout=60)
 
     return response
 
@@ -90,7 +90,7 @@ def create_case_folder(case_data: str, api_endpoint: str, api_username: str, api
     requests.RequestException: If the HTTP request fails for any reason.
     """
     headers = {"Content-Type": "application/json"}
-    response = requests.request(method='POST', url=api_endpoint, headers=headers, json=case_data, auth=get_ntlm_go_api_credentials(api_username, api_password), timeout=60)
+    response = get_client(api_username, api_password).request(method='POST', url=api_endpoint, headers=headers, json=case_data, timeout=60)
 
     return response
 
@@ -112,6 +112,6 @@ def create_case(case_data: str, api_endpoint: str, api_username: str, api_passwo
     requests.RequestException: If the HTTP request fails for any reason.
     """
     headers = {"Content-Type": "application/json"}
-    response = requests.request(method='POST', url=api_endpoint, headers=headers, json=case_data, auth=get_ntlm_go_api_credentials(api_username, api_password), timeout=60)
+    response = get_client(api_username, api_password).request(method='POST', url=api_endpoint, headers=headers, json=case_data, timeout=60)
 
     return response
@@ -0,0 +1,164 @@
+"""This module contains the GetOrganizedClient, which reuses connections to the GetOrganized api.
+
+NTLM authenticates a connection rather than a request: the first request on a new
+connection is answered with 401, and the handshake takes two more round trips on
+the same connection. A client keeps its connections open in requests.Sessions, so
+the handshake is only done once per connection instead of once per call.
+
+requests_ntlm returns the connection to its pool between the legs of a handshake
+and takes it back for the next leg, so a connection pool must not be shared by
+calls running at the same time: another call could take the connection in
+between, and the next leg would be sent on a connection without the handshake.
+The client therefore hands each call a session of its own, with a single
+connection per host, and keeps the idle sessions for reuse.
+
+The functions in cases, contacts, documents and api use a client shared by all
+calls with the same credentials:
+
+    client = get_client(api_username, api_password)
+    response = client.request("GET", api_endpoint)
+"""
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from mbu_dev_shared_components.getorganized.auth import get_ntlm_go_api_credentials
+
+DEFAULT_TIMEOUT = 60
+
+
+class GetOrganizedClient:
+    """
+    A client for the GetOrganized api, keeping NTLM authenticated connections open between calls.
+
+    The client can be used from several threads; each call takes a session of its own, and with it its own connection.
+    """
+
+    def __init__(self, api_username: str, api_password: str, pool_maxsize: int = 10, timeout: float = DEFAULT_TIMEOUT):
+        """
+        Parameters:
+        api_username (str): The API username for GetOrganized API.
+        api_password (str): The API password for GetOrganized API.
+        pool_maxsize (int): Maximum number of idle sessions kept for reuse, i.e. of calls running at the same time
+            without opening and authenticating new connections.
+        timeout (float): Timeout in seconds of requests that do not set one.
+        """
+        self.api_username = api_username
+        self._api_password = api_password
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self._idle: List[requests.Session] = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        session.auth = get_ntlm_go_api_credentials(self.api_username, self._api_password)
+        # A session is used by one call at a time, so one connection per host is enough
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=1)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    @contextmanager
+    def session(self) -> Iterator[requests.Session]:
+        """
+        Context manager taking a session for the exclusive use of the caller, and returning it to the client on exit.
+
+        Use it to send several requests on the same connection, e.g. to authenticate it before a large body is sent.
+        Responses requested with stream=True must be read or closed before the block ends, as the connection is then used by other calls.
+
+        Yields:
+        requests.Session: The session, with NTLM authentication.
+        """
+        with self._lock:
+            session = self._idle.pop() if self._idle else None
+        if session is None:
+            session = self._new_session()
+        try:
+            yield session
+        finally:
+            with self._lock:
+                if len(self._idle) < self.pool_maxsize:
+                    self._idle.append(session)
+                    session = None
+            if session is not None:
+                session.close()
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a request on a pooled connection.
+
+        Parameters:
+        method (str): The HTTP method, e.g. 'GET' or 'POST'.
+        url (str): GetOrganized API endpoint.
+        **kwargs: Arguments of requests.Session.request, e.g. headers, json or data.
+
+        Returns:
+        requests.Response: The response object from the API.
+
+        Raises:
+        requests.RequestException: If the HTTP request fails for any reason.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        with self.session() as session:
+            return session.request(method=method, url=url, **kwargs)
+
+    def authenticate(self, session: requests.Session, url: str) -> None:
+        """
+        Sends a HEAD request, so the connection of a session is authenticated before a large body is sent.
+
+        Without it, a large body sent on a new connection is sent three times, once per leg of the
+        NTLM handshake. The status of the response does not matter, only that it is past authentication.
+
+        Parameters:
+        session (requests.Session): A session from the session context manager.
+        url (str): A GetOrganized API endpoint.
+        """
+        session.request("HEAD", url, timeout=self.timeout).close()
+
+    def close(self) -> None:
+        """Closes the open connections of the idle sessions. The client reconnects if it is used again."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            session.close()
+
+
+_SHARED_CLIENTS: Dict[Tuple[str, str], GetOrganizedClient] = {}
+_SHARED_CLIENTS_LOCK = threading.Lock()
+
+
+def get_client(api_username: str, api_password: str) -> GetOrganizedClient:
+    """
+    Returns the process-wide client for the credentials, creating it on first use.
+
+    Parameters:
+    api_username (str): The API username for GetOrganized API.
+    api_password (str): The API password for GetOrganized API.
+
+    Returns:
+    GetOrganizedClient: The shared client.
+    """
+    key = (api_username, api_password)
+    with _SHARED_CLIENTS_LOCK:
+        client = _SHARED_CLIENTS.get(key)
+        if client is None:
+            client = _SHARED_CLIENTS[key] = GetOrganizedClient(api_username, api_password)
+        return client
+
+
+def close_clients() -> None:
+    """Closes the connections of all shared clients, e.g. at the end of a robot run."""
+    with _SHARED_CLIENTS_LOCK:
+        clients = list(_SHARED_CLIENTS.values())
+    for client in clients:
+        client.close()
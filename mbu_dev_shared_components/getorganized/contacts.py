@@ -1,7 +1,7 @@
 """This module has functions to do with contact related calls
 to the GetOrganized api."""
 import requests
-from mbu_dev_shared_components.getorganized.auth import get_ntlm_go_api_credentials
+from mbu_dev_shared_components.getorganized.client import get_client
 
 
 def contact_lookup(person_ssn: str, api_endpoint: str, api_username: str, api_password: str) -> requests.Response:
@@ -27,6 +27,6 @@ def contact_lookup(person_ssn: str, api_endpoint: str, api_username: str, api_pa
     headers = {"Content-Type": "application/x-www-form-urlencoded"}
     body = {"Id": person_ssn, "ContactDataFieldName": "CCMContactData"}
     encoded_body = '&'.join([f"{key}={value}" for key, value in body.items()])
-    response = requests.request(method='POST', url=api_endpoint, headers=headers, data=encoded_body, auth=get_ntlm_go_api_credentials(api_username, api_password), timeout=60)
+    response = get_client(api_username, api_password).request(method='POST', url=api_endpoint, headers=headers, data=encoded_body, timeout=60)
 
     return response
@@ -1,6 +1,16 @@
-"""This module..."""
+"""This module has functions to do with document related calls
+to the GetOrganized api."""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence
+
 import requests
-from mbu_dev_shared_components.getorganized.auth import get_ntlm_go_api_credentials
+from mbu_dev_shared_components.getorganized.client import get_client
+from mbu_dev_shared_components.getorganized.upload_stream import DocumentUploadStream, ProgressCallback
+
+# Status codes of responses worth retrying: the server was busy or failed, not the request
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
 
 
 def get_document_metadata(api_endpoint: str, api_username: str, api_password: str) -> requests.Response:
@@ -18,7 +28,7 @@ def get_document_metadata(api_endpoint: str, api_username: str, api_password: st
 
     headers = {"Content-Type": "application/json"}
 
-    response = requests.request(method='GET', url=api_endpoint, headers=headers, auth=get_ntlm_go_api_credentials(api_username, api_password), timeout=60)
+    response = get_client(api_username, api_password).request(method='GET', url=api_endpoint, headers=headers, timeout=60)
 
     return response
 
@@ -41,11 +51,202 @@ def upload_file_to_case(file_data: str, api_endpoint: str, api_username: str, ap
     requests.RequestException: If the HTTP request fails for any reason.
     """
     headers = {'Content-Type': 'application/json'}
-    response = requests.request(method='POST', url=api_endpoint, headers=headers, json=file_data, auth=get_ntlm_go_api_credentials(api_username, api_password), timeout=60)
+    response = get_client(api_username, api_password).request(method='POST', url=api_endpoint, headers=headers, json=file_data, timeout=60)
+
+    return response
+
+
+def upload_large_file_to_case(file_path: str, case_id: str, list_name: str, folder_path: str, filename: str, metadata: str,
+                              overwrite: bool, api_endpoint: str, api_username: str, api_password: str,
+                              progress: Optional[ProgressCallback] = None, timeout: float = 600) -> requests.Response:
+    """
+    Uploads a file to a case like upload_file_to_case, streaming the payload from the file on disk.
+
+    The file is read and base64 encoded one block at a time while it is sent, see
+    upload_stream.DocumentUploadStream, so the file is never held in memory, whatever its size.
+    The connection is authenticated first, so the file is sent only once.
+
+    Parameters:
+    file_path (str): Path of the file to upload.
+    case_id (str): The unique identifier of the case to which the document is related.
+    list_name (str): The name of the list within the case where the document is stored.
+    folder_path (str): The directory path where the document is located on the case.
+    filename (str): The name of the file including its extension.
+    metadata (str): XML-formatted string containing metadata associated with the document.
+    overwrite (bool): A flag indicating whether the existing file should be overwritten if it exists.
+    api_endpoint (str): GetOrganized API endpoint.
+    api_username (str): The API username for GetOrganized API.
+    api_password (str): The API password for GetOrganized API.
+    progress (Callable, optional): Called with the number of bytes sent and the size of the payload.
+    timeout (float): Timeout in seconds of each read and write of the request.
+
+    Returns:
+    requests.Response: The response object from the API.
+
+    Raises:
+    requests.RequestException: If the HTTP request fails for any reason.
+    """
+    client = get_client(api_username, api_password)
+    headers = {'Content-Type': 'application/json'}
+
+    with client.session() as session, \
+            DocumentUploadStream(file_path, case_id, list_name, folder_path, filename, metadata, overwrite, progress) as body:
+        client.authenticate(session, api_endpoint)
+        response = session.request(method='POST', url=api_endpoint, headers=headers, data=body, timeout=timeout)
 
     return response
 
 
+@dataclass
+class UploadResult:
+    """
+    The outcome of one upload of upload_files_to_case.
+
+    Attributes:
+    index (int): Position of the file in the files given to upload_files_to_case.
+    response (requests.Response, optional): The response of the last attempt, if any was received.
+    error (BaseException, optional): The error of the last attempt, if it did not get a response,
+        or the error that stopped the upload, e.g. a payload that can not be serialized.
+    attempts (int): Number of attempts made.
+    """
+    index: int
+    response: Optional[requests.Response] = None
+    error: Optional[BaseException] = None
+    attempts: int = 0
+
+    @property
+    def ok(self) -> bool:
+        """Whether the file was uploaded, i.e. GetOrganized accepted it and returned its DocumentId."""
+        return self.document_id is not None
+
+    @property
+    def document_id(self) -> Optional[int]:
+        """The DocumentId GetOrganized returned for the file, or None if it was not uploaded or the response has none."""
+        if self.error is not None or self.response is None or not self.response.ok:
+            return None
+        try:
+            payload = self.response.json()
+        except ValueError:
+            return None
+        return payload.get("DocumentId") if isinstance(payload, dict) else None
+
+
+@dataclass
+class BulkUploadResult:
+    """
+    The outcome of upload_files_to_case.
+
+    Attributes:
+    uploads (list): An UploadResult per file, in the order of the files.
+    case_record_response (requests.Response, optional): The response of marking the documents as case records.
+    finalize_response (requests.Response, optional): The response of finalizing the documents.
+    follow_up_error (BaseException, optional): The error that stopped marking or finalizing the documents.
+    """
+    uploads: List[UploadResult] = field(default_factory=list)
+    case_record_response: Optional[requests.Response] = None
+    finalize_response: Optional[requests.Response] = None
+    follow_up_error: Optional[BaseException] = None
+
+    @property
+    def document_ids(self) -> List[int]:
+        """The DocumentIds of the uploaded files, in the order of the files."""
+        document_ids = (upload.document_id for upload in self.uploads)
+        return [document_id for document_id in document_ids if document_id is not None]
+
+    @property
+    def failed(self) -> List[UploadResult]:
+        """The uploads that failed after all attempts."""
+        return [upload for upload in self.uploads if not upload.ok]
+
+
+def _upload_with_retry(index: int, file_data: dict, api_endpoint: str, api_username: str, api_password: str,
+                       max_attempts: int, backoff: float) -> UploadResult:
+    result = UploadResult(index=index)
+    while result.attempts < max_attempts:
+        if result.attempts:
+            time.sleep(backoff * 2 ** (result.attempts - 1))
+        result.attempts += 1
+        try:
+            result.response = upload_file_to_case(file_data, api_endpoint, api_username, api_password)
+            result.error = None
+        except (requests.ConnectionError, requests.Timeout) as e:
+            result.response, result.error = None, e
+            continue
+        except Exception as e:  # pylint: disable=broad-except
+            # Not worth retrying, e.g. a payload that can not be serialized; reported so the other uploads are kept
+            result.response, result.error = None, e
+            break
+        if result.response.status_code not in RETRY_STATUS_CODES:
+            break
+    return result
+
+
+def upload_files_to_case(
+    files_data: Sequence[dict],
+    api_endpoint: str,
+    api_username: str,
+    api_password: str,
+    max_workers: int = 4,
+    max_attempts: int = 3,
+    backoff: float = 1.0,
+    case_record_endpoint: Optional[str] = None,
+    finalize_endpoint: Optional[str] = None,
+) -> BulkUploadResult:
+    """
+    Uploads many files to cases concurrently, then marks all of them as case records and finalizes them
+    in one call each.
+
+    The files are uploaded by a bounded pool of threads over the connections of the shared client.
+    An upload that fails with a connection error, a timeout or a status in RETRY_STATUS_CODES is retried
+    with exponential backoff. Other failures, e.g. 400 for an invalid payload or a payload that can not be
+    serialized, are not retried, and are reported in the file's UploadResult instead of raised.
+    A retried upload can add the file twice if the failed attempt reached GetOrganized, unless the
+    payload sets Overwrite.
+
+    Parameters:
+    files_data (Sequence[dict]): The payloads of the files, e.g. from DocumentJsonCreator.document_data_json.
+    api_endpoint (str): GetOrganized API endpoint of upload_file_to_case.
+    api_username (str): The API username for GetOrganized API.
+    api_password (str): The API password for GetOrganized API.
+    max_workers (int): Maximum number of uploads running at the same time. Above the pool size of the
+        shared client (10), the extra connections are authenticated for one upload and closed.
+    max_attempts (int): Maximum number of attempts per file.
+    backoff (float): Seconds to wait before the second attempt, doubled for every further attempt.
+    case_record_endpoint (str, optional): GetOrganized API endpoint of mark_file_as_case_record.
+        When given, the uploaded documents are marked as case records.
+    finalize_endpoint (str, optional): GetOrganized API endpoint of finalize_file.
+        When given, the uploaded documents are finalized, after they are marked as case records.
+
+    Returns:
+    BulkUploadResult: The result of each upload and of the follow-up calls. Errors of the follow-up
+        calls are stored in follow_up_error, so the DocumentIds of the uploaded files are never lost.
+    """
+    if max_attempts < 1:
+        raise ValueError("max_attempts must be at least 1.")
+
+    result = BulkUploadResult()
+    if not files_data:
+        return result
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(files_data)), thread_name_prefix="go-upload") as executor:
+        result.uploads = list(executor.map(
+            lambda indexed: _upload_with_retry(indexed[0], indexed[1], api_endpoint, api_username, api_password, max_attempts, backoff),
+            enumerate(files_data),
+        ))
+
+    document_ids = result.document_ids
+    if document_ids:
+        try:
+            if case_record_endpoint:
+                result.case_record_response = mark_file_as_case_record(document_ids, case_record_endpoint, api_username, api_password)
+            if finalize_endpoint:
+                result.finalize_response = finalize_file(document_ids, finalize_endpoint, api_username, api_password)
+        except requests.RequestException as e:
+            result.follow_up_error = e
+
+    return result
+
+
 def mark_file_as_case_record(documents_id: list, api_endpoint: str, api_username: str, api_password: str) -> requests.Response:
     """
     Marks one or more documents by their IDs as case records in the system via a POST request to a specific API endpoint.
@@ -67,7 +268,7 @@ def mark_file_as_case_record(documents_id: list, api_endpoint: str, api_username
     headers = {'Content-Type': 'application/json'}
     payload = {"DocumentIds": documents_id}
 
-    response = requests.request(method='POST', url=api_endpoint, headers=headers, json=payload, auth=get_ntlm_go_api_credentials(api_username, api_password), timeout=60)
+    response = get_client(api_username, api_password).request(method='POST', url=api_endpoint, headers=headers, json=payload, timeout=60)
     response.raise_for_status()
 
     return response
@@ -97,7 +298,7 @@ def finalize_file(documents_id: list, api_endpoint: str, api_username: str, api_
         "ShouldCloseOpenTasks": False
     }
 
-    response = requests.request(method='POST', url=api_endpoint, headers=headers, json=payload, auth=get_ntlm_go_api_credentials(api_username, api_password), timeout=60)
+    response = get_client(api_username, api_password).request(method='POST', url=api_endpoint, headers=headers, json=payload, timeout=60)
     response.raise_for_status()
 
     return response
@@ -129,7 +330,7 @@ def search_documents(search_term: str, api_endpoint: str, api_username: str, api
 
     headers = {'Content-Type': 'application/json'}
 
-    response = requests.request(method='POST', url=api_endpoint, headers=headers, json=payload, auth=get_ntlm_go_api_credentials(api_username, api_password), timeout=60)
+    response = get_client(api_username, api_password).request(method='POST', url=api_endpoint, headers=headers, json=payload, timeout=60)
 
     return response
 
@@ -189,6 +390,6 @@ def modern_search(page_index, search_term: str, start_date, end_date, only_items
 
     headers = {'Content-Type': 'application/json'}
 
-    response = requests.request(method='POST', url=api_endpoint, headers=headers, json=payload, auth=get_ntlm_go_api_credentials(api_username, api_password), timeout=60)
+    response = get_client(api_username, api_password).request(method='POST', url=api_endpoint, headers=headers, json=payload, timeout=60)
 
     return response
@@ -0,0 +1,126 @@
+"""This module contains DocumentUploadStream, a request body streaming a file to the GetOrganized api.
+
+The JSON payload of DocumentJsonCreator.document_data_json holds the whole file in memory, and
+is serialized again by requests. DocumentUploadStream produces the same payload with the file
+content in "Bytes" as a base64 string, the JSON form of a .NET byte array, and reads and
+encodes the file one block at a time while the request is sent. The payload is never held
+in memory, and its length is known up front, so it is sent with a Content-Length header.
+
+The stream is seekable, so it can be sent again, e.g. when the NTLM handshake of a new
+connection makes requests_ntlm resend the body. requests_ntlm rewinds the body only
+before the first of the two requests it resends, so the stream also rewinds itself once
+its end has been read: an empty read signals the end of the payload to the sender, and
+the next read starts the payload over.
+"""
+import base64
+import json
+import os
+from typing import Callable, Iterator, Optional
+
+ProgressCallback = Callable[[int, int], None]
+
+# Multiple of 3, so every block is encoded without padding
+_BLOCK_SIZE = 3 * 64 * 1024
+
+
+class DocumentUploadStream:
+    """
+    A read-only, seekable file-like object with the JSON payload of a document uploaded from a file.
+
+    Use it as a context manager, or close it after the upload.
+    """
+
+    def __init__(self, file_path: str, case_id: str, list_name: str, folder_path: str, filename: str, metadata: str,
+                 overwrite: bool, progress: Optional[ProgressCallback] = None):
+        """
+        Parameters:
+        file_path (str): Path of the file to upload.
+        case_id (str): The unique identifier of the case to which the document is related.
+        list_name (str): The name of the list within the case where the document is stored.
+        folder_path (str): The directory path where the document is located on the case.
+        filename (str): The name of the file including its extension.
+        metadata (str): XML-formatted string containing metadata associated with the document.
+        overwrite (bool): A flag indicating whether the existing file should be overwritten if it exists.
+        progress (Callable, optional): Called with the number of payload bytes read and the payload's
+            length whenever the payload is read. Goes back to 0 when the payload is sent again.
+        """
+        fields = {
+            "CaseId": case_id,
+            "ListName": list_name,
+            "FolderPath": folder_path,
+            "FileName": filename,
+            "Metadata": metadata,
+            "Overwrite": overwrite,
+        }
+        self._prefix = (json.dumps(fields)[:-1] + ', "Bytes": "').encode()
+        self._suffix = b'"}'
+        self._file = open(file_path, "rb")  # pylint: disable=consider-using-with
+        self._encoded_size = 4 * ((os.fstat(self._file.fileno()).st_size + 2) // 3)
+        self._length = len(self._prefix) + self._encoded_size + len(self._suffix)
+        self._position = 0
+        self._progress = progress
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(lambda: self.read(_BLOCK_SIZE), b"")
+
+    def close(self) -> None:
+        """Closes the file."""
+        self._file.close()
+
+    def tell(self) -> int:
+        """Returns the position in the payload."""
+        return self._position
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        """Moves to a position in the payload, relative to the start, the current position or the end."""
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._position, os.SEEK_END: self._length}[whence]
+        self._position = min(max(base + offset, 0), self._length)
+        return self._position
+
+    def _read_encoded(self, start: int, size: int) -> bytes:
+        """Reads size base64 characters from position start of the encoded file."""
+        first_group = start // 4
+        groups = (start + size + 3) // 4 - first_group
+        self._file.seek(3 * first_group)
+        encoded = base64.b64encode(self._file.read(3 * groups))
+        offset = start - 4 * first_group
+        return encoded[offset:offset + size]
+
+    def read(self, size: int = -1) -> bytes:
+        """Reads up to size bytes of the payload, or the rest of it when size is negative."""
+        if size is None or size < 0:
+            size = self._length - self._position
+        if size and self._position >= self._length:
+            # The end was read by the previous call; rewind for a resend
+            self._position = 0
+            return b""
+        parts = []
+        end = min(self._position + size, self._length)
+        encoded_start = len(self._prefix)
+        suffix_start = encoded_start + self._encoded_size
+
+        while self._position < end:
+            if self._position < encoded_start:
+                part = self._prefix[self._position:min(end, encoded_start)]
+            elif self._position < suffix_start:
+                start = self._position - encoded_start
+                part = self._read_encoded(start, min(end, suffix_start) - self._position)
+                if not part:
+                    raise OSError("The file was truncated while it was uploaded.")
+            else:
+                part = self._suffix[self._position - suffix_start:end - suffix_start]
+            parts.append(part)
+            self._position += len(part)
+
+        if self._progress is not None and parts:
+            self._progress(self._position, self._length)
+        return b"".join(parts)
@@ -5,18 +5,63 @@ which handles database operations related to the Romexis system.
 
 import pyodbc
 
+from mbu_dev_shared_components.romexis.queries import image_metadata_query, latest_gamma_query, persons_query
+from mbu_dev_shared_components.utils.async_query_runner import AsyncQueryRunner
+from mbu_dev_shared_components.utils.connection_pool import ConnectionPool, shared_pool
+from mbu_dev_shared_components.utils.query_builder import MAX_QUERY_PARAMETERS, chunks
+
+
+def _match_key(external_id) -> str:
+    """The form in which SQL Server compares external ids: case-insensitive, without trailing spaces."""
+    return str(external_id).rstrip(" ").casefold()
+
 
 class RomexisDbHandler:
     """Handles database operations related to the Romexis system."""
 
-    def __init__(self, conn_str: str):
+    def __init__(self, conn_str: str, pool: ConnectionPool = None):
         """
         Initializes the database instance.
 
+        Connections are taken from a pool and reused between queries. By default the
+        pool is shared by all handlers with the same connection string.
+
+        Example:
+            with RomexisDbHandler(conn_str) as romexis:
+                images = romexis.get_image_metadata_bulk(cprs)
+
         Args:
             conn_str (str): Connection string to the database.
+            pool (ConnectionPool, optional): Pool to take connections from instead of the shared pool.
         """
         self.connection_string = conn_str
+        self.pool = pool if pool is not None else shared_pool(conn_str, lambda: pyodbc.connect(conn_str))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        """
+        Closes the idle connections of the handler's pool.
+
+        The handler can still be used afterwards and reconnects when needed.
+        """
+        self.pool.close()
+
+    def as_async(self, max_concurrency: int = 4) -> AsyncQueryRunner:
+        """
+        Returns an asyncio-facing wrapper, where every public method of this instance is a coroutine.
+
+        Args:
+            max_concurrency (int): Maximum number of queries running against the Romexis database at the same time.
+
+        Returns:
+            AsyncQueryRunner: The async wrapper around this instance.
+        """
+        return AsyncQueryRunner(self, max_concurrency=max_concurrency)
 
     def _execute_query(self, query: str, params: tuple):
         """
@@ -29,11 +74,14 @@ class RomexisDbHandler:
         Returns:
             list: A list of dictionaries, where each dictionary represents a row from the query result.
         """
-        conn = pyodbc.connect(self.connection_string)
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        columns = [column[0] for column in cursor.description]
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+                columns = [column[0] for column in cursor.description]
+            finally:
+                cursor.close()
 
         result = [dict(zip(columns, row)) for row in rows]
 
@@ -144,46 +192,58 @@ class RomexisDbHandler:
         Returns:
             list: A list of dictionaries, where each dictionary represents a gamma.
         """
-        query = """
-            WITH ImageList AS (
-            SELECT image_id
-            FROM [Romexis_db].[dbo].[RIM_Image_Info]
-            WHERE image_id = ?
-            ),
-            RankedOps AS (
-            SELECT
-                imo.*,
-                ROW_NUMBER() OVER (
-                PARTITION BY imo.image_id
-                ORDER BY 
-                    imo.updated_date DESC,
-                    imo.updated_time DESC
-                ) AS rn
-            FROM [Romexis_db].[dbo].[RIM_Image_Operation] imo
-            JOIN ImageList ii
-                ON ii.image_id = imo.image_id
-            WHERE imo.status = 1
-            )
-            SELECT
-                imop.operation_id,
-                imop.param_type,
-                imop.param_value AS gamma_value,
-                imop.local_change_id,
-                imop.master_change_id,
-                imop.original_local_id,
-                ro.image_id,
-                imi.image_date,
-                imi.image_time,
-                ro.updated_date,
-                ro.updated_time
-            FROM [Romexis_db].[dbo].[RIM_Image_Op_Param] imop
-            JOIN RankedOps ro
-            ON ro.operation_id = imop.operation_id
-            AND ro.rn = 1
-            JOIN [Romexis_db].[dbo].[RIM_Image_Info] imi
-            ON imi.image_id = ro.image_id
-            WHERE imop.param_type = 3
-            ORDER BY imi.image_date, imi.image_time;
-        """
-
-        return self._execute_query(query, (image_id,))
+        return self._execute_query(latest_gamma_query(1), (image_id,))
+
+    def get_gamma_data_bulk(self, image_ids: list) -> dict:
+        """
+        Gets the latest gamma data of many images, with one query per chunk of image ids.
+
+        Args:
+            image_ids (list): The image ids.
+
+        Returns:
+            dict: A dictionary of image id to the gamma row as returned by get_gamma_data,
+                or None for images without a gamma operation.
+        """
+        result = dict.fromkeys(image_ids)
+
+        for chunk in chunks(result, MAX_QUERY_PARAMETERS):
+            for row in self._execute_query(latest_gamma_query(len(chunk)), tuple(chunk)):
+                result[row["image_id"]] = row
+
+        return result
+
+    def get_image_metadata_bulk(self, external_ids: list) -> dict:
+        """
+        Gets person, image and gamma data for many patients at once.
+
+        Replaces get_person_data, get_image_ids, get_image_data and get_gamma_data per
+        patient and image with two set-based queries per chunk of external ids.
+
+        Args:
+            external_ids (list): The external ids (CPR numbers) of the patients.
+
+        Returns:
+            dict: A dictionary of the given external ids to a dictionary with:
+                person: the person as returned by get_person_data, or None when there is none.
+                images: the images as returned by get_image_data, ordered by image date and time,
+                    each with the gamma_value of its latest gamma operation, or None.
+                The database compares ids case-insensitively and without trailing spaces, so
+                the rows are matched to the given ids the same way, not by the ids in the rows.
+        """
+        result = {external_id: {"person": None, "images": []} for external_id in dict.fromkeys(external_ids)}
+        # Ids the database considers equal are queried once, and their rows given to each of them
+        matches = {}
+        for external_id in result:
+            matches.setdefault(_match_key(external_id), []).append(external_id)
+
+        for chunk in chunks([ids[0] for ids in matches.values()], MAX_QUERY_PARAMETERS):
+            for person in self._execute_query(persons_query(len(chunk)), tuple(chunk)):
+                for external_id in matches[_match_key(person["external_id"])]:
+                    if result[external_id]["person"] is None:
+                        result[external_id]["person"] = person
+            for image in self._execute_query(image_metadata_query(len(chunk)), tuple(chunk)):
+                for external_id in matches[_match_key(image["external_id"])]:
+                    result[external_id]["images"].append(image)
+
+        return result
@@ -0,0 +1,155 @@
+"""
+On-disk cache of decoded Romexis images.
+
+Decoding a RAW image with rawpy is the most expensive step of an export, and
+the same image is often exported again, e.g. when a case is re-sent. The cache
+stores the decoded array as a .npy file named by a hash of the source file's
+content and the decode parameters, so a changed file or different parameters
+never return a stale image, and a hit does not depend on where the file is.
+
+Cached arrays are returned memory-mapped and read-only, so a hit reads only the
+pages that are used, once, into the label bar canvas. The cache is bounded in
+size: after each write, the least recently used files are removed until the
+cache fits in max_bytes. Use is tracked by file modification time, which is
+updated on every hit, since access times are often not recorded.
+
+Several processes can share a cache folder: files are written under a temporary
+name and renamed into place, and files that another process removed or still
+has mapped are skipped.
+
+Example:
+    cache = DecodeCache(r"C:\\temp\\romexis_decode_cache", max_bytes=20 * 1024 ** 3)
+    add_black_bar_and_text_to_image(..., decode_cache=cache)
+"""
+import hashlib
+import os
+import tempfile
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Part of every key. Increase it when decode_image changes the pixels it returns.
+DECODE_VERSION = 1
+
+DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+
+_READ_SIZE = 1024 * 1024
+
+
+class DecodeCache:
+    """
+    A size-bounded cache of decoded images in a folder.
+
+    Attributes:
+        cache_dir (str): The folder of the cached arrays. Created if it does not exist.
+        max_bytes (int): The maximum total size of the cached arrays.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        if max_bytes < 0:
+            raise ValueError("max_bytes can not be negative.")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(source_path: str, image_type: int, gamma_value: float, bit_depth: int = 8) -> str:
+        """
+        Returns the cache key of a decoded image.
+
+        Args:
+            source_path (str): Path to the image. Its content is hashed, not its path.
+            image_type (int): The Romexis image type.
+            gamma_value (float): The gamma of the image.
+            bit_depth (int): The bit depth it is decoded to.
+
+        Returns:
+            str: The key, a hexadecimal SHA-256 digest.
+        """
+        digest = hashlib.sha256()
+        with open(source_path, "rb") as file:
+            for block in iter(lambda: file.read(_READ_SIZE), b""):
+                digest.update(block)
+        digest.update(f"|v{DECODE_VERSION}|t{image_type}|g{gamma_value!r}|b{bit_depth}".encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".npy")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Returns a cached array, memory-mapped read-only, or None when it is not cached.
+
+        Args:
+            key (str): The key from DecodeCache.key.
+
+        Returns:
+            np.ndarray: The array, or None.
+        """
+        path = self._path(key)
+        try:
+            os.utime(path)
+            return np.load(path, mmap_mode="r")
+        except (FileNotFoundError, ValueError):
+            # ValueError: a file that is not a complete .npy file
+            return None
+
+    def put(self, key: str, array: np.ndarray) -> None:
+        """
+        Stores an array, then removes the least recently used arrays while the cache is too large.
+
+        Args:
+            key (str): The key from DecodeCache.key.
+            array (np.ndarray): The decoded image.
+        """
+        descriptor, temp_path = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                np.save(file, array, allow_pickle=False)
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self.evict()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        with os.scandir(self.cache_dir) as scanned:
+            for entry in scanned:
+                if not entry.name.endswith(".npy"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    @property
+    def size(self) -> int:
+        """The total size of the cached arrays in bytes."""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> None:
+        """Removes the least recently used arrays until the cache fits in max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except PermissionError:
+                # Still memory-mapped by a process on Windows; removed by a later eviction
+                continue
+            total -= size
+
+    def clear(self) -> None:
+        """Removes every cached array."""
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except (FileNotFoundError, PermissionError):
+                pass
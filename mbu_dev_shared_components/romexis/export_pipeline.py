@@ -0,0 +1,163 @@
+"""
+Parallel export of Romexis images with add_black_bar_and_text_to_image.
+
+Decoding, annotating and encoding an image is CPU-bound, so the images are
+processed on a pool of worker processes. At most max_in_flight images are
+submitted at a time, which bounds the memory used by decoded images. The
+results are returned in the order of the jobs, and an image that fails is
+reported in its result instead of stopping the export. When a worker process
+dies, e.g. because it ran out of memory, the images in the pool at the time fail
+with BrokenProcessPool, and the remaining images are exported on a new pool.
+
+On Windows the worker processes import the calling script, so call
+export_images from under an if __name__ == "__main__": guard.
+
+Example:
+    jobs = [
+        ImageExportJob(image["file_path"], out_dir, cpr, name, image["image_date"],
+                       image["image_type"], image["gamma_value"], image["rotation_angle"], image["is_mirrored"])
+        for image in images
+    ]
+    results = export_images(jobs, progress=lambda done, total, result: print(f"{done}/{total}"))
+    failed = [result for result in results if not result.ok]
+"""
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+from mbu_dev_shared_components.romexis.decode_cache import DecodeCache
+from mbu_dev_shared_components.romexis.export_profiles import ExportProfile
+from mbu_dev_shared_components.romexis.helper_functions import add_black_bar_and_text_to_image
+
+
+@dataclass
+class ImageExportJob:
+    """The arguments of add_black_bar_and_text_to_image for one image."""
+    source_path: str
+    destination_path: str
+    patient_id: str
+    patient_name: str
+    optaget_dato: str
+    image_type: int
+    gamma_value: float
+    rotation_angle: int = 0
+    is_mirror: bool = False
+    keep_raw: bool = False
+    profile: Optional[Union[str, ExportProfile]] = None
+    decode_cache: Optional[DecodeCache] = None
+
+
+@dataclass
+class ImageExportResult:
+    """The outcome of one job: the path of the exported image, or the error that stopped it."""
+    index: int
+    job: ImageExportJob
+    output_path: Optional[str] = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the image was exported."""
+        return self.error is None
+
+
+ProgressCallback = Callable[[int, int, ImageExportResult], None]
+
+
+def run_export_job(job: ImageExportJob, timings: Optional[Dict[str, float]] = None) -> str:
+    """
+    Exports one image in the calling process, as the workers of export_images do.
+
+    Args:
+        job (ImageExportJob): The image to export.
+        timings (dict, optional): When given, receives the seconds spent per stage,
+            see add_black_bar_and_text_to_image.
+
+    Returns:
+        str: The path of the exported image.
+    """
+    return add_black_bar_and_text_to_image(
+        job.source_path,
+        job.destination_path,
+        job.patient_id,
+        job.patient_name,
+        job.optaget_dato,
+        job.image_type,
+        job.gamma_value,
+        rotation_angle=job.rotation_angle,
+        is_mirror=job.is_mirror,
+        keep_raw=job.keep_raw,
+        profile=job.profile,
+        decode_cache=job.decode_cache,
+        timings=timings,
+    )
+
+
+def export_images(
+    jobs: Sequence[ImageExportJob],
+    max_workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> List[ImageExportResult]:
+    """
+    Exports images in parallel on a process pool.
+
+    Args:
+        jobs (Sequence[ImageExportJob]): The images to export.
+        max_workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        max_in_flight (int, optional): Maximum number of images submitted to the pool at a time.
+            Defaults to twice the number of workers, enough to keep every worker busy.
+        progress (Callable, optional): Called in the calling process after each image with the
+            number of finished images, the total and the image's result.
+
+    Returns:
+        list: An ImageExportResult per job, in the order of the jobs.
+    """
+    jobs = list(jobs)
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * max_workers
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be at least 1.")
+
+    if not jobs:
+        return []
+
+    results: List[Optional[ImageExportResult]] = [None] * len(jobs)
+    workers = min(max_workers, len(jobs))
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = {}
+        next_index = 0
+        done_count = 0
+
+        while next_index < len(jobs) or pending:
+            while next_index < len(jobs) and len(pending) < max_in_flight:
+                try:
+                    future = executor.submit(run_export_job, jobs[next_index])
+                except BrokenProcessPool:
+                    # A worker died; its pending images fail below, the next ones go to a new pool
+                    executor.shutdown(wait=False)
+                    executor = ProcessPoolExecutor(max_workers=workers)
+                    continue
+                pending[future] = next_index
+                next_index += 1
+
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                index = pending.pop(future)
+                result = ImageExportResult(index=index, job=jobs[index])
+                try:
+                    result.output_path = future.result()
+                except Exception as e:  # pylint: disable=broad-except
+                    # Includes BrokenProcessPool for the images in the pool when a worker died
+                    result.error = e
+                results[index] = result
+                done_count += 1
+                if progress is not None:
+                    progress(done_count, len(jobs), result)
+    finally:
+        executor.shutdown()
+
+    return results
@@ -0,0 +1,152 @@
+"""
+Export profiles: how annotated Romexis images are encoded.
+
+A profile is chosen by name from PROFILES, or created as an ExportProfile:
+
+    add_black_bar_and_text_to_image(..., profile="tiff_deflate")
+    add_black_bar_and_text_to_image(..., profile=ExportProfile("JPEG", quality=92, subsampling=0))
+
+Without a profile, photos (image_type 4) are saved as default quality JPEG and
+all other images as uncompressed TIFF, as before profiles were added. The 16-bit
+profiles save grayscale, so photos, which are in colour, are saved with the
+8-bit RGB variant of a 16-bit profile instead.
+
+The lossless TIFF compressions give the same pixels as uncompressed TIFF at a
+fraction of the size, at the cost of encode time. Size and speed depend on the
+image and the libtiff build, so run tests/benchmarks/romexis_export_profiles_benchmark.py
+to compare the profiles on the target machine.
+
+Pillow can not write tiled TIFF, so large images are written in strips; a
+pyramidal TIFF stores the reduced resolutions as additional pages, each half
+the size of the previous one.
+"""
+from dataclasses import dataclass, replace
+from typing import Optional, Union
+
+from PIL import Image
+
+_EXTENSIONS = {"TIFF": ".tiff", "JPEG": ".jpg", "WEBP": ".webp", "PNG": ".png"}
+_TIFF_COMPRESSIONS = {None, "tiff_lzw", "tiff_adobe_deflate", "zstd"}
+
+
+@dataclass(frozen=True)
+class ExportProfile:
+    """
+    The encoding of an exported image.
+
+    Attributes:
+        format (str): "TIFF", "JPEG", "WEBP" or "PNG".
+        compression (str, optional): TIFF compression: "tiff_lzw", "tiff_adobe_deflate" or "zstd".
+            None saves uncompressed TIFF.
+        quality (int, optional): JPEG or lossy WebP quality (1-100). None uses Pillow's default.
+        subsampling (int, optional): JPEG chroma subsampling: 0 = 4:4:4, 1 = 4:2:2, 2 = 4:2:0.
+        lossless (bool): Lossless WebP.
+        pyramid_levels (int): TIFF only. Number of reduced resolutions stored as additional pages.
+        bit_depth (int): 8, or 16 to keep the 16-bit output of rawpy. 16-bit images are
+            saved as grayscale, which X-rays are, and only as TIFF or PNG.
+    """
+    format: str
+    compression: Optional[str] = None
+    quality: Optional[int] = None
+    subsampling: Optional[int] = None
+    lossless: bool = False
+    pyramid_levels: int = 0
+    bit_depth: int = 8
+
+    def __post_init__(self):
+        if self.format not in _EXTENSIONS:
+            raise ValueError(f"Unsupported format {self.format!r}, expected one of {sorted(_EXTENSIONS)}.")
+        if self.format == "TIFF" and self.compression not in _TIFF_COMPRESSIONS:
+            raise ValueError(f"Unsupported TIFF compression {self.compression!r}.")
+        if self.pyramid_levels and self.format != "TIFF":
+            raise ValueError("Only TIFF supports pyramid levels.")
+        if self.bit_depth not in (8, 16):
+            raise ValueError("bit_depth must be 8 or 16.")
+        if self.bit_depth == 16 and self.format not in ("TIFF", "PNG"):
+            raise ValueError("16-bit images can only be saved as TIFF or PNG.")
+
+    @property
+    def extension(self) -> str:
+        """The file extension, including the dot."""
+        return _EXTENSIONS[self.format]
+
+    def save_options(self) -> dict:
+        """The keyword arguments for Image.save."""
+        options = {"format": self.format}
+        if self.compression is not None:
+            options["compression"] = self.compression
+        if self.quality is not None:
+            options["quality"] = self.quality
+        if self.subsampling is not None:
+            options["subsampling"] = self.subsampling
+        if self.lossless:
+            options["lossless"] = True
+        return options
+
+    def save(self, image: Image.Image, path_stem: str) -> str:
+        """
+        Saves an image with this profile.
+
+        Args:
+            image (Image.Image): The image.
+            path_stem (str): The output path without extension.
+
+        Returns:
+            str: The path of the saved file.
+        """
+        path = path_stem + self.extension
+        options = self.save_options()
+
+        if self.pyramid_levels:
+            levels = []
+            level = image
+            for _ in range(self.pyramid_levels):
+                if min(level.size) < 2:
+                    break
+                level = level.reduce(2)
+                levels.append(level)
+            image.save(path, save_all=True, append_images=levels, **options)
+        else:
+            image.save(path, **options)
+
+        return path
+
+
+PROFILES = {
+    "tiff": ExportProfile("TIFF"),
+    "tiff_lzw": ExportProfile("TIFF", compression="tiff_lzw"),
+    "tiff_deflate": ExportProfile("TIFF", compression="tiff_adobe_deflate"),
+    "tiff_zstd": ExportProfile("TIFF", compression="zstd"),
+    "tiff_deflate_pyramid": ExportProfile("TIFF", compression="tiff_adobe_deflate", pyramid_levels=3),
+    "tiff_16bit": ExportProfile("TIFF", compression="tiff_adobe_deflate", bit_depth=16),
+    "jpeg": ExportProfile("JPEG"),
+    "jpeg_high": ExportProfile("JPEG", quality=95, subsampling=0),
+    "webp": ExportProfile("WEBP", quality=90),
+    "webp_lossless": ExportProfile("WEBP", lossless=True),
+    "png": ExportProfile("PNG"),
+    "png_16bit": ExportProfile("PNG", bit_depth=16),
+}
+
+
+def get_profile(profile: Optional[Union[str, ExportProfile]], image_type: int) -> ExportProfile:
+    """
+    Returns the profile to export an image with.
+
+    Args:
+        profile (str or ExportProfile, optional): A profile, or the name of one in PROFILES.
+            None selects the default: JPEG for photos (image_type 4), otherwise uncompressed TIFF.
+        image_type (int): The Romexis image type.
+
+    Returns:
+        ExportProfile: The profile. For photos, a 16-bit profile is returned at 8 bits, so they keep their colour.
+    """
+    if profile is None:
+        return PROFILES["jpeg"] if image_type == 4 else PROFILES["tiff"]
+    if not isinstance(profile, ExportProfile):
+        try:
+            profile = PROFILES[profile]
+        except KeyError:
+            raise ValueError(f"Unknown export profile {profile!r}, expected one of {sorted(PROFILES)}.") from None
+    if image_type == 4 and profile.bit_depth == 16:
+        return replace(profile, bit_depth=8)
+    return profile
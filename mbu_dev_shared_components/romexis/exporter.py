@@ -0,0 +1,336 @@
+"""
+End-to-end export of the Romexis images of many patients.
+
+RomexisExporter runs the steps callers otherwise glue together by hand as a
+pipeline, so the database, the file share and the CPU are busy at the same time:
+
+    metadata   RomexisDbHandler.get_image_metadata_bulk, per batch of patients   I/O threads
+    fetch      copy of the image from the share to a local staging folder        I/O threads
+    decode     add_black_bar_and_text_to_image: decode, annotate and encode      worker processes
+    annotate
+    encode
+    zip        zip_folder_contents of a patient's folder once all images are done I/O threads
+
+Every stage is bounded, which keeps memory and disk use flat however many
+patients are exported: the next batch of metadata is only queried when the
+images already known are fetched, at most max_staged images are staged locally,
+and at most max_in_flight images are in the worker processes at a time.
+
+The images of a patient are saved in output_dir/<external id>/ and zipped to
+output_dir/<external id>.zip. An image or archive that fails is recorded in the
+report instead of stopping the export. When a worker process dies, e.g. because
+it ran out of memory, the images in the worker processes at the time fail with
+BrokenProcessPool, and the remaining images are exported on a new pool.
+
+On Windows the worker processes import the calling script, so call export from
+under an if __name__ == "__main__": guard.
+
+Example:
+    with RomexisDbHandler(conn_str) as romexis:
+        report = RomexisExporter(romexis, r"C:\\temp\\export").export(cprs)
+    print(report.summary())
+"""
+import contextlib
+import dataclasses
+import os
+import shutil
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from mbu_dev_shared_components.romexis.decode_cache import DecodeCache
+from mbu_dev_shared_components.romexis.export_pipeline import ImageExportJob, ImageExportResult, run_export_job
+from mbu_dev_shared_components.romexis.export_profiles import ExportProfile
+from mbu_dev_shared_components.romexis.helper_functions import zip_folder_contents
+
+STAGES = ("metadata", "fetch", "decode", "annotate", "encode", "zip")
+
+
+@dataclass
+class StageTiming:
+    """
+    The work done in a stage.
+
+    Attributes:
+        items (int): Number of batches, images or archives the stage processed.
+        seconds (float): Total time spent on them, summed over the workers of the stage.
+    """
+    items: int = 0
+    seconds: float = 0.0
+
+    def add(self, seconds: float) -> None:
+        """Records one processed item."""
+        self.items += 1
+        self.seconds += seconds
+
+
+@dataclass
+class ExportReport:
+    """
+    The outcome of RomexisExporter.export.
+
+    Attributes:
+        images (list): An ImageExportResult per image, in the order the patients and images were queried.
+        archives (dict): External id to the path of the patient's archive.
+        archive_errors (dict): External id to the error that stopped the patient's archive.
+        stages (dict): Stage name to its StageTiming.
+        wall_seconds (float): Duration of the export.
+    """
+    images: List[ImageExportResult] = field(default_factory=list)
+    archives: Dict[str, str] = field(default_factory=dict)
+    archive_errors: Dict[str, BaseException] = field(default_factory=dict)
+    stages: Dict[str, StageTiming] = field(default_factory=lambda: {stage: StageTiming() for stage in STAGES})
+    wall_seconds: float = 0.0
+
+    @property
+    def failed(self) -> List[ImageExportResult]:
+        """The images that were not exported."""
+        return [result for result in self.images if not result.ok]
+
+    def summary(self) -> str:
+        """Returns a table of the stages and a line with the totals."""
+        lines = [f"{'stage':<10}{'items':>8}{'seconds':>10}{'ms/item':>10}"]
+        for name, timing in self.stages.items():
+            per_item = timing.seconds / timing.items * 1000 if timing.items else 0.0
+            lines.append(f"{name:<10}{timing.items:>8}{timing.seconds:>10.2f}{per_item:>10.1f}")
+        lines.append(
+            f"{len(self.images)} images, {len(self.failed)} failed, {len(self.archives)} archives "
+            f"in {self.wall_seconds:.2f} s"
+        )
+        return "\n".join(lines)
+
+
+def label_date(image_date) -> str:
+    """
+    Formats an image date for the label bar as dd-mm-yyyy.
+
+    Args:
+        image_date: The image_date of an image, a yyyymmdd string as stored by Romexis, or a date.
+
+    Returns:
+        str: The formatted date, or the value as a string when it is in neither form.
+    """
+    if hasattr(image_date, "strftime"):
+        return image_date.strftime("%d-%m-%Y")
+    text = str(image_date)
+    if len(text) == 8 and text.isdigit():
+        return f"{text[6:8]}-{text[4:6]}-{text[0:4]}"
+    return text
+
+
+def _timed_metadata(db_handler, external_ids: List[str]) -> Tuple[dict, float]:
+    started = time.perf_counter()
+    metadata = db_handler.get_image_metadata_bulk(external_ids)
+    return metadata, time.perf_counter() - started
+
+
+def _fetch(source_path: str, staging_folder: str) -> Tuple[str, float]:
+    started = time.perf_counter()
+    os.makedirs(staging_folder, exist_ok=True)
+    staged_path = os.path.join(staging_folder, os.path.basename(source_path.replace("\\", os.sep)))
+    shutil.copyfile(source_path, staged_path)
+    return staged_path, time.perf_counter() - started
+
+
+def _export_timed(job: ImageExportJob) -> Tuple[str, Dict[str, float]]:
+    timings = {}
+    return run_export_job(job, timings), timings
+
+
+def _timed_zip(folder_path: str, zip_filename: str, compresslevel: int) -> Tuple[str, float]:
+    started = time.perf_counter()
+    zip_folder_contents(folder_path, zip_filename, compresslevel=compresslevel, max_workers=1)
+    return zip_filename, time.perf_counter() - started
+
+
+class RomexisExporter:
+    """Exports, annotates and zips the Romexis images of many patients with bounded concurrency."""
+
+    def __init__(
+        self,
+        db_handler,
+        output_dir: str,
+        io_workers: int = 8,
+        cpu_workers: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        max_staged: Optional[int] = None,
+        metadata_batch_size: int = 100,
+        profile: Optional[Union[str, ExportProfile]] = None,
+        decode_cache: Optional[DecodeCache] = None,
+        zip_archives: bool = True,
+        compresslevel: int = 6,
+        staging_dir: Optional[str] = None,
+        default_gamma: float = 1.0,
+    ):
+        """
+        Initializes the exporter.
+
+        Args:
+            db_handler: A RomexisDbHandler, or any object with its get_image_metadata_bulk.
+            output_dir (str): Folder of the patient folders and archives.
+            io_workers (int): Number of threads querying the database, fetching files and zipping.
+            cpu_workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+            max_in_flight (int, optional): Maximum number of images in the worker processes.
+                Defaults to twice the number of workers.
+            max_staged (int, optional): Maximum number of images fetched or being fetched and not yet
+                exported. Defaults to twice max_in_flight.
+            metadata_batch_size (int): Number of patients per metadata query.
+            profile (str or ExportProfile, optional): Export profile, see romexis.export_profiles.
+            decode_cache (DecodeCache, optional): Cache of decoded images, see romexis.decode_cache.
+            zip_archives (bool): Whether to zip the folder of each patient.
+            compresslevel (int): Deflate level of the archives.
+            staging_dir (str, optional): Folder the images are fetched to. Defaults to a temporary
+                folder that is removed after the export.
+            default_gamma (float): Gamma of images without a gamma operation.
+        """
+        if metadata_batch_size < 1:
+            raise ValueError("metadata_batch_size must be at least 1.")
+        self.db_handler = db_handler
+        self.output_dir = output_dir
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or 2 * self.cpu_workers
+        self.max_staged = max_staged or 2 * self.max_in_flight
+        self.metadata_batch_size = metadata_batch_size
+        self.profile = profile
+        self.decode_cache = decode_cache
+        self.zip_archives = zip_archives
+        self.compresslevel = compresslevel
+        self.staging_dir = staging_dir
+        self.default_gamma = default_gamma
+
+    def _job(self, external_id: str, image: dict) -> ImageExportJob:
+        gamma_value = image.get("gamma_value")
+        patient_name = " ".join(name for name in (image.get("first_name"), image.get("last_name")) if name)
+        return ImageExportJob(
+            source_path=image["file_path"],
+            destination_path=os.path.join(self.output_dir, external_id),
+            patient_id=external_id,
+            patient_name=patient_name,
+            optaget_dato=label_date(image["image_date"]),
+            image_type=image["image_type"],
+            gamma_value=float(gamma_value) if gamma_value is not None else self.default_gamma,
+            rotation_angle=image.get("rotation_angle") or 0,
+            is_mirror=bool(image.get("is_mirrored")),
+            profile=self.profile,
+            decode_cache=self.decode_cache,
+        )
+
+    def export(self, external_ids: Sequence[str]) -> ExportReport:
+        """
+        Exports the images of the patients.
+
+        Errors of the metadata queries stop the export, as there is nothing to export without them.
+
+        Args:
+            external_ids (Sequence[str]): The external ids (CPR numbers) of the patients.
+
+        Returns:
+            ExportReport: The results, archives and stage timings.
+        """
+        started = time.perf_counter()
+        external_ids = list(dict.fromkeys(external_ids))
+        batches = deque(external_ids[i:i + self.metadata_batch_size] for i in range(0, len(external_ids), self.metadata_batch_size))
+        report = ExportReport()
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        with tempfile.TemporaryDirectory(dir=self.staging_dir) as staging_dir, \
+                ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="romexis-io") as io_pool, \
+                contextlib.ExitStack() as cpu_pools:
+            cpu_pool = cpu_pools.enter_context(ProcessPoolExecutor(max_workers=self.cpu_workers))
+            pending = {}  # future -> (stage, payload)
+            to_fetch = deque()  # indexes of images waiting to be fetched
+            to_export = deque()  # (index, staged path) of fetched images waiting for a worker
+            remaining = {}  # external id -> number of images not yet exported
+            staged, in_flight = 0, 0
+
+            def finish_image(index: int) -> None:
+                external_id = report.images[index].job.patient_id
+                remaining[external_id] -= 1
+                folder_path = report.images[index].job.destination_path
+                # The folder does not exist when none of the patient's images were exported
+                if remaining[external_id] == 0 and self.zip_archives and os.path.isdir(folder_path):
+                    zip_filename = os.path.join(self.output_dir, f"{external_id}.zip")
+                    pending[io_pool.submit(_timed_zip, folder_path, zip_filename, self.compresslevel)] = ("zip", external_id)
+
+            while True:
+                metadata_running = any(stage == "metadata" for stage, _ in pending.values())
+                if batches and not metadata_running and len(to_fetch) < self.max_staged:
+                    pending[io_pool.submit(_timed_metadata, self.db_handler, batches.popleft())] = ("metadata", None)
+
+                while to_fetch and staged < self.max_staged:
+                    index = to_fetch.popleft()
+                    staging_folder = os.path.join(staging_dir, str(index))
+                    pending[io_pool.submit(_fetch, report.images[index].job.source_path, staging_folder)] = ("fetch", index)
+                    staged += 1
+
+                while to_export and in_flight < self.max_in_flight:
+                    index, staged_path = to_export.popleft()
+                    job = dataclasses.replace(report.images[index].job, source_path=staged_path)
+                    try:
+                        future = cpu_pool.submit(_export_timed, job)
+                    except BrokenProcessPool:
+                        # A worker died; its pending images fail below, this and the next ones go to a new pool
+                        cpu_pool = cpu_pools.enter_context(ProcessPoolExecutor(max_workers=self.cpu_workers))
+                        future = cpu_pool.submit(_export_timed, job)
+                    pending[future] = ("export", (index, staged_path))
+                    in_flight += 1
+
+                if not pending:
+                    break
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage, payload = pending.pop(future)
+
+                    if stage == "metadata":
+                        metadata, seconds = future.result()
+                        report.stages["metadata"].add(seconds)
+                        for external_id, patient in metadata.items():
+                            remaining[external_id] = len(patient["images"])
+                            for image in patient["images"]:
+                                to_fetch.append(len(report.images))
+                                report.images.append(ImageExportResult(len(report.images), self._job(external_id, image)))
+
+                    elif stage == "fetch":
+                        try:
+                            staged_path, seconds = future.result()
+                        except Exception as e:  # pylint: disable=broad-except
+                            report.images[payload].error = e
+                            staged -= 1
+                            finish_image(payload)
+                        else:
+                            report.stages["fetch"].add(seconds)
+                            to_export.append((payload, staged_path))
+
+                    elif stage == "export":
+                        index, staged_path = payload
+                        try:
+                            output_path, timings = future.result()
+                        except Exception as e:  # pylint: disable=broad-except
+                            # Includes BrokenProcessPool for the images in the pool when a worker died
+                            report.images[index].error = e
+                        else:
+                            report.images[index].output_path = output_path
+                            for name, seconds in timings.items():
+                                report.stages[name].add(seconds)
+                        shutil.rmtree(os.path.dirname(staged_path), ignore_errors=True)
+                        staged -= 1
+                        in_flight -= 1
+                        finish_image(index)
+
+                    else:
+                        try:
+                            zip_filename, seconds = future.result()
+                        except Exception as e:  # pylint: disable=broad-except
+                            report.archive_errors[payload] = e
+                        else:
+                            report.stages["zip"].add(seconds)
+                            report.archives[payload] = zip_filename
+
+        report.wall_seconds = time.perf_counter() - started
+        return report
@@ -1,33 +1,269 @@
 """
 Helper functions for working with exporting images from Romexis.
 """
+import functools
 import os
-import zipfile
 import shutil
+import time
+from typing import BinaryIO, Dict, Optional, Tuple, Union
 import rawpy
 import numpy as np
-from PIL import Image, ImageDraw, ImageFont, ImageOps
+from PIL import Image, ImageDraw, ImageFont
 
+from mbu_dev_shared_components.romexis.decode_cache import DecodeCache
+from mbu_dev_shared_components.romexis.export_profiles import ExportProfile, get_profile
+from mbu_dev_shared_components.romexis.zip_writer import folder_entries, write_zip
 
-def zip_folder_contents(folder_path: str, zip_filename: str) -> None:
+# Font used for the patient label. Resolved like ImageFont.truetype, i.e. a path or
+# a font name in the system font folders, which includes arial.ttf on Windows.
+DEFAULT_FONT_PATH = "arial.ttf"
+
+
+@functools.lru_cache(maxsize=32)
+def get_font(font_path: Optional[str] = None, size: int = 24) -> ImageFont.FreeTypeFont:
+    """
+    Returns the font for a path and size, loading it only once per process.
+
+    When the font can not be found, e.g. arial.ttf on Linux, the font bundled
+    with Pillow is used instead.
+
+    :param font_path: Path or name of a TrueType font. Defaults to DEFAULT_FONT_PATH.
+    :param size: Font size in pixels.
+    :return: The font.
+    """
+    try:
+        return ImageFont.truetype(font_path or DEFAULT_FONT_PATH, size)
+    except OSError:
+        return ImageFont.load_default(size=size)
+
+
+@functools.lru_cache(maxsize=1024)
+def measure_text(text: str, font: ImageFont.FreeTypeFont) -> Tuple[int, int]:
     """
-    Zips all files in the specified folder (non-recursive) into a .zip archive.
+    Returns the width and height of the bounding box of a single line of text,
+    as ImageDraw.textbbox does, without drawing it on an image.
+
+    :param text: The text.
+    :param font: The font, e.g. from get_font.
+    :return: Width and height in pixels.
+    """
+    left, top, right, bottom = font.getbbox(text)
+    return right - left, bottom - top
+
+
+def zip_folder_contents(
+    folder_path: str,
+    zip_filename: Union[str, BinaryIO],
+    compresslevel: int = 9,
+    max_workers: Optional[int] = None,
+    recursive: bool = False,
+) -> None:
+    """
+    Zips all files in the specified folder into a .zip archive.
+
+    Files are deflated in parallel, and already compressed formats such as JPEG
+    are stored as is, see mbu_dev_shared_components.romexis.zip_writer.
 
     Args:
         folder_path (str): Path to the folder containing files to zip.
-        zip_filename (str): Full path (including .zip filename) for the output zip file.
+        zip_filename (str or BinaryIO): Full path (including .zip filename) for the output zip file,
+            or a writable file-like object to stream the archive to.
+        compresslevel (int): Deflate level (1-9) for files that are compressed, e.g. TIFF.
+            Lower levels are considerably faster for large TIFF files.
+        max_workers (int, optional): Number of compression threads. Defaults to the number of CPUs.
+        recursive (bool): Whether to include files in subfolders, under their relative path.
     """
     try:
-        with zipfile.ZipFile(zip_filename, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=9) as zipf:
-            for filename in os.listdir(folder_path):
-                full_path = os.path.join(folder_path, filename)
-                if os.path.isfile(full_path):
-                    zipf.write(full_path, arcname=filename)
+        write_zip(folder_entries(folder_path, recursive=recursive), zip_filename, compresslevel=compresslevel, max_workers=max_workers)
     except Exception as e:
         print(f"Error zipping folder: {e}")
         raise
 
 
+@functools.lru_cache(maxsize=16)
+def gamma_lut(gamma_value: float, bit_depth: int = 8) -> np.ndarray:
+    """
+    Returns the lookup table applying a gamma to 8-bit or 16-bit pixel values.
+
+    Each value x of the full range is mapped to x ** (1 / gamma_value), scaled to the range,
+    so a gamma above 1 brightens the image like rawpy's gamma. The table is computed once per
+    gamma and bit depth, and applying it is a single indexing pass over the image.
+
+    :param gamma_value: The gamma, above 0.
+    :param bit_depth: 8 or 16.
+    :return: A read-only table of 256 or 65536 values of the bit depth's dtype.
+    """
+    if gamma_value <= 0:
+        raise ValueError(f"gamma_value must be above 0, got {gamma_value}.")
+    if bit_depth not in (8, 16):
+        raise ValueError("bit_depth must be 8 or 16.")
+
+    max_value = (1 << bit_depth) - 1
+    dtype = np.uint8 if bit_depth == 8 else np.uint16
+    values = np.linspace(0.0, 1.0, max_value + 1) ** (1.0 / gamma_value)
+    lut = np.rint(values * max_value).astype(dtype)
+    lut.flags.writeable = False
+    return lut
+
+
+def apply_gamma(rgb: np.ndarray, gamma_value: Optional[float]) -> np.ndarray:
+    """
+    Applies a gamma to a uint8 or uint16 image with gamma_lut.
+
+    :param rgb: The image array.
+    :param gamma_value: The gamma. None and 1 leave the image as it is.
+    :return: The image array, a new array unless the gamma is None or 1.
+    """
+    if gamma_value is None or gamma_value == 1:
+        return rgb
+    return gamma_lut(float(gamma_value), 8 if rgb.dtype == np.uint8 else 16)[rgb]
+
+
+def transform_image(rgb: np.ndarray, rotation_angle: int = 0, is_mirror: bool = False) -> np.ndarray:
+    """
+    Rotates and mirrors an image as stored in Romexis.
+
+    Rotations by multiples of 90 degrees and mirroring return views of the array with
+    reordered strides, so no pixels are copied until the view is copied into the label bar
+    canvas. Only other angles are rotated with Pillow.
+
+    :param rgb: The image array.
+    :param rotation_angle: Counter-clockwise rotation in degrees.
+    :param is_mirror: Whether to mirror the image horizontally after rotating it.
+    :return: The transformed image array, possibly a view of rgb.
+    """
+    angle = rotation_angle % 360
+
+    if angle % 90 == 0:
+        rgb = np.rot90(rgb, k=int(angle // 90))
+    else:
+        rgb = np.asarray(Image.fromarray(np.ascontiguousarray(rgb)).rotate(angle, expand=True))
+
+    if is_mirror:
+        rgb = rgb[:, ::-1]
+
+    return rgb
+
+
+def add_label_bar(rgb: np.ndarray, line1: str, line2: str, font_path: Optional[str] = None) -> np.ndarray:
+    """
+    Returns the image with a black bar below it containing two lines of white text.
+
+    The result is allocated once and the image copied into it, and the text is
+    drawn on an image the size of the bar only, instead of pasting the whole
+    image into a new PIL canvas.
+
+    :param rgb: The image as an RGB array of shape (height, width, 3), or a grayscale
+        array of shape (height, width). 8-bit and 16-bit arrays are supported.
+    :param line1: The first line of text, e.g. "patient id : patient name".
+    :param line2: The second line of text, e.g. the date the image was taken.
+    :param font_path: Path or name of the TrueType font. Defaults to DEFAULT_FONT_PATH.
+    :return: An array of the same type, with the bar height added to the image height.
+    """
+    height, width = rgb.shape[:2]
+
+    font = get_font(font_path, max(24, height // 30))
+    _, line1_height = measure_text(line1, font)
+    _, line2_height = measure_text(line2, font)
+
+    margin_y = max(10, height // 50)
+    spacing_between_lines = max(5, height // 80)
+    black_box_height = line1_height + line2_height + spacing_between_lines + 2 * margin_y
+
+    # White text on black is the same in every channel, so the bar is drawn in grayscale
+    bar = Image.new("L", (width, black_box_height), color=0)
+    draw = ImageDraw.Draw(bar)
+    text_x = 5
+    text_y = margin_y
+    draw.text((text_x, text_y), line1, font=font, fill=255)
+    text_y += line1_height + spacing_between_lines
+    draw.text((text_x, text_y), line2, font=font, fill=255)
+
+    bar_values = np.asarray(bar).astype(rgb.dtype)
+    if rgb.dtype == np.uint16:
+        bar_values *= 257
+
+    canvas = np.empty((height + black_box_height,) + rgb.shape[1:], dtype=rgb.dtype)
+    canvas[:height] = rgb
+    canvas[height:] = bar_values[:, :, None] if rgb.ndim == 3 else bar_values
+
+    return canvas
+
+
+def decode_image(
+    source_path: str,
+    image_type: int,
+    gamma_value: float,
+    bit_depth: int = 8,
+    max_size: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Decodes a Romexis image with rawpy, or with Pillow when the file is not a RAW image.
+
+    :param source_path: Path to the image.
+    :param image_type: The Romexis image type. Cephalostat images (type 2) are decoded without gamma.
+    :param gamma_value: Gamma applied to images of the other types, by LibRaw's gamma curve for RAW
+        images and by apply_gamma for other images.
+    :param bit_depth: 8 for an 8-bit RGB array, or 16 for a 16-bit grayscale array.
+    :param max_size: Decode a reduced resolution image fitting in max_size x max_size, e.g. for previews.
+        RAW images are decoded at half size when that is still large enough, and JPEG images
+        with Pillow's draft mode, which is much faster than decoding at full size.
+    :return: The image, of shape (height, width, 3) for 8-bit and (height, width) for 16-bit.
+    """
+    fallback_gamma = None
+    try:
+        with rawpy.imread(source_path) as raw:
+            # image_type 1 = Panorama, 3 = Interoralt, 4 = Foto
+            # image_type 2 = Cephalostat
+            gamma = (1, 1) if image_type == 2 else (gamma_value, 1)
+            half_size = max_size is not None and max(raw.sizes.width, raw.sizes.height) // 2 >= max_size
+            rgb = raw.postprocess(
+                use_camera_wb=True,
+                gamma=gamma,
+                no_auto_scale=True,
+                dcb_enhance=False,
+                half_size=half_size,
+                demosaic_algorithm=None,
+                four_color_rgb=False,
+                use_auto_wb=False,
+                output_bps=bit_depth,
+            )
+    except Exception:  # pylint: disable=broad-except
+        fallback_gamma = None if image_type == 2 else gamma_value
+        with Image.open(source_path) as image:
+            if max_size is not None:
+                image.draft("RGB", (max_size, max_size))
+            if bit_depth == 16:
+                if image.mode in ("I;16", "I;16B", "I"):
+                    rgb = np.asarray(image).clip(0, 65535).astype(np.uint16)
+                else:
+                    rgb = np.asarray(image.convert("L")).astype(np.uint16) * 257
+            else:
+                rgb = np.asarray(image.convert("RGB"))
+    else:
+        if bit_depth == 16:
+            rgb = _to_gray16(rgb)
+
+    if max_size is not None and max(rgb.shape[:2]) > max_size:
+        thumbnail = Image.fromarray(rgb)
+        thumbnail.thumbnail((max_size, max_size))
+        rgb = np.asarray(thumbnail)
+
+    # After scaling down, so a preview only maps the pixels it keeps
+    return apply_gamma(rgb, fallback_gamma)
+
+
+def _to_gray16(rgb: np.ndarray) -> np.ndarray:
+    """Converts a 16-bit RGB array to grayscale with the ITU-R 601 luma weights Pillow uses for "L"."""
+    # Widened first: NumPy 1.x keeps uint16 * scalar as uint16, which would wrap around
+    rgb = rgb.astype(np.uint32)
+    gray = rgb[..., 0] * 19595
+    gray += rgb[..., 1] * 38470
+    gray += rgb[..., 2] * 7471
+    gray += np.uint32(0x8000)
+    return (gray >> 16).astype(np.uint16)
+
+
 def add_black_bar_and_text_to_image(
     source_path: str,
     destination_path: str,
@@ -38,121 +274,80 @@ def add_black_bar_and_text_to_image(
     gamma_value: float,
     rotation_angle: int = 0,
     is_mirror: bool = False,
+    keep_raw: bool = False,
+    font_path: Optional[str] = None,
+    profile: Optional[Union[str, ExportProfile]] = None,
+    decode_cache: Optional[DecodeCache] = None,
+    timings: Optional[Dict[str, float]] = None,
 ):
     """
     Adds a black box at the bottom of an image containing two lines of text:
-    Patient name : patient id and optaget_dato.
+    patient id : patient name and optaget_dato.
 
-    :param source_path: Path to the input image.
+    :param source_path: Path to the input image, a Romexis RAW file or any image Pillow can read.
+    :param destination_path: Folder to save the resulting image in, created if it does not exist.
+        The image is saved under the name of the source file, with the extension of the profile.
     :param patient_id: Value to display for the "Patient ID".
-    :param optaget_dato: Value to display for the "Optaget dato".
-    :param out_path: Path to save the resulting image.
-    :param margin_x: Horizontal margin for the text inside the black box.
+    :param patient_name: Value to display after the patient id on the first line.
+    :param optaget_dato: Value to display for the "Optaget dato" on the second line.
+    :param image_type: The Romexis image type, see decode_image. Also selects the default profile.
+    :param gamma_value: Gamma of the image, see decode_image.
+    :param rotation_angle: Counter-clockwise rotation in degrees, see transform_image.
+    :param is_mirror: Mirror the image horizontally after rotating it.
+    :param keep_raw: Also copy the original raw file to destination_path. The image is
+        always decoded directly from source_path.
+    :param font_path: Path or name of the TrueType font of the label. Defaults to DEFAULT_FONT_PATH.
+    :param profile: Export profile or the name of one, see romexis.export_profiles. Defaults to
+        JPEG for photos (image_type 4) and uncompressed TIFF for other images. Photos keep their
+        colour under a 16-bit profile, and are saved in its format at 8 bits.
+    :param decode_cache: Cache of decoded images, see romexis.decode_cache. When the image was
+        decoded before with the same parameters, the cached array is used instead of decoding it.
+    :param timings: When given, the seconds spent decoding, annotating (transform and label bar)
+        and encoding are stored in it under "decode", "annotate" and "encode".
+    :return: Path of the saved image.
     """
     try:
         if not os.path.exists(destination_path):
             os.makedirs(destination_path)
 
+        profile = get_profile(profile, image_type)
         filename = os.path.basename(source_path)
-        copied_path = os.path.join(destination_path, filename)
-
-        shutil.copy2(source_path, copied_path)
-
-        try:
-            with rawpy.imread(copied_path) as raw:
-                # image_type 1 = Panorama
-                if image_type == 1:
-                    rgb = raw.postprocess(
-                        use_camera_wb=True,
-                        gamma=(gamma_value, 1),
-                        no_auto_scale=True,
-                        dcb_enhance=False,
-                        half_size=False,
-                        demosaic_algorithm=None,
-                        four_color_rgb=False,
-                        use_auto_wb=False
-                    )
-                # image_type 2 = Cephalostat
-                elif image_type == 2:
-                    rgb = raw.postprocess(
-                        use_camera_wb=True,
-                        gamma=(1, 1),
-                        no_auto_scale=True,
-                        dcb_enhance=False,
-                        half_size=False,
-                        demosaic_algorithm=None,
-                        four_color_rgb=False,
-                        use_auto_wb=False
-                    )
-                else:
-                    # image_type 3 = Interoralt, image_type 4 = Foto
-                    rgb = raw.postprocess(
-                        use_camera_wb=True,
-                        gamma=(gamma_value, 1),
-                        no_auto_scale=True,
-                        dcb_enhance=False,
-                        half_size=False,
-                        demosaic_algorithm=None,
-                        four_color_rgb=False,
-                        use_auto_wb=False
-                    )
-        except Exception as e:
-            rgb = Image.open(copied_path).convert("RGB")
-            rgb = np.array(rgb)
-
-        image = Image.fromarray(rgb)
-
-        if rotation_angle != 0:
-            image = image.rotate(rotation_angle, expand=True)
-
-        if is_mirror:
-            image = ImageOps.mirror(image)
-
-        width, height = image.size
-
-        base_font_size = max(24, height // 30)
-        font = ImageFont.truetype("arial.ttf", base_font_size)
-
-        line1 = f"{patient_id} : {patient_name}"
-        line2 = optaget_dato
-
-        temp_image = Image.new('RGB', (width, height))
-        draw_temp = ImageDraw.Draw(temp_image)
-
-        def get_text_dimensions(text, font):
-            bbox = draw_temp.textbbox((0, 0), text, font=font)
-            return (bbox[2] - bbox[0], bbox[3] - bbox[1])
-
-        line1_width, line1_height = get_text_dimensions(line1, font)
-        line2_width, line2_height = get_text_dimensions(line2, font)
-
-        margin_y = max(10, height // 50)
-        spacing_between_lines = max(5, height // 80)
-        black_box_height = line1_height + line2_height + spacing_between_lines + 2 * margin_y
-        new_height = height + black_box_height
-
-        new_image = Image.new('RGB', (width, new_height), color=(255, 255, 255))
-        new_image.paste(image, (0, 0))
-
-        draw = ImageDraw.Draw(new_image)
-        box_top = new_height - black_box_height
-        draw.rectangle([(0, box_top), (width, new_height)], fill="black")
-
-        text_x = 5
-        text_y = box_top + margin_y
-        draw.text((text_x, text_y), line1, font=font, fill=(255, 255, 255))
-        text_y += line1_height + spacing_between_lines
-        draw.text((text_x, text_y), line2, font=font, fill=(255, 255, 255))
-
-        if image_type == 4:
-            final_path = copied_path.replace(".img", ".jpg")
-            new_image.save(final_path, format="JPEG")
+        output_stem = os.path.join(destination_path, os.path.splitext(filename)[0])
+
+        if keep_raw:
+            shutil.copy2(source_path, os.path.join(destination_path, filename))
+
+        started = time.perf_counter()
+        if decode_cache is None:
+            rgb = decode_image(source_path, image_type, gamma_value, bit_depth=profile.bit_depth)
         else:
-            final_path = copied_path.replace(".img", ".tiff")
-            new_image.save(final_path, format='TIFF')
+            cache_key = decode_cache.key(source_path, image_type, gamma_value, profile.bit_depth)
+            rgb = decode_cache.get(cache_key)
+            if rgb is None:
+                rgb = decode_image(source_path, image_type, gamma_value, bit_depth=profile.bit_depth)
+                decode_cache.put(cache_key, rgb)
+        decoded = time.perf_counter()
+
+        rgb = transform_image(rgb, rotation_angle, is_mirror)
+
+        canvas = add_label_bar(rgb, f"{patient_id} : {patient_name}", optaget_dato, font_path=font_path)
+        # Free the decoded image before the canvas is converted, so at most two full-size buffers exist at once
+        del rgb
+        new_image = Image.fromarray(canvas)
+        del canvas
+        annotated = time.perf_counter()
+
+        final_path = profile.save(new_image, output_stem)
+
+        if timings is not None:
+            timings["decode"] = decoded - started
+            timings["annotate"] = annotated - decoded
+            timings["encode"] = time.perf_counter() - annotated
 
         print(f"Saved modified image at: {final_path}")
 
+        return final_path
+
     except Exception as e:
         print(f"Error processing image: {e}")
         raise
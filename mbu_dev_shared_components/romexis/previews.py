@@ -0,0 +1,132 @@
+"""
+Reduced-resolution previews of Romexis images.
+
+A preview is the annotated image (label bar included) scaled to fit in
+max_size x max_size pixels and saved as JPEG. Decoding at reduced resolution
+(rawpy's half_size, Pillow's JPEG draft mode) makes a preview a fraction of
+the cost of a full export, so it can be used to let a user check an export
+before running it.
+
+Previews are cached on disk, named by the image id and the parameters that
+change the pixels, including a hash of the label text and font, so a preview is
+only generated once:
+
+    path = create_preview(image["file_path"], cache_dir, image["image_id"], cpr, name,
+                          image["image_date"], image["image_type"], image["gamma_value"],
+                          image["rotation_angle"], image["is_mirrored"])
+"""
+import hashlib
+import os
+import tempfile
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+from mbu_dev_shared_components.romexis.helper_functions import (
+    DEFAULT_FONT_PATH, add_label_bar, decode_image, transform_image
+)
+
+DEFAULT_PREVIEW_SIZE = 1024
+PREVIEW_QUALITY = 85
+# Gamma of images without a gamma operation, for which get_image_metadata_bulk returns None
+DEFAULT_GAMMA = 1.0
+
+
+def preview_filename(
+    image_id: str,
+    gamma_value: Optional[float],
+    rotation_angle: int = 0,
+    is_mirror: bool = False,
+    max_size: int = DEFAULT_PREVIEW_SIZE,
+    label: str = "",
+    font_path: Optional[str] = None,
+) -> str:
+    """
+    Returns the file name of a cached preview.
+
+    Args:
+        image_id (str): The Romexis image id.
+        gamma_value (float, optional): The gamma of the image. None is DEFAULT_GAMMA.
+        rotation_angle (int): The rotation of the image.
+        is_mirror (bool): Whether the image is mirrored.
+        max_size (int): The maximum width and height of the preview.
+        label (str): The text of the label bar, which is part of the name as a hash.
+        font_path (str, optional): Path or name of the font of the label. Defaults to DEFAULT_FONT_PATH.
+
+    Returns:
+        str: The file name.
+    """
+    gamma_value = DEFAULT_GAMMA if gamma_value is None else float(gamma_value)
+    label_hash = hashlib.sha1(f"{label}\0{font_path or DEFAULT_FONT_PATH}".encode("utf-8")).hexdigest()[:12]
+    return f"{image_id}_g{gamma_value:g}_r{int(rotation_angle)}_m{int(bool(is_mirror))}_{max_size}_{label_hash}.jpg"
+
+
+def create_preview(
+    source_path: str,
+    cache_dir: str,
+    image_id: str,
+    patient_id: str,
+    patient_name: str,
+    optaget_dato: str,
+    image_type: int,
+    gamma_value: Optional[float],
+    rotation_angle: int = 0,
+    is_mirror: bool = False,
+    max_size: int = DEFAULT_PREVIEW_SIZE,
+    font_path: Optional[str] = None,
+) -> str:
+    """
+    Creates an annotated preview of an image, or returns the cached one.
+
+    Args:
+        source_path (str): Path to the image.
+        cache_dir (str): Folder of the cached previews. Created if it does not exist.
+        image_id (str): The Romexis image id, used to name the cached preview.
+        patient_id (str): Value to display for the patient id.
+        patient_name (str): Value to display for the patient name.
+        optaget_dato (str): Value to display for the date the image was taken.
+        image_type (int): The Romexis image type.
+        gamma_value (float, optional): The gamma of the image. None, for images without a gamma
+            operation, is DEFAULT_GAMMA.
+        rotation_angle (int): The rotation of the image.
+        is_mirror (bool): Whether the image is mirrored.
+        max_size (int): The maximum width and height of the image, before the label bar is added.
+        font_path (str, optional): Path or name of the TrueType font of the label.
+
+    Returns:
+        str: Path of the preview.
+    """
+    if max_size < 1:
+        raise ValueError("max_size must be at least 1.")
+
+    gamma_value = DEFAULT_GAMMA if gamma_value is None else float(gamma_value)
+    line1, line2 = f"{patient_id} : {patient_name}", optaget_dato
+    filename = preview_filename(image_id, gamma_value, rotation_angle, is_mirror, max_size,
+                                label=f"{line1}\n{line2}", font_path=font_path)
+    path = os.path.join(cache_dir, filename)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(cache_dir, exist_ok=True)
+
+    rgb = decode_image(source_path, image_type, gamma_value, max_size=max_size)
+    rgb = transform_image(rgb, rotation_angle, is_mirror)
+    # Rotating by an angle that is not a multiple of 90 degrees enlarges the image
+    if max(rgb.shape[:2]) > max_size:
+        image = Image.fromarray(rgb)
+        image.thumbnail((max_size, max_size))
+        rgb = np.asarray(image)
+    canvas = add_label_bar(rgb, line1, line2, font_path=font_path)
+
+    # Written to a temporary file first, so a preview that is being written is never served from the cache
+    descriptor, temp_path = tempfile.mkstemp(suffix=".jpg", dir=cache_dir)
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            Image.fromarray(canvas).save(file, format="JPEG", quality=PREVIEW_QUALITY)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+    return path
@@ -0,0 +1,167 @@
+"""
+This module contains the set-based SQL queries used by RomexisDbHandler
+to look up many patients or images in one query.
+
+The queries take a number of values and return the SQL with one ? placeholder
+per value, so callers can chunk their values below the parameter limit with
+mbu_dev_shared_components.utils.query_builder.chunks.
+"""
+
+# Ranks the active operations of the images in an ImageList CTE, newest first.
+# The operation ranked 1 holds the gamma currently applied to the image.
+RANKED_OPERATIONS_CTE = """
+    RankedOps AS (
+    SELECT
+        imo.*,
+        ROW_NUMBER() OVER (
+        PARTITION BY imo.image_id
+        ORDER BY
+            imo.updated_date DESC,
+            imo.updated_time DESC
+        ) AS rn
+    FROM [Romexis_db].[dbo].[RIM_Image_Operation] imo
+    JOIN ImageList ii
+        ON ii.image_id = imo.image_id
+    WHERE imo.status = 1
+    )
+"""
+
+
+def _placeholders(count: int) -> str:
+    if count < 1:
+        raise ValueError("At least one value is needed to build the query.")
+    return ", ".join(["?"] * count)
+
+
+def persons_query(count: int) -> str:
+    """
+    Returns the query for the persons with any of count external ids.
+
+    Args:
+        count (int): Number of external ids passed as parameters.
+
+    Returns:
+        str: The SQL query.
+    """
+    return f"""
+        SELECT
+            [person_id],
+            [external_id],
+            [first_name],
+            [second_name],
+            [third_name],
+            [last_name],
+            [date_of_birth]
+        FROM
+            [Romexis_db].[dbo].[RRM_Person]
+        WHERE
+            [external_id] IN ({_placeholders(count)})
+    """
+
+
+def image_metadata_query(count: int) -> str:
+    """
+    Returns the query for the exportable images of the persons with any of count external ids.
+
+    The rows have the columns of RomexisDbHandler.get_image_data and the gamma_value
+    of the latest gamma operation, or NULL for images without one.
+
+    Args:
+        count (int): Number of external ids passed as parameters.
+
+    Returns:
+        str: The SQL query.
+    """
+    return f"""
+        WITH ImageList AS (
+            SELECT
+                [person_id],
+                [first_name],
+                [last_name],
+                [date_of_birth],
+                [gender],
+                [external_id],
+                [doctor_id],
+                rii.[image_id],
+                [image_size],
+                [image_date],
+                [image_time],
+                [image_source],
+                [image_type],
+                [image_subtype],
+                [image_format],
+                [bit_depth],
+                [pixel_size],
+                [rotation_angle],
+                [is_mirrored],
+                [tooth_mask],
+                [tooth_mask_child],
+                [operator_id],
+                [string_value] AS [file_path]
+            FROM
+                [Romexis_db].[dbo].[RIM_Image_Info] rii
+            INNER JOIN [romexis_db].[dbo].[RRM_Person] rp
+                ON rii.patient_id = rp.person_id
+            INNER JOIN [Romexis_db].[dbo].[RIM_Image_Attrib] ria
+                ON ria.image_id = rii.image_id AND ria.attrib_type = 1
+            WHERE
+                rp.[external_id] IN ({_placeholders(count)})
+                AND rii.[image_type] IN (1, 2, 3, 4)
+                AND rii.[status] != 5
+        ),
+        {RANKED_OPERATIONS_CTE}
+        SELECT
+            ii.*,
+            imop.param_value AS gamma_value
+        FROM ImageList ii
+        LEFT JOIN RankedOps ro
+            ON ro.image_id = ii.image_id
+            AND ro.rn = 1
+        LEFT JOIN [Romexis_db].[dbo].[RIM_Image_Op_Param] imop
+            ON imop.operation_id = ro.operation_id
+            AND imop.param_type = 3
+        ORDER BY ii.external_id, ii.image_date, ii.image_time
+    """
+
+
+def latest_gamma_query(count: int) -> str:
+    """
+    Returns the query for the latest gamma operation of any of count images.
+
+    The rows have the columns of RomexisDbHandler.get_gamma_data, one per image
+    with a gamma operation, ordered by image date and time.
+
+    Args:
+        count (int): Number of image ids passed as parameters.
+
+    Returns:
+        str: The SQL query.
+    """
+    return f"""
+        WITH ImageList AS (
+        SELECT image_id
+        FROM [Romexis_db].[dbo].[RIM_Image_Info]
+        WHERE image_id IN ({_placeholders(count)})
+        ),
+        {RANKED_OPERATIONS_CTE}
+        SELECT
+            imop.operation_id,
+            imop.param_type,
+            imop.param_value AS gamma_value,
+            imop.local_change_id,
+            imop.master_change_id,
+            imop.original_local_id,
+            ro.image_id,
+            imi.image_date,
+            imi.image_time,
+            ro.updated_date,
+            ro.updated_time
+        FROM [Romexis_db].[dbo].[RIM_Image_Op_Param] imop
+        JOIN RankedOps ro
+        ON ro.operation_id = imop.operation_id
+        AND ro.rn = 1
+        JOIN [Romexis_db].[dbo].[RIM_Image_Info] imi
+        ON imi.image_id = ro.image_id
+        WHERE imop.param_type = 3
+        ORDER BY imi.image_date, imi.image_time;
+    """
@@ -0,0 +1,278 @@
+"""
+Streaming ZIP writer compressing the entries of an archive in parallel.
+
+Each file to deflate is compressed on a worker thread; zlib releases the GIL
+while compressing, so the entries are compressed on several cores without
+copying file contents between processes. The compressed entries are written
+to the archive in order as they complete.
+
+A compressed entry is kept in memory up to SPOOL_SIZE bytes and spills to a
+temporary file beyond that, and at most max_in_flight entries are compressed
+ahead of the one being written, so the memory used is bounded by
+max_in_flight * SPOOL_SIZE however large the files are.
+
+Files in formats that are already compressed, such as JPEG, are stored without
+compression, since deflating them costs time and saves next to nothing.
+
+zipfile can only write entries it compresses itself, on the writing thread, so
+the archive is written here following the ZIP format (PKWARE APPNOTE), with the
+CRC-32 and sizes of every entry computed before its header is written. ZIP64
+records are added for entries and archives beyond the 4 GiB and 65535 entry
+limits. The destination can be a path or any writable file-like object, which
+does not need to be seekable, e.g. a pipe or a streaming upload.
+"""
+import contextlib
+import os
+import struct
+import tempfile
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterable, List, Optional, Tuple, Union
+
+# Extensions of formats that are already compressed and are stored as is
+STORED_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png", ".webp", ".gif", ".zip", ".gz", ".7z", ".docx", ".xlsx", ".pdf"})
+
+# Bytes of a compressed entry kept in memory before it spills to a temporary file
+SPOOL_SIZE = 8 * 1024 * 1024
+
+_READ_SIZE = 1024 * 1024
+
+_LOCAL_HEADER = struct.Struct("<4s2B4H3L2H")
+_CENTRAL_HEADER = struct.Struct("<4s4B4H3L5H2L")
+_END_RECORD = struct.Struct("<4s4H2LH")
+_ZIP64_END_RECORD = struct.Struct("<4sQ2H2L4Q")
+_ZIP64_LOCATOR = struct.Struct("<4sLQL")
+_ZIP64_LOCAL_EXTRA = struct.Struct("<2H2Q")
+_ZIP64_CENTRAL_EXTRA = struct.Struct("<2H3Q")
+# Largest size or offset and number of entries of the records without ZIP64
+_ZIP64_LIMIT = 0xFFFFFFFF - 1
+_ZIP64_ENTRY_LIMIT = 0xFFFF - 1
+# Value of a field whose value is in the ZIP64 records instead
+_MAX_32 = 0xFFFFFFFF
+_MAX_16 = 0xFFFF
+_UTF8_FLAG = 0x800
+_CREATE_SYSTEM = 3  # Unix, as zipfile writes, so external_attr holds the file mode
+
+
+def folder_entries(folder_path: str, recursive: bool = False) -> List[Tuple[str, str]]:
+    """
+    Lists the files of a folder with their names in an archive.
+
+    Args:
+        folder_path (str): The folder.
+        recursive (bool): Whether to include files in subfolders, named by their relative path.
+
+    Returns:
+        list: (path, archive name) pairs, sorted by archive name.
+    """
+    entries = []
+    if recursive:
+        for root, _, filenames in os.walk(folder_path):
+            for filename in filenames:
+                full_path = os.path.join(root, filename)
+                entries.append((full_path, os.path.relpath(full_path, folder_path).replace(os.sep, "/")))
+    else:
+        for filename in os.listdir(folder_path):
+            full_path = os.path.join(folder_path, filename)
+            if os.path.isfile(full_path):
+                entries.append((full_path, filename))
+    return sorted(entries, key=lambda entry: entry[1])
+
+
+class _Entry:
+    """An entry with its CRC-32 and sizes known, and its data in a file or a spool of compressed data."""
+
+    def __init__(self, path: str, arcname: str, compress_type: int, crc: int, file_size: int,
+                 compress_size: int, spool: Optional[BinaryIO] = None):
+        self.info = zipfile.ZipInfo.from_file(path, arcname)
+        self.path = path
+        self.compress_type = compress_type
+        self.crc = crc
+        self.file_size = file_size
+        self.compress_size = compress_size
+        self.spool = spool
+        self.header_offset = 0
+
+    @property
+    def zip64(self) -> bool:
+        """Whether the sizes or the offset of the entry need ZIP64 fields."""
+        return max(self.file_size, self.compress_size, self.header_offset) > _ZIP64_LIMIT
+
+    def _fields(self) -> Tuple[int, int, int, int, int, bytes]:
+        name = self.info.filename.encode("utf-8")
+        flags = _UTF8_FLAG if not self.info.filename.isascii() else 0
+        version = 45 if self.zip64 else 20 if self.compress_type == zipfile.ZIP_DEFLATED else 10
+        year, month, day, hour, minute, second = self.info.date_time
+        dos_time = hour << 11 | minute << 5 | second // 2
+        dos_date = (year - 1980) << 9 | month << 5 | day
+        return version, flags, dos_time, dos_date, len(name), name
+
+    def local_header(self) -> bytes:
+        """The local file header, with the sizes in a ZIP64 extra field when they do not fit."""
+        version, flags, dos_time, dos_date, name_length, name = self._fields()
+        extra = b""
+        file_size, compress_size = self.file_size, self.compress_size
+        if self.zip64:
+            extra = _ZIP64_LOCAL_EXTRA.pack(1, 16, file_size, compress_size)
+            file_size = compress_size = _MAX_32
+        return _LOCAL_HEADER.pack(b"PK\x03\x04", version, 0, flags, self.compress_type, dos_time, dos_date,
+                                  self.crc, compress_size, file_size, name_length, len(extra)) + name + extra
+
+    def central_header(self) -> bytes:
+        """The central directory header, with the sizes and offset in a ZIP64 extra field when they do not fit."""
+        version, flags, dos_time, dos_date, name_length, name = self._fields()
+        extra = b""
+        file_size, compress_size, header_offset = self.file_size, self.compress_size, self.header_offset
+        if self.zip64:
+            extra = _ZIP64_CENTRAL_EXTRA.pack(1, 24, file_size, compress_size, header_offset)
+            file_size = compress_size = header_offset = _MAX_32
+        return _CENTRAL_HEADER.pack(b"PK\x01\x02", version, _CREATE_SYSTEM, version, 0, flags, self.compress_type,
+                                    dos_time, dos_date, self.crc, compress_size, file_size, name_length, len(extra),
+                                    0, 0, 0, self.info.external_attr, header_offset) + name + extra
+
+    def data_blocks(self) -> Iterable[bytes]:
+        """Yields the data of the entry as it is stored in the archive."""
+        if self.spool is not None:
+            self.spool.seek(0)
+            yield from iter(lambda: self.spool.read(_READ_SIZE), b"")
+            return
+        size = 0
+        with open(self.path, "rb") as file:
+            for block in iter(lambda: file.read(_READ_SIZE), b""):
+                size += len(block)
+                yield block
+        if size != self.file_size:
+            raise OSError(f"{self.path} changed while it was zipped.")
+
+    def close(self) -> None:
+        """Releases the spool of compressed data."""
+        if self.spool is not None:
+            self.spool.close()
+
+
+def _deflate_file(path: str, arcname: str, compresslevel: int) -> _Entry:
+    """Compresses a file to a raw deflate stream in a spool, computing its CRC-32 and sizes."""
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS)
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)  # pylint: disable=consider-using-with
+    crc, size = 0, 0
+    try:
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(_READ_SIZE), b""):
+                crc = zlib.crc32(block, crc)
+                size += len(block)
+                spool.write(compressor.compress(block))
+        spool.write(compressor.flush())
+    except BaseException:
+        spool.close()
+        raise
+    return _Entry(path, arcname, zipfile.ZIP_DEFLATED, crc, size, spool.tell(), spool)
+
+
+def _checksum_file(path: str, arcname: str) -> _Entry:
+    """Computes the CRC-32 and size of a file stored without compression; the data is read again when written."""
+    crc, size = 0, 0
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(_READ_SIZE), b""):
+            crc = zlib.crc32(block, crc)
+            size += len(block)
+    return _Entry(path, arcname, zipfile.ZIP_STORED, crc, size, size)
+
+
+class _CountingWriter:
+    """Writes to a stream and counts the bytes written, as the offsets in a non-seekable stream can not be told."""
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.offset = 0
+
+    def write(self, data: bytes) -> None:
+        """Writes all of data."""
+        self.stream.write(data)
+        self.offset += len(data)
+
+
+def _write_central_directory(writer: _CountingWriter, entries: List[_Entry]) -> None:
+    """Writes the central directory and the end records, in their ZIP64 form when the archive needs it."""
+    start = writer.offset
+    for entry in entries:
+        writer.write(entry.central_header())
+    size = writer.offset - start
+
+    count = len(entries)
+    if count > _ZIP64_ENTRY_LIMIT or max(size, start) > _ZIP64_LIMIT:
+        zip64_end = writer.offset
+        writer.write(_ZIP64_END_RECORD.pack(b"PK\x06\x06", _ZIP64_END_RECORD.size - 12, 45, 45, 0, 0,
+                                            count, count, size, start))
+        writer.write(_ZIP64_LOCATOR.pack(b"PK\x06\x07", 0, zip64_end, 1))
+        count, size, start = _MAX_16, _MAX_32, _MAX_32
+    writer.write(_END_RECORD.pack(b"PK\x05\x06", 0, 0, count, count, size, start, 0))
+
+
+def write_zip(
+    entries: Iterable[Tuple[str, str]],
+    destination: Union[str, BinaryIO],
+    compresslevel: int = 6,
+    max_workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    stored_extensions: Iterable[str] = STORED_EXTENSIONS,
+) -> None:
+    """
+    Writes files to a ZIP archive, deflating them in parallel.
+
+    Args:
+        entries (Iterable[Tuple[str, str]]): (path, archive name) pairs, written in this order.
+        destination (str or BinaryIO): Path of the archive, or a writable file-like object.
+        compresslevel (int): Deflate level (1-9) for files that are compressed, e.g. TIFF.
+        max_workers (int, optional): Number of compression threads. Defaults to the number of CPUs.
+        max_in_flight (int, optional): Maximum number of entries compressed ahead of the one being written,
+            each holding at most SPOOL_SIZE bytes in memory. Defaults to twice the number of workers.
+        stored_extensions (Iterable[str]): Extensions of files stored without compression.
+    """
+    stored_extensions = {extension.lower() for extension in stored_extensions}
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * max_workers
+    skip_path = os.path.realpath(destination) if isinstance(destination, str) else None
+
+    entries = iter([entry for entry in entries if os.path.realpath(entry[0]) != skip_path])
+    written: List[_Entry] = []
+
+    with open(destination, "wb") if isinstance(destination, str) else contextlib.nullcontext(destination) as stream, \
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="zip-deflate") as executor:
+        writer = _CountingWriter(stream)
+        pending = deque()
+
+        def fill() -> None:
+            while len(pending) < max_in_flight:
+                entry = next(entries, None)
+                if entry is None:
+                    return
+                path, arcname = entry
+                if os.path.splitext(path)[1].lower() in stored_extensions:
+                    pending.append(executor.submit(_checksum_file, path, arcname))
+                else:
+                    pending.append(executor.submit(_deflate_file, path, arcname, compresslevel))
+
+        try:
+            fill()
+            while pending:
+                entry = pending.popleft().result()
+                try:
+                    entry.header_offset = writer.offset
+                    writer.write(entry.local_header())
+                    for block in entry.data_blocks():
+                        writer.write(block)
+                finally:
+                    entry.close()
+                written.append(entry)
+                fill()
+
+            _write_central_directory(writer, written)
+        finally:
+            # Release the spools of entries compressed ahead when writing failed
+            for future in pending:
+                future.cancel()
+                if not future.cancelled() and future.exception() is None:
+                    future.result().close()
+
@@ -4,35 +4,221 @@ an interface to interact with the Solteq Tand database.
 """
 import pyodbc
 
+from mbu_dev_shared_components.utils.async_query_runner import AsyncQueryRunner
+from mbu_dev_shared_components.utils.incremental_sync import IncrementalSync
+from mbu_dev_shared_components.utils.query_builder import MAX_QUERY_PARAMETERS, build_sql_statement, chunks
+from mbu_dev_shared_components.utils.query_cache import QueryCache
+from mbu_dev_shared_components.utils.query_diagnostics import QueryDiagnostics
+from mbu_dev_shared_components.utils.row_records import rows_to_records
+
+# Process-level cache shared by all SolteqTandDatabase instances for reference
+# data such as clinics and keywords, which rarely changes during a robot run.
+REFERENCE_DATA_CACHE = QueryCache(ttl_seconds=12 * 3600, max_entries=256)
+
+
+# Base queries shared by the patient getters and get_patient_snapshot
+PRIMARY_DENTAL_CLINICS_QUERY = """
+    SELECT  p.cpr,
+            p.patientId,
+            p.firstName,
+            p.lastName,
+            p.preferredDentalClinicId,
+            p.isPreferredDentalClinicLocked,
+            c.name AS preferredDentalClinicName,
+            k.text AS patientStatus,
+            d.name AS clinicianName
+    FROM [tmtdata_prod].[dbo].[PATIENT] p
+    JOIN [CLINIC] c ON c.clinicId = p.preferredDentalClinicId
+    JOIN [KEYWORD] k ON k.keywordId = 'patientStatus' AND k.[value] = p.patientStatus
+    LEFT JOIN [DENTIST] d ON d.dentistId = p.dentistId
+    WHERE	1=1
+"""
+
+EXTERN_DENTIST_QUERY = """
+    SELECT	p.[patientId]
+            ,p.[cpr]
+            ,p.[privateClinicId]
+            ,c.[contractorId]
+            ,c.[isPrimary]
+            ,c.[name]
+            ,c.[streetAddress]
+            ,c.[zip]
+            ,c.[phoneNumber]
+    FROM	[tmtdata_prod].[dbo].[PATIENT] p
+    JOIN	[CLINIC] c on c.clinicId = p.privateClinicId
+    WHERE	1=1
+"""
+
+BOOKINGS_QUERY = """
+    SELECT  b.StartTime,
+            b.EndTime,
+            b.PatientNotified,
+            b.PatientNotifiedVia,
+            b.BookingText,
+            b.Warnings,
+            b.CreatedDateTime,
+            b.LastModifiedDateTime,
+            bt.Description,
+            bt.PrinterFriendlyText,
+            p.cpr
+    FROM [tmtdata_prod].[dbo].[BOOKING] b
+    JOIN PATIENT p on p.patientId = b.patientId
+    JOIN BOOKINGTYPE bt on bt.BookingTypeID = b.BookingTypeID
+    WHERE	1=1
+"""
+
+EVENTS_QUERY = """
+    SELECT  e.[eventId],
+            e.[type],
+            e.[currentStateText],
+            e.[currentStateDate],
+            e.[timestamp],
+            e.[clinicId],
+            c.name,
+            e.[entityId],
+            e.[eventTriggerDate],
+            p.cpr,
+            e.archived
+    FROM [EVENT] e
+    JOIN [PATIENT] p ON p.patientId = e.entityId
+    JOIN [CLINIC] c ON c.clinicId = e.clinicId
+    WHERE	1=1
+"""
+
+
+# Sections of a patient snapshot: base query and ordering
+PATIENT_SNAPSHOT_SECTIONS = {
+    "primary_dental_clinics": (PRIMARY_DENTAL_CLINICS_QUERY, None),
+    "extern_dentist": (EXTERN_DENTIST_QUERY, None),
+    "bookings": (BOOKINGS_QUERY, "b.StartTime"),
+    "events": (EVENTS_QUERY, "e.[timestamp]"),
+}
+
 
 class SolteqTandDatabase:
     """Handles database operations related to the Solteq Tand system."""
 
-    def __init__(self, conn_str: str):
+    def __init__(self, conn_str: str, query_cache: QueryCache = None, row_type: str = "dict", diagnostics: QueryDiagnostics = None):
         """
         Initializes the SolteqTandDatabase instance.
 
         Args:
             conn_str (str): Connection string to the Solteq Tand database.
+            query_cache (QueryCache, optional): Cache used for reference data queries.
+                Defaults to the process-level REFERENCE_DATA_CACHE. Pass a QueryCache with
+                a persist_path to reuse cached reference data between robot runs.
+            row_type (str): "dict" to return rows as dictionaries, or "record" to return compact
+                records supporting both key and attribute access (row["cpr"] and row.cpr).
+                Records retain about half the memory of dicts on large event and document scans.
+            diagnostics (QueryDiagnostics, optional): Enables diagnostics mode, recording timings, row counts,
+                STATISTICS TIME/IO output and optionally estimated plans for every query run by this instance.
         """
+        if row_type not in ("dict", "record"):
+            raise ValueError(f"row_type must be 'dict' or 'record', got {row_type!r}")
+
         self.connection_string = conn_str
+        self.row_type = row_type
+        self.query_cache = query_cache if query_cache is not None else REFERENCE_DATA_CACHE
+        self.diagnostics = diagnostics
 
-    def _execute_query(self, query: str, params: tuple):
+    def as_async(self, max_concurrency: int = 4) -> AsyncQueryRunner:
+        """
+        Returns an asyncio-facing wrapper, where every public method of this instance is a coroutine.
+
+        Args:
+            max_concurrency (int): Maximum number of queries running against the Solteq Tand database at the same time.
+
+        Returns:
+            AsyncQueryRunner: The async wrapper around this instance.
+        """
+        return AsyncQueryRunner(self, max_concurrency=max_concurrency)
+
+    def _execute_query(self, query: str, params: tuple, cache: bool = False, label: str = "query"):
         """
         Executes a SQL query with parameters and returns the results as a list of dictionaries.
 
         Args:
             query (str): The SQL query to execute.
             params (tuple): The parameters for the SQL query.
+            cache (bool): Whether to serve the result from the query cache, querying the database on a miss.
+            label (str): Name of the query in the diagnostics, usually the name of the getter.
 
         Returns:
             list: A list of dictionaries, where each dictionary represents a row from the query result.
         """
-        conn = pyodbc.connect(self.connection_string)
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        columns = [column[0] for column in cursor.description]
+        if cache:
+            # The row type is part of the namespace, as instances share the process-level cache
+            key = QueryCache.make_key(query, params, namespace=f"{self.row_type}:{self.connection_string}")
+            rows = self.query_cache.get_or_load(key, lambda: self._fetch_rows(query, params, label))
+            # Hand out copies, so callers modifying rows do not modify the cache
+            return [row.copy() for row in rows]
+
+        return self._fetch_rows(query, params, label)
+
+    def _connect(self):
+        """
+        Opens a connection to the Solteq Tand database.
+
+        Returns:
+            pyodbc.Connection: The connection. Subclasses may return any DB-API connection
+                with a pyodbc compatible cursor, e.g. a local fixture database for load testing.
+        """
+        return pyodbc.connect(self.connection_string)
+
+    def _fetch_rows(self, query: str, params: tuple, label: str = "query"):
+        """
+        Runs a SQL query against the database and returns the results as a list of dictionaries.
+
+        Args:
+            query (str): The SQL query to execute.
+            params (tuple): The parameters for the SQL query.
+            label (str): Name of the query in the diagnostics.
+
+        Returns:
+            list: A list of dictionaries (or records, see row_type), where each represents a row from the query result.
+        """
+        conn = self._connect()
+        if self.diagnostics is not None:
+            columns, rows = self.diagnostics.execute(conn, query, params, label=label)
+        else:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            columns = [column[0] for column in cursor.description]
+
+        return self._to_rows(columns, rows)
+
+    def _fetch_result_sets(self, query: str, params: tuple, label: str = "query") -> list:
+        """
+        Runs a batch of SQL statements in one round trip and returns the rows of every result set.
+
+        Args:
+            query (str): The SQL statements, separated by semicolons.
+            params (tuple): The parameters for all statements of the batch, in order.
+            label (str): Name of the batch in the diagnostics.
+
+        Returns:
+            list: A list of dictionaries (or records, see row_type) per result set, in statement order.
+        """
+        conn = self._connect()
+        if self.diagnostics is not None:
+            result_sets = self.diagnostics.execute_batch(conn, query, params, label=label)
+        else:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            result_sets = []
+            while True:
+                if cursor.description is not None:
+                    result_sets.append(([column[0] for column in cursor.description], cursor.fetchall()))
+                if not cursor.nextset():
+                    break
+
+        return [self._to_rows(columns, rows) for columns, rows in result_sets]
+
+    def _to_rows(self, columns: list, rows: list) -> list:
+        """Converts fetched rows to dictionaries or records, see row_type."""
+        if self.row_type == "record":
+            return rows_to_records(columns, rows)
 
         result = [dict(zip(columns, row)) for row in rows]
 
@@ -42,6 +228,9 @@ class SolteqTandDatabase:
         """
         Dynamically constructs a SQL query by applying filters.
 
+        See mbu_dev_shared_components.utils.query_builder for the supported filter values,
+        including NOT IN, IS NULL and nested And/Or groups.
+
         Args:
             base_query (str): The base SQL query with a WHERE clause.
             filters (dict, optional): Key-value pairs for AND conditions.
@@ -50,85 +239,7 @@ class SolteqTandDatabase:
         Returns:
             tuple: The final SQL query and the corresponding parameters.
         """
-        params = []
-        where_clauses = []
-        COMPARATORS = {"<", "<=", ">", ">="}
-
-        # Handling AND filters
-        if filters:
-            for key, value in filters.items():
-                # Explicit comparator (tuple with operator and value)
-                # Example: {"column": ("<", value)}
-                if (
-                    isinstance(value, tuple)
-                    and len(value) == 2
-                    and value[0] in COMPARATORS
-                ):
-                    op, val = value
-                    where_clauses.append(f"{key} {op} ?")
-                    params.append(val)
-
-                # BETWEEN filtering (tuple of two values)
-                # Example: {"column": (value1, value2)}
-                elif isinstance(value, tuple) and len(value) == 2:
-                    where_clauses.append(f"{key} BETWEEN ? AND ?")
-                    params.extend(value)
-
-                # IN filtering
-                # Example: {"column": [value1, value2, ...]}
-                elif isinstance(value, list):
-                    placeholders = ", ".join("?" for _ in value)
-                    where_clauses.append(f"{key} IN ({placeholders})")
-                    params.extend(value)
-
-                # LIKE filtering
-                # Example: {"column": "value%"}
-                elif isinstance(value, str) and "%" in value:
-                    where_clauses.append(f"{key} LIKE ?")
-                    params.append(value)
-
-                # Default equality filtering
-                # Example: {"column": value}
-                else:
-                    where_clauses.append(f"{key} = ?")
-                    params.append(value)
-
-        # Handling OR filters
-        or_clauses = []
-        if or_filters:
-            for or_filter in or_filters:
-                sub_clauses = []
-                sub_params = []
-                for key, value in or_filter.items():
-                    if isinstance(value, list):
-                        placeholders = ", ".join("?" for _ in value)
-                        sub_clauses.append(f"{key} IN ({placeholders})")
-                        sub_params.extend(value)
-                    elif isinstance(value, str) and "%" in value:
-                        sub_clauses.append(f"{key} LIKE ?")
-                        sub_params.append(value)
-                    else:
-                        sub_clauses.append(f"{key} = ?")
-                        sub_params.append(value)
-
-                if sub_clauses:
-                    or_clauses.append(f"({' OR '.join(sub_clauses)})")
-                    params.extend(sub_params)
-
-        # Adding AND filters
-        if where_clauses:
-            base_query += " AND " + " AND ".join(where_clauses)
-
-        # Adding OR filters
-        if or_clauses:
-            base_query += " AND (" + " OR ".join(or_clauses) + ")"
-
-        # Adding ORDER BY clause
-        if order_by:
-            order_direction = "ASC" if order_direction.upper() not in ["ASC", "DESC"] else order_direction.upper()
-            base_query += f" ORDER BY {order_by} {order_direction}"
-
-        return base_query, params
+        return build_sql_statement(base_query, filters, or_filters, order_by, order_direction)
 
     def get_list_of_documents(self, filters=None, or_filters=None, order_by=None, order_direction="ASC"):
         """
@@ -186,7 +297,7 @@ class SolteqTandDatabase:
         """
         final_query, params = self._construct_sql_statement(base_query, filters, or_filters, order_by, order_direction)
 
-        return self._execute_query(final_query, params)
+        return self._execute_query(final_query, params, label="get_list_of_documents")
 
     def get_list_of_extern_dentist(self, filters=None, or_filters=None, order_by=None, order_direction="ASC"):
         """
@@ -199,22 +310,9 @@ class SolteqTandDatabase:
         Returns:
             list: A list of external dentist records.
         """
-        base_query = """
-            SELECT	p.[patientId]
-                    ,p.[cpr]
-                    ,p.[privateClinicId]
-                    ,c.[contractorId]
-                    ,c.[isPrimary]
-                    ,c.[name]
-                    ,c.[streetAddress]
-                    ,c.[zip]
-                    ,c.[phoneNumber]
-            FROM	[tmtdata_prod].[dbo].[PATIENT] p
-            JOIN	[CLINIC] c on c.clinicId = p.privateClinicId
-            WHERE	1=1
-        """
+        base_query = EXTERN_DENTIST_QUERY
         final_query, params = self._construct_sql_statement(base_query, filters, or_filters, order_by, order_direction)
-        return self._execute_query(final_query, params)
+        return self._execute_query(final_query, params, label="get_list_of_extern_dentist")
 
     def get_list_of_bookings(self, filters=None, or_filters=None, order_by=None, order_direction="ASC"):
         """
@@ -227,25 +325,10 @@ class SolteqTandDatabase:
         Returns:
             list: A list of booking records.
         """
-        base_query = """
-            SELECT  b.StartTime,
-                    b.EndTime,
-                    b.PatientNotified,
-                    b.PatientNotifiedVia,
-                    b.BookingText,
-                    b.Warnings,
-                    b.CreatedDateTime,
-                    b.LastModifiedDateTime,
-                    bt.Description,
-                    bt.PrinterFriendlyText
-            FROM [tmtdata_prod].[dbo].[BOOKING] b
-            JOIN PATIENT p on p.patientId = b.patientId
-            JOIN BOOKINGTYPE bt on bt.BookingTypeID = b.BookingTypeID
-            WHERE	1=1
-        """
+        base_query = BOOKINGS_QUERY
         final_query, params = self._construct_sql_statement(base_query, filters, or_filters, order_by, order_direction)
 
-        return self._execute_query(final_query, params)
+        return self._execute_query(final_query, params, label="get_list_of_bookings")
 
     def get_list_of_events(self, filters=None, or_filters=None, order_by=None, order_direction="ASC"):
         """
@@ -258,55 +341,111 @@ class SolteqTandDatabase:
         Returns:
             list: A list of event records matching the criteria.
         """
-        base_query = """
-            SELECT  e.[eventId],
-                    e.[type],
-                    e.[currentStateText],
-                    e.[currentStateDate],
-                    e.[timestamp],
-                    e.[clinicId],
-                    c.name,
-                    e.[entityId],
-                    e.[eventTriggerDate],
-                    p.cpr,
-                    e.archived
-            FROM [EVENT] e
-            JOIN [PATIENT] p ON p.patientId = e.entityId
-            JOIN [CLINIC] c ON c.clinicId = e.clinicId
-            WHERE	1=1
-        """
+        base_query = EVENTS_QUERY
         final_query, params = self._construct_sql_statement(base_query, filters, or_filters, order_by, order_direction)
-        return self._execute_query(final_query, params)
+        return self._execute_query(final_query, params, label="get_list_of_events")
+
+    def get_new_bookings(self, sync: IncrementalSync, sync_key: str, filters=None, or_filters=None, commit=True):
+        """
+        Retrieves the bookings created or modified since the last run with the same sync key.
+
+        Uses BOOKING.LastModifiedDateTime as watermark. Bookings re-read in the overlap
+        window of the synchronizer are only returned again if any of their values changed.
 
-    def get_list_of_primary_dental_clinics(self, filters=None, or_filters=None, order_by=None, order_direction="ASC"):
+        Args:
+            sync (IncrementalSync): The synchronizer persisting the watermarks.
+            sync_key (str): Name identifying this query. Use one key per distinct set of filters.
+            filters (dict, optional): Filtering criteria for booking retrieval.
+            or_filters (list of dict, optional): OR conditions for filtering.
+            commit (bool): Whether to persist the new watermark right away, see IncrementalSync.fetch.
+
+        Returns:
+            list: The new or changed booking records, ordered by LastModifiedDateTime.
+        """
+        def fetch_rows(since):
+            sync_filters = dict(filters or {})
+            if since is not None:
+                sync_filters["b.LastModifiedDateTime"] = (">=", since)
+            return self.get_list_of_bookings(sync_filters, or_filters, order_by="b.LastModifiedDateTime")
+
+        return sync.fetch(sync_key, fetch_rows, timestamp_column="LastModifiedDateTime", commit=commit)
+
+    def get_new_events(self, sync: IncrementalSync, sync_key: str, filters=None, or_filters=None, commit=True):
+        """
+        Retrieves the events created or changed since the last run with the same sync key.
+
+        Uses EVENT.timestamp as watermark. Events re-read in the overlap window of the
+        synchronizer are only returned again if any of their values changed.
+
+        Args:
+            sync (IncrementalSync): The synchronizer persisting the watermarks.
+            sync_key (str): Name identifying this query. Use one key per distinct set of filters.
+            filters (dict, optional): Filtering criteria for event retrieval.
+            or_filters (list of dict, optional): OR conditions for filtering.
+            commit (bool): Whether to persist the new watermark right away, see IncrementalSync.fetch.
+
+        Returns:
+            list: The new or changed event records, ordered by timestamp.
+        """
+        def fetch_rows(since):
+            sync_filters = dict(filters or {})
+            if since is not None:
+                sync_filters["e.[timestamp]"] = (">=", since)
+            return self.get_list_of_events(sync_filters, or_filters, order_by="e.[timestamp]")
+
+        return sync.fetch(sync_key, fetch_rows, timestamp_column="timestamp", commit=commit)
+
+    def get_list_of_primary_dental_clinics(self, filters=None, or_filters=None, order_by=None, order_direction="ASC", cache=False):
         """
         Retrieves details of the primary dental clinics associated with the patient.
 
         Args:
             filters (dict, optional): Filtering criteria for clinic retrieval.
             or_filters (list of dict, optional): OR conditions for filtering.
+            cache (bool): Whether to serve the result from the query cache. Off by default,
+                since the patient status and preferred clinic can change at any time.
 
         Returns:
             list: A list of primary dental clinic details.
         """
-        base_query = """
-            SELECT  p.cpr,
-                    p.patientId,
-                    p.firstName,
-                    p.lastName,
-                    p.preferredDentalClinicId,
-                    p.isPreferredDentalClinicLocked,
-                    c.name AS preferredDentalClinicName,
-                    k.text AS patientStatus,
-                    d.name AS clinicianName
-            FROM [tmtdata_prod].[dbo].[PATIENT] p
-            JOIN [CLINIC] c ON c.clinicId = p.preferredDentalClinicId
-            JOIN [KEYWORD] k ON k.keywordId = 'patientStatus' AND k.[value] = p.patientStatus
-            LEFT JOIN [DENTIST] d ON d.dentistId = p.dentistId
-            WHERE	1=1
-        """
+        base_query = PRIMARY_DENTAL_CLINICS_QUERY
         final_query, params = self._construct_sql_statement(base_query, filters, or_filters, order_by, order_direction)
-        return self._execute_query(final_query, params)
+        return self._execute_query(final_query, params, cache=cache, label="get_list_of_primary_dental_clinics")
+
+    def get_patient_snapshot(self, cpr):
+        """
+        Retrieves the primary dental clinic, external dentist, bookings and events of one or more patients.
+
+        All four lookups are sent as one batch per connection, instead of one connection
+        and query per getter. Lists of CPR numbers are split into batches that stay below
+        the parameter limit of SQL Server.
+
+        Args:
+            cpr (str or list of str): The CPR number of the patient, or a list of CPR numbers.
+
+        Returns:
+            dict: For a single CPR number, the snapshot with the keys primary_dental_clinics,
+                extern_dentist, bookings (ordered by StartTime) and events (ordered by timestamp),
+                each a list of rows as returned by the corresponding getter.
+                For a list, a dictionary of CPR number to snapshot, including empty snapshots
+                for CPR numbers without a patient.
+        """
+        cprs = [cpr] if isinstance(cpr, str) else list(dict.fromkeys(cpr))
+        snapshots = {value: {section: [] for section in PATIENT_SNAPSHOT_SECTIONS} for value in cprs}
+
+        for chunk in chunks(cprs, MAX_QUERY_PARAMETERS // len(PATIENT_SNAPSHOT_SECTIONS)):
+            statements, params = [], []
+            for base_query, order_by in PATIENT_SNAPSHOT_SECTIONS.values():
+                statement, statement_params = self._construct_sql_statement(base_query, {"p.cpr": chunk}, order_by=order_by)
+                statements.append(statement)
+                params.extend(statement_params)
+
+            result_sets = self._fetch_result_sets(";\n".join(statements), params, label="get_patient_snapshot")
+            for section, rows in zip(PATIENT_SNAPSHOT_SECTIONS, result_sets):
+                for row in rows:
+                    snapshots[row["cpr"]][section].append(row)
+
+        return snapshots[cpr] if isinstance(cpr, str) else snapshots
 
     def get_list_of_journal_notes(self, filters=None, or_filters=None, order_by=None, order_direction="ASC"):
         """
@@ -339,15 +478,16 @@ class SolteqTandDatabase:
             WHERE	1=1
         """
         final_query, params = self._construct_sql_statement(base_query, filters, or_filters, order_by, order_direction)
-        return self._execute_query(final_query, params)
+        return self._execute_query(final_query, params, label="get_list_of_journal_notes")
 
-    def get_list_of_clinics(self, filters=None, or_filters=None, order_by=None, order_direction="ASC"):
+    def get_list_of_clinics(self, filters=None, or_filters=None, order_by=None, order_direction="ASC", cache=True):
         """
         Retrieves a list of clinics.
 
         Args:
             filters (dict, optional): Filtering criteria for external dentists.
             or_filters (list of dict, optional): OR conditions for filtering.
+            cache (bool): Whether to serve the result from the query cache. Pass False to always query the database.
 
         Returns:
             list: A list of external dentist records.
@@ -367,4 +507,28 @@ class SolteqTandDatabase:
             WHERE	1=1
         """
         final_query, params = self._construct_sql_statement(base_query, filters, or_filters, order_by, order_direction)
-        return self._execute_query(final_query, params)
+        return self._execute_query(final_query, params, cache=cache, label="get_list_of_clinics")
+
+    def get_list_of_keywords(self, filters=None, or_filters=None, order_by=None, order_direction="ASC", cache=True):
+        """
+        Retrieves a list of keywords, i.e. the lookup values used for fields such as patientStatus.
+
+        Args:
+            filters (dict, optional): Filtering criteria for keywords, e.g. {"k.keywordId": "patientStatus"}.
+            or_filters (list of dict, optional): OR conditions for filtering.
+            cache (bool): Whether to serve the result from the query cache. Pass False to always query the database.
+
+        Returns:
+            list: A list of keyword records.
+        """
+        base_query = """
+            SELECT
+                k.keywordId
+                ,k.[value]
+                ,k.text
+            FROM
+                [tmtdata_prod].[dbo].[KEYWORD] k
+            WHERE	1=1
+        """
+        final_query, params = self._construct_sql_statement(base_query, filters, or_filters, order_by, order_direction)
+        return self._execute_query(final_query, params, cache=cache, label="get_list_of_keywords")
@@ -0,0 +1,90 @@
+"""
+This module provides an asyncio-facing wrapper around the blocking database
+handlers (e.g. SolteqTandDatabase and RomexisDbHandler).
+
+pyodbc has no async API, so the handler methods are run on a bounded thread
+pool owned by the wrapper. Each wrapped database gets its own pool, which makes
+the pool size the concurrency limit for that database, while lookups against
+different databases can be awaited concurrently, e.g. with asyncio.gather.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class AsyncQueryRunner:
+    """
+    Exposes the public methods of a database handler as coroutines.
+
+    Example:
+        solteq = SolteqTandDatabase(solteq_conn_str).as_async(max_concurrency=4)
+        romexis = RomexisDbHandler(romexis_conn_str).as_async(max_concurrency=2)
+        async with solteq, romexis:
+            bookings, persons = await asyncio.gather(
+                solteq.get_list_of_bookings(filters={"p.cpr": cpr}),
+                romexis.get_person_data(cpr),
+            )
+    """
+
+    def __init__(self, handler: Any, max_concurrency: int = 4):
+        """
+        Initializes the runner.
+
+        Args:
+            handler (Any): The database handler whose methods should be awaitable.
+            max_concurrency (int): Maximum number of queries running against the database at the same time.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+
+        self.handler = handler
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix=f"{type(handler).__name__}-query",
+        )
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Runs a blocking callable on the runner's thread pool and awaits its result.
+
+        Args:
+            func (Callable): The blocking function to run.
+            *args: Positional arguments for the function.
+            **kwargs: Keyword arguments for the function.
+
+        Returns:
+            Any: The return value of the function.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.handler, name)
+        if name.startswith("_") or not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        async def wrapper(*args, **kwargs):
+            return await self.run(attribute, *args, **kwargs)
+
+        return wrapper
+
+    def close(self, wait: bool = True) -> None:
+        """
+        Shuts down the thread pool, and closes the handler if it supports it.
+
+        Args:
+            wait (bool): Whether to wait for running queries to finish.
+        """
+        self._executor.shutdown(wait=wait)
+        close_handler = getattr(self.handler, "close", None)
+        if callable(close_handler):
+            close_handler()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
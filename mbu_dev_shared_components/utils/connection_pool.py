@@ -0,0 +1,189 @@
+"""
+This module provides a small thread-safe connection pool for the database handlers.
+
+Opening a pyodbc connection costs a login handshake with the server, which can
+take longer than the query itself. The pool keeps up to max_size idle connections
+for reuse; more connections can be open at the same time, but only max_size are
+kept when they are released. A connection that raised an error while in use is
+closed instead of being returned, so a broken connection is never handed out again.
+
+pyodbc connections are not in autocommit mode, so a released connection is rolled
+back before it is kept, and its transaction, locks and temporary state do not leak
+to the next borrower. A connection idle for a while may have been dropped by the
+server in the meantime, so a connection idle for ping_after seconds or more is
+checked with a ping query before it is handed out, and a new connection is opened
+in its place when the check fails. Connections reused sooner are handed out
+without the extra round trip; should one fail anyway, it is discarded on the error.
+
+Handlers connecting to the same database share a pool through shared_pool,
+keyed by the connection string.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+
+class ConnectionPool:
+    """
+    Pool of reusable connections created by a connect callable.
+
+    Example:
+        pool = ConnectionPool(lambda: pyodbc.connect(conn_str), max_size=4)
+        with pool.connection() as conn:
+            conn.cursor().execute("SELECT 1")
+    """
+
+    def __init__(self, connect: Callable[[], Any], max_size: int = 4, ping_query: str = "SELECT 1", ping_after: float = 30.0):
+        """
+        Initializes the pool. Connections are opened lazily.
+
+        Args:
+            connect (Callable[[], Any]): Opens a new DB-API connection.
+            max_size (int): Maximum number of idle connections kept for reuse.
+            ping_query (str): Query checking that an idle connection is still alive before it is handed out.
+            ping_after (float): Seconds a connection must have been idle to be checked with the ping query.
+                0 checks every connection handed out again.
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1.")
+
+        self._connect = connect
+        self.max_size = max_size
+        self.ping_query = ping_query
+        self.ping_after = ping_after
+        # (connection, time.monotonic() when it was released)
+        self._idle: List[Tuple[Any, float]] = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Any:
+        """
+        Returns a live idle connection, or a new one when none is idle.
+
+        Connections idle for ping_after seconds or more are checked with the ping query,
+        and closed and skipped when it fails.
+
+        Returns:
+            Any: The connection. Hand it back with release.
+        """
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, released_at = self._idle.pop()
+            if time.monotonic() - released_at < self.ping_after or self._is_alive(conn):
+                return conn
+            _close_quietly(conn)
+        return self._connect()
+
+    def _is_alive(self, conn: Any) -> bool:
+        """Runs the ping query on the connection, returning whether it succeeded."""
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self.ping_query)
+                cursor.fetchall()
+            finally:
+                cursor.close()
+        except Exception:  # pylint: disable=broad-except
+            # Any error means the connection can not be used, e.g. a dropped link or a closed connection
+            return False
+        return True
+
+    def release(self, conn: Any, discard: bool = False) -> None:
+        """
+        Returns a connection to the pool, after rolling back its open transaction.
+
+        A connection that can not be rolled back is closed instead.
+
+        Args:
+            conn (Any): A connection from acquire.
+            discard (bool): Whether to close the connection instead, e.g. after an error.
+        """
+        if not discard and _roll_back(conn):
+            with self._lock:
+                if len(self._idle) < self.max_size:
+                    self._idle.append((conn, time.monotonic()))
+                    return
+        _close_quietly(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """
+        Context manager acquiring a connection and releasing it on exit.
+        The connection is discarded if the block raises.
+
+        Yields:
+            Any: The connection.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException:
+            self.release(conn, discard=True)
+            raise
+        self.release(conn)
+
+    @property
+    def idle_count(self) -> int:
+        """Number of idle connections in the pool."""
+        with self._lock:
+            return len(self._idle)
+
+    def close(self) -> None:
+        """
+        Closes the idle connections. The pool stays usable: connections in use are
+        released as usual, and new connections are opened when needed.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            _close_quietly(conn)
+
+
+def _roll_back(conn: Any) -> bool:
+    """Rolls back the connection's transaction, returning whether it succeeded."""
+    try:
+        conn.rollback()
+    except Exception:  # pylint: disable=broad-except
+        return False
+    return True
+
+
+def _close_quietly(conn: Any) -> None:
+    try:
+        conn.close()
+    except Exception:  # pylint: disable=broad-except
+        # The connection is being thrown away, e.g. because the server already closed it
+        pass
+
+
+_SHARED_POOLS: Dict[str, ConnectionPool] = {}
+_SHARED_POOLS_LOCK = threading.Lock()
+
+
+def shared_pool(key: str, connect: Callable[[], Any], max_size: int = 4) -> ConnectionPool:
+    """
+    Returns the process-wide pool for key, creating it on first use.
+
+    Args:
+        key (str): Identifies the database, e.g. the connection string.
+        connect (Callable[[], Any]): Opens a new connection, used when the pool is created.
+        max_size (int): Maximum number of idle connections, used when the pool is created.
+
+    Returns:
+        ConnectionPool: The shared pool.
+    """
+    with _SHARED_POOLS_LOCK:
+        pool = _SHARED_POOLS.get(key)
+        if pool is None:
+            pool = _SHARED_POOLS[key] = ConnectionPool(connect, max_size=max_size)
+        return pool
+
+
+def close_shared_pools() -> None:
+    """Closes the idle connections of all shared pools, e.g. at the end of a robot run."""
+    with _SHARED_POOLS_LOCK:
+        pools = list(_SHARED_POOLS.values())
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,121 @@
+"""
+This module provides incremental ("changed since") synchronization of query results.
+
+Instead of re-reading a full filtered result set on every run, only rows whose
+timestamp column is at or after the last persisted watermark are fetched. To
+tolerate clock skew and rows committed late with an older timestamp, the
+query starts an overlap window before the watermark; rows already returned in
+an earlier run are recognized by their identity and suppressed.
+"""
+import datetime
+import hashlib
+from typing import Callable, Iterable, Optional
+
+from mbu_dev_shared_components.utils.watermark_store import WatermarkStore
+
+
+class IncrementalSync:
+    """
+    Tracks watermarks per sync key and filters out rows already seen.
+
+    Example:
+        sync = IncrementalSync("C:/robot/state/solteq_sync.json")
+        new_events = db.get_new_events(sync, "afgang_751", filters={"e.type": "AFGANG"})
+    """
+
+    def __init__(self, store_path: str, overlap: datetime.timedelta = datetime.timedelta(minutes=10), initial_watermark: Optional[datetime.datetime] = None):
+        """
+        Initializes the synchronizer.
+
+        Args:
+            store_path (str): Path to the JSON file the watermarks are persisted in.
+            overlap (datetime.timedelta): How far before the watermark each run starts reading.
+            initial_watermark (datetime.datetime, optional): Watermark used for keys never synchronized before.
+                When omitted, the first run reads the full filtered result set.
+        """
+        self.store = WatermarkStore(store_path)
+        self.overlap = overlap
+        self.initial_watermark = initial_watermark
+        self._pending = {}
+
+    def fetch(self, sync_key: str, fetch_rows: Callable[[Optional[datetime.datetime]], list], timestamp_column: str, identity_columns: Optional[Iterable[str]] = None, commit: bool = True) -> list:
+        """
+        Fetches the rows changed since the last run for a sync key.
+
+        Args:
+            sync_key (str): Name identifying the synchronized query. Use one key per distinct set of filters.
+            fetch_rows (Callable): Function returning the rows with a timestamp at or after the given
+                datetime (or all rows when given None), ordered by timestamp.
+            timestamp_column (str): Name of the timestamp column in the returned rows.
+            identity_columns (Iterable[str], optional): Columns identifying a row. Defaults to all columns,
+                so a row changed without its timestamp changing is returned again.
+            commit (bool): Whether to persist the new watermark right away. Pass False to only persist
+                it by calling commit(sync_key) once the returned rows are processed.
+
+        Returns:
+            list: The rows not returned by any earlier run.
+        """
+        watermark, seen = self.store.get(sync_key)
+        if watermark is None:
+            watermark = self.initial_watermark
+        since = watermark - self.overlap if watermark is not None else None
+
+        rows = fetch_rows(since)
+        identity_columns = tuple(identity_columns) if identity_columns else None
+
+        new_rows = []
+        identities = []
+        for row in rows:
+            identity = _row_identity(row, identity_columns)
+            identities.append(identity)
+            if identity not in seen:
+                new_rows.append(row)
+
+        timestamps = [row[timestamp_column] for row in rows if row[timestamp_column] is not None]
+        if timestamps:
+            new_watermark = max(timestamps)
+            if watermark is not None:
+                new_watermark = max(new_watermark, watermark)
+            # Remember the rows inside the next run's overlap window, so they are not returned twice
+            window_start = new_watermark - self.overlap
+            new_seen = {
+                identity
+                for row, identity in zip(rows, identities)
+                if row[timestamp_column] is not None and row[timestamp_column] >= window_start
+            }
+            self._pending[sync_key] = (new_watermark, new_seen)
+        else:
+            self._pending.pop(sync_key, None)
+
+        if commit:
+            self.commit(sync_key)
+
+        return new_rows
+
+    def commit(self, sync_key: str) -> None:
+        """
+        Persists the watermark of the last fetch for a sync key.
+
+        Args:
+            sync_key (str): Name identifying the synchronized query.
+        """
+        pending = self._pending.pop(sync_key, None)
+        if pending is not None:
+            self.store.set(sync_key, *pending)
+
+    def reset(self, sync_key: str) -> None:
+        """
+        Forgets the watermark for a sync key, so the next fetch starts over.
+
+        Args:
+            sync_key (str): Name identifying the synchronized query.
+        """
+        self._pending.pop(sync_key, None)
+        self.store.reset(sync_key)
+
+
+def _row_identity(row, identity_columns: Optional[tuple]) -> str:
+    """Returns a stable identity for a row, hashed from the identity columns or all columns."""
+    columns = identity_columns or tuple(row.keys())
+    values = "\x1f".join(f"{column}={row[column]!r}" for column in columns)
+    return hashlib.sha1(values.encode("utf-8")).hexdigest()
@@ -0,0 +1,249 @@
+"""
+This module provides a connection-free builder for parameterized SQL WHERE and
+ORDER BY clauses from filter dictionaries, shared by the database handlers.
+
+A filter dictionary maps a column to a value, and the kind of value decides the condition:
+
+    {"p.cpr": "0101011234"}              p.cpr = ?
+    {"p.cpr": None}                      p.cpr IS NULL
+    {"e.name": "%Klinik%"}               e.name LIKE ?
+    {"e.type": ["A", "B"]}               e.type IN (?, ?)
+    {"e.date": ("2024-01-01", "2024-12-31")}
+                                         e.date BETWEEN ? AND ?
+    {"e.date": ("<", "2024-01-01")}      e.date < ?   (also <=, >, >=, =, <>, !=)
+    {"e.type": ("NOT IN", ["A", "B"])}   e.type NOT IN (?, ?)   (also IN)
+    {"e.name": ("NOT LIKE", "%Test%")}   e.name NOT LIKE ?      (also LIKE)
+    {"p.dentistId": ("IS NOT", None)}    p.dentistId IS NOT NULL (also IS)
+
+Operators are matched case-sensitively, so a BETWEEN on text values such as
+("in", "out") is not mistaken for an operator.
+
+Conditions in a dictionary are combined with AND. Nested AND/OR groups are
+built with the And and Or classes, which take dictionaries or other groups:
+
+    Or({"e.type": "A"}, And({"e.type": "B"}, {"e.archived": 0}))
+                                         ((e.type = ?) OR ((e.type = ?) AND (e.archived = ?)))
+
+Values are always passed as parameters. Column names and ORDER BY can not be
+parameterized, so a builder can be given the allowed columns, in which case any
+other column raises a ValueError.
+"""
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# SQL Server accepts at most 2100 parameters per request
+MAX_QUERY_PARAMETERS = 2000
+
+_COMPARATORS = {"<", "<=", ">", ">=", "=", "<>", "!="}
+_SET_OPERATORS = {"IN", "NOT IN"}
+_LIKE_OPERATORS = {"LIKE", "NOT LIKE"}
+_NULL_OPERATORS = {"IS", "IS NOT"}
+_OPERATORS = _COMPARATORS | _SET_OPERATORS | _LIKE_OPERATORS | _NULL_OPERATORS
+_ORDER_DIRECTIONS = {"ASC", "DESC"}
+
+
+class _Group:
+    """Base class for nested groups of filter dictionaries and other groups."""
+    joiner = ""
+
+    def __init__(self, *items):
+        if not items:
+            raise ValueError(f"{type(self).__name__} needs at least one filter dictionary or group.")
+        for item in items:
+            if not isinstance(item, (dict, _Group)):
+                raise TypeError(f"{type(self).__name__} takes dictionaries or groups, got {type(item).__name__}.")
+        self.items = items
+
+    def __repr__(self):
+        return f"{type(self).__name__}{self.items!r}"
+
+
+class And(_Group):
+    """Group whose items must all match."""
+    joiner = " AND "
+
+
+class Or(_Group):
+    """Group where at least one item must match."""
+    joiner = " OR "
+
+
+class QueryBuilder:
+    """Builds parameterized WHERE and ORDER BY clauses from filters."""
+
+    def __init__(self, allowed_columns: Optional[Iterable[str]] = None):
+        """
+        Initializes the builder.
+
+        Args:
+            allowed_columns (Iterable[str], optional): Columns allowed in filters and ORDER BY.
+                When omitted, any column is accepted.
+        """
+        self.allowed_columns = frozenset(allowed_columns) if allowed_columns is not None else None
+
+    def _check_column(self, column: str) -> None:
+        if self.allowed_columns is not None and column not in self.allowed_columns:
+            raise ValueError(f"Column {column!r} is not allowed in this query.")
+
+    def condition(self, column: str, value, params: list) -> str:
+        """
+        Returns the SQL condition for a single column and value, appending its parameters.
+
+        Args:
+            column (str): The column, e.g. "p.cpr".
+            value: The value, see the module documentation for the supported kinds.
+            params (list): List the parameters of the condition are appended to.
+
+        Returns:
+            str: The condition with ? placeholders.
+        """
+        self._check_column(column)
+
+        if isinstance(value, tuple) and len(value) == 2:
+            operator = value[0] if isinstance(value[0], str) else None
+
+            # Explicit operator, e.g. ("<", value) or ("NOT IN", [value1, value2])
+            if operator in _OPERATORS:
+                operand = value[1]
+                if operator in _COMPARATORS:
+                    if operand is None and operator in ("=", "<>", "!="):
+                        return f"{column} IS NULL" if operator == "=" else f"{column} IS NOT NULL"
+                    params.append(operand)
+                    return f"{column} {operator} ?"
+                if operator in _SET_OPERATORS:
+                    return self._set_condition(column, operator, operand, params)
+                if operator in _LIKE_OPERATORS:
+                    params.append(operand)
+                    return f"{column} {operator} ?"
+                if operand is not None:
+                    raise ValueError(f"{operator} can only be used with None, got {operand!r} for {column!r}.")
+                return f"{column} {operator} NULL"
+
+            # BETWEEN filtering, e.g. (value1, value2)
+            params.extend(value)
+            return f"{column} BETWEEN ? AND ?"
+
+        if isinstance(value, list):
+            return self._set_condition(column, "IN", value, params)
+
+        if value is None:
+            return f"{column} IS NULL"
+
+        if isinstance(value, str) and "%" in value:
+            params.append(value)
+            return f"{column} LIKE ?"
+
+        params.append(value)
+        return f"{column} = ?"
+
+    @staticmethod
+    def _set_condition(column: str, operator: str, values, params: list) -> str:
+        values = list(values)
+        if not values:
+            # An empty IN matches nothing and an empty NOT IN everything. SQL Server rejects "IN ()".
+            return "1=0" if operator == "IN" else "1=1"
+        params.extend(values)
+        return f"{column} {operator} ({', '.join('?' * len(values))})"
+
+    def conditions(self, filters, params: list) -> List[str]:
+        """
+        Returns the conditions for a filter dictionary or group, appending their parameters.
+
+        Args:
+            filters (dict, And or Or): The filters.
+            params (list): List the parameters are appended to.
+
+        Returns:
+            list: The conditions, to be combined with AND.
+        """
+        if isinstance(filters, _Group):
+            return [self._group(filters, params)]
+        return [self.condition(column, value, params) for column, value in filters.items()]
+
+    def _group(self, group: _Group, params: list) -> str:
+        parts = []
+        for item in group.items:
+            if isinstance(item, _Group):
+                parts.append(self._group(item, params))
+                continue
+            conditions = self.conditions(item, params)
+            parts.append(f"({' AND '.join(conditions)})" if conditions else "(1=1)")
+        return f"({group.joiner.join(parts)})"
+
+    def order_by_clause(self, order_by: Optional[str], order_direction: str = "ASC") -> str:
+        """
+        Returns the ORDER BY clause, or an empty string when order_by is not given.
+
+        Args:
+            order_by (str, optional): The column to order by.
+            order_direction (str): ASC or DESC. Anything else falls back to ASC.
+
+        Returns:
+            str: The clause, starting with a space.
+        """
+        if not order_by:
+            return ""
+        self._check_column(order_by)
+        direction = order_direction.upper() if order_direction and order_direction.upper() in _ORDER_DIRECTIONS else "ASC"
+        return f" ORDER BY {order_by} {direction}"
+
+    def build(self, base_query: str, filters=None, or_filters=None, order_by=None, order_direction="ASC") -> Tuple[str, list]:
+        """
+        Appends the filters and ordering to a base query ending in a WHERE clause, e.g. "WHERE 1=1".
+
+        Args:
+            base_query (str): The base SQL query.
+            filters (dict, And or Or, optional): Conditions combined with AND.
+            or_filters (list of dict, optional): Each dictionary's conditions are combined with OR,
+                and the dictionaries are combined with OR as well.
+            order_by (str, optional): Column to order by.
+            order_direction (str): ASC or DESC.
+
+        Returns:
+            tuple: The final SQL query and the corresponding parameters.
+        """
+        params = []
+        where_clauses = self.conditions(filters, params) if filters else []
+
+        or_clauses = []
+        for or_filter in or_filters or []:
+            sub_clauses = self.conditions(or_filter, params)
+            if sub_clauses:
+                or_clauses.append(f"({' OR '.join(sub_clauses)})")
+
+        parts = [base_query]
+        if where_clauses:
+            parts.append(" AND " + " AND ".join(where_clauses))
+        if or_clauses:
+            parts.append(" AND (" + " OR ".join(or_clauses) + ")")
+        parts.append(self.order_by_clause(order_by, order_direction))
+
+        return "".join(parts), params
+
+
+_DEFAULT_BUILDER = QueryBuilder()
+
+
+def build_sql_statement(base_query: str, filters=None, or_filters=None, order_by=None, order_direction="ASC") -> Tuple[str, list]:
+    """
+    Appends filters and ordering to a base query, accepting any column. See QueryBuilder.build.
+
+    Returns:
+        tuple: The final SQL query and the corresponding parameters.
+    """
+    return _DEFAULT_BUILDER.build(base_query, filters, or_filters, order_by, order_direction)
+
+
+def chunks(values: Sequence, size: int = MAX_QUERY_PARAMETERS) -> Iterator[list]:
+    """
+    Splits values into lists of at most size values, e.g. to keep IN lists below the parameter limit.
+
+    Args:
+        values (Sequence): The values.
+        size (int): Maximum number of values per chunk.
+
+    Yields:
+        list: The consecutive chunks, in order.
+    """
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
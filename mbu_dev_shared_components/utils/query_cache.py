@@ -0,0 +1,174 @@
+"""
+This module provides a read-through cache for results of database queries
+against slowly changing reference data (clinics, keywords etc.).
+
+Entries are keyed by the normalized SQL text and its parameters, expire after
+a configurable time-to-live, and the least recently used entries are evicted
+once the cache reaches its maximum size. The cache can optionally be persisted
+to a local file, so consecutive robot runs on the same machine can reuse it.
+"""
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+class QueryCache:
+    """A thread-safe TTL and LRU bounded cache for query results."""
+
+    def __init__(self, ttl_seconds: float = 3600, max_entries: int = 256, persist_path: Optional[str] = None):
+        """
+        Initializes the cache.
+
+        Args:
+            ttl_seconds (float): Number of seconds an entry is valid after it was stored.
+            max_entries (int): Maximum number of entries kept before the least recently used are evicted.
+            persist_path (str, optional): Path to a local file the cache is loaded from and saved to.
+        """
+        if ttl_seconds <= 0:
+            raise ValueError("ttl_seconds must be positive.")
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive.")
+
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.persist_path = persist_path
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+        if self.persist_path and os.path.exists(self.persist_path):
+            self.load()
+
+    @staticmethod
+    def make_key(query: str, params=None, namespace: str = "") -> Tuple[Hashable, ...]:
+        """
+        Builds a cache key from a SQL query and its parameters.
+
+        Whitespace in the query is collapsed, so the same query written with
+        different indentation maps to the same key. The namespace (typically the
+        connection string) is hashed, so no credentials end up in a persisted cache file.
+
+        Args:
+            query (str): The SQL query.
+            params (list or tuple, optional): The parameters for the SQL query.
+            namespace (str): Value separating otherwise identical queries, e.g. against different databases.
+
+        Returns:
+            tuple: A hashable cache key.
+        """
+        normalized_query = " ".join(query.split())
+        namespace_hash = hashlib.sha256(namespace.encode("utf-8")).hexdigest()
+        return (namespace_hash, normalized_query, tuple(params or ()))
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Looks up a key in the cache.
+
+        Args:
+            key (Hashable): The cache key.
+
+        Returns:
+            tuple: (True, value) on a valid hit, otherwise (False, None).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+
+            stored_at, value = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return False, None
+
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Stores a value in the cache, evicting the least recently used entries if needed.
+
+        Args:
+            key (Hashable): The cache key.
+            value (Any): The value to store.
+        """
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+            if self.persist_path:
+                self.save()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value for a key, calling the loader and caching its result on a miss.
+
+        Args:
+            key (Hashable): The cache key.
+            loader (Callable): Function returning the value when it is not cached.
+
+        Returns:
+            Any: The cached or freshly loaded value.
+        """
+        hit, value = self.get(key)
+        if hit:
+            return value
+
+        value = loader()
+        self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        """Removes a single entry from the cache, if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+            if self.persist_path:
+                self.save()
+
+    def clear(self) -> None:
+        """Removes all entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+            if self.persist_path:
+                self.save()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def save(self) -> None:
+        """Writes the cache to persist_path, replacing the file atomically."""
+        if not self.persist_path:
+            raise ValueError("No persist_path configured for the cache.")
+
+        with self._lock:
+            directory = os.path.dirname(os.path.abspath(self.persist_path))
+            os.makedirs(directory, exist_ok=True)
+            temp_path = f"{self.persist_path}.tmp"
+            with open(temp_path, "wb") as file:
+                pickle.dump(list(self._entries.items()), file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.persist_path)
+
+    def load(self) -> None:
+        """Loads non-expired entries from persist_path. A corrupt file is ignored."""
+        if not self.persist_path:
+            raise ValueError("No persist_path configured for the cache.")
+
+        try:
+            with open(self.persist_path, "rb") as file:
+                items = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+            print(f"Could not load query cache from {self.persist_path}: {e}")
+            return
+
+        now = time.time()
+        with self._lock:
+            for key, (stored_at, value) in items:
+                if now - stored_at <= self.ttl_seconds:
+                    self._entries[key] = (stored_at, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
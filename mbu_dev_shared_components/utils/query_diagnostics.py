@@ -0,0 +1,358 @@
+"""
+This module provides an opt-in diagnostics mode for SQL Server queries run through pyodbc.
+
+For every query it records the client side execute and fetch times, the row
+count, the SET STATISTICS TIME/IO messages returned by the server and,
+optionally, the estimated execution plan (SHOWPLAN_XML), which can be dumped
+to .sqlplan files and opened in SQL Server Management Studio.
+
+The recorded traces can be saved to and loaded from a JSON fixture. All
+analysis (parsing statistics, summarizing plans, the report) works on the
+recorded data only, so it can be run and tested offline without a database.
+"""
+import dataclasses
+import datetime
+import json
+import os
+import re
+import time
+import xml.etree.ElementTree as ET
+from typing import List, Optional, Sequence, Tuple
+
+_TIME_PATTERN = re.compile(r"CPU time = (\d+) ms,\s*elapsed time = (\d+) ms", re.IGNORECASE)
+_IO_PATTERN = re.compile(r"Table '([^']+)'\. Scan count (\d+), logical reads (\d+), physical reads (\d+)", re.IGNORECASE)
+_DRIVER_PREFIX_PATTERN = re.compile(r"^(\[[^\]]*\])+")
+_SHOWPLAN_NS = {"sp": "http://schemas.microsoft.com/sqlserver/2004/07/showplan"}
+_SCAN_OPERATORS = {"Table Scan", "Clustered Index Scan", "Index Scan"}
+
+
+@dataclasses.dataclass
+class QueryTrace:
+    """Diagnostics recorded for a single query."""
+    label: str
+    query: str
+    params: list
+    row_count: int
+    execute_seconds: float
+    fetch_seconds: float
+    messages: List[str] = dataclasses.field(default_factory=list)
+    plan_xml: Optional[str] = None
+    plan_path: Optional[str] = None
+
+    @property
+    def client_seconds(self) -> float:
+        """Total wall time spent by the client on executing and fetching."""
+        return self.execute_seconds + self.fetch_seconds
+
+    def statistics(self) -> dict:
+        """Parses the STATISTICS TIME/IO messages. See parse_statistics_messages."""
+        return parse_statistics_messages(self.messages)
+
+    def plan_summary(self) -> Optional[dict]:
+        """Summarizes the estimated plan, if one was captured. See summarize_plan."""
+        return summarize_plan(self.plan_xml) if self.plan_xml else None
+
+    def to_dict(self) -> dict:
+        """Returns the trace as a JSON serializable dict."""
+        trace = dataclasses.asdict(self)
+        trace["params"] = [_json_safe(param) for param in self.params]
+        return trace
+
+
+def parse_statistics_messages(messages: Sequence[str]) -> dict:
+    """
+    Parses SQL Server STATISTICS TIME and STATISTICS IO informational messages.
+
+    Args:
+        messages (Sequence[str]): The message texts, e.g. from pyodbc's cursor.messages.
+
+    Returns:
+        dict: server_cpu_ms and server_elapsed_ms (execution, excluding compile time),
+            compile_cpu_ms and compile_elapsed_ms, and io, a dict of table name to
+            scan_count, logical_reads and physical_reads summed over the query.
+    """
+    result = {
+        "compile_cpu_ms": 0,
+        "compile_elapsed_ms": 0,
+        "server_cpu_ms": 0,
+        "server_elapsed_ms": 0,
+        "io": {},
+    }
+
+    for message in messages:
+        text = _DRIVER_PREFIX_PATTERN.sub("", message).strip()
+
+        for table, scans, logical, physical in _IO_PATTERN.findall(text):
+            io = result["io"].setdefault(table, {"scan_count": 0, "logical_reads": 0, "physical_reads": 0})
+            io["scan_count"] += int(scans)
+            io["logical_reads"] += int(logical)
+            io["physical_reads"] += int(physical)
+
+        time_match = _TIME_PATTERN.search(text)
+        if time_match:
+            cpu_ms, elapsed_ms = int(time_match.group(1)), int(time_match.group(2))
+            if "parse and compile" in text.lower():
+                result["compile_cpu_ms"] += cpu_ms
+                result["compile_elapsed_ms"] += elapsed_ms
+            else:
+                result["server_cpu_ms"] += cpu_ms
+                result["server_elapsed_ms"] += elapsed_ms
+
+    return result
+
+
+def summarize_plan(plan_xml: str) -> dict:
+    """
+    Extracts the parts of an estimated plan that usually explain a slow query.
+
+    Args:
+        plan_xml (str): The SHOWPLAN_XML document.
+
+    Returns:
+        dict: estimated_cost and estimated_rows of the statement(s), the scans
+            (operator and object) in the plan, and missing_indexes suggested by the optimizer.
+    """
+    root = ET.fromstring(plan_xml)
+    summary = {"estimated_cost": 0.0, "estimated_rows": 0.0, "scans": [], "missing_indexes": []}
+
+    for statement in root.iterfind(".//sp:StmtSimple", _SHOWPLAN_NS):
+        summary["estimated_cost"] += float(statement.get("StatementSubTreeCost", 0))
+        summary["estimated_rows"] += float(statement.get("StatementEstRows", 0))
+
+    for operator in root.iterfind(".//sp:RelOp", _SHOWPLAN_NS):
+        if operator.get("PhysicalOp") in _SCAN_OPERATORS:
+            obj = operator.find(".//sp:Object", _SHOWPLAN_NS)
+            summary["scans"].append({
+                "operator": operator.get("PhysicalOp"),
+                "table": obj.get("Table", "").strip("[]") if obj is not None else None,
+                "index": obj.get("Index", "").strip("[]") if obj is not None else None,
+                "estimated_rows": float(operator.get("EstimateRows", 0)),
+            })
+
+    for group in root.iterfind(".//sp:MissingIndexGroup", _SHOWPLAN_NS):
+        index = group.find("sp:MissingIndex", _SHOWPLAN_NS)
+        columns = {
+            column_group.get("Usage"): [column.get("Name", "").strip("[]") for column in column_group.iterfind("sp:Column", _SHOWPLAN_NS)]
+            for column_group in index.iterfind("sp:ColumnGroup", _SHOWPLAN_NS)
+        }
+        summary["missing_indexes"].append({
+            "impact": float(group.get("Impact", 0)),
+            "table": index.get("Table", "").strip("[]"),
+            "columns": columns,
+        })
+
+    return summary
+
+
+class QueryDiagnostics:
+    """
+    Records diagnostics for queries executed through it.
+
+    Example:
+        diagnostics = QueryDiagnostics(plan_dir="C:/temp/plans")
+        db = SolteqTandDatabase(conn_str, diagnostics=diagnostics)
+        db.get_list_of_events(filters={"p.cpr": cpr})
+        print(diagnostics.report())
+        diagnostics.save("events_trace.json")
+    """
+
+    def __init__(self, plan_dir: Optional[str] = None, capture_statistics: bool = True):
+        """
+        Initializes the recorder.
+
+        Args:
+            plan_dir (str, optional): Directory to capture estimated plans to. No plans are captured when omitted.
+            capture_statistics (bool): Whether to capture SET STATISTICS TIME/IO output.
+        """
+        self.plan_dir = plan_dir
+        self.capture_statistics = capture_statistics
+        self.traces: List[QueryTrace] = []
+
+    def execute(self, conn, query: str, params: Sequence, label: str = "query") -> Tuple[list, list]:
+        """
+        Executes a query on a pyodbc connection while recording its diagnostics.
+
+        Args:
+            conn (pyodbc.Connection): An open connection.
+            query (str): The SQL query to execute.
+            params (Sequence): The parameters for the SQL query.
+            label (str): Name identifying the query in the report, e.g. the calling method.
+
+        Returns:
+            tuple: The column names and the fetched rows.
+        """
+        return self.execute_batch(conn, query, params, label)[0]
+
+    def execute_batch(self, conn, query: str, params: Sequence, label: str = "query") -> List[Tuple[list, list]]:
+        """
+        Executes a batch of statements returning several result sets, recorded as one trace.
+
+        The row count of the trace is the total over all result sets, and the
+        statistics are summed over the statements of the batch.
+
+        Args:
+            conn (pyodbc.Connection): An open connection.
+            query (str): The SQL batch to execute.
+            params (Sequence): The parameters for all statements of the batch.
+            label (str): Name identifying the batch in the report, e.g. the calling method.
+
+        Returns:
+            list: The column names and the fetched rows of each result set, in order.
+        """
+        cursor = conn.cursor()
+        plan_xml, plan_path = None, None
+
+        if self.plan_dir:
+            plan_xml = self._capture_plan(cursor, query, params)
+            plan_path = self._dump_plan(plan_xml, label)
+
+        if self.capture_statistics:
+            cursor.execute("SET STATISTICS TIME ON; SET STATISTICS IO ON;")
+
+        start = time.perf_counter()
+        cursor.execute(query, params)
+        execute_seconds = time.perf_counter() - start
+        messages = _message_texts(cursor)
+
+        result_sets = []
+        start = time.perf_counter()
+        while True:
+            if cursor.description is not None:
+                rows = cursor.fetchall()
+                result_sets.append(([column[0] for column in cursor.description], rows))
+            # The execution time statistics arrive after each result set
+            messages += _message_texts(cursor)
+            if not cursor.nextset():
+                break
+        fetch_seconds = time.perf_counter() - start
+
+        if self.capture_statistics:
+            cursor.execute("SET STATISTICS TIME OFF; SET STATISTICS IO OFF;")
+
+        self.traces.append(QueryTrace(
+            label=label,
+            query=query,
+            params=list(params),
+            row_count=sum(len(rows) for _, rows in result_sets),
+            execute_seconds=execute_seconds,
+            fetch_seconds=fetch_seconds,
+            messages=messages,
+            plan_xml=plan_xml,
+            plan_path=plan_path,
+        ))
+
+        return result_sets
+
+    def _capture_plan(self, cursor, query: str, params: Sequence) -> Optional[str]:
+        """Returns the estimated plan for the query without executing it."""
+        cursor.execute("SET SHOWPLAN_XML ON")
+        try:
+            cursor.execute(query, params)
+            row = cursor.fetchone()
+            return row[0] if row else None
+        finally:
+            cursor.execute("SET SHOWPLAN_XML OFF")
+
+    def _dump_plan(self, plan_xml: Optional[str], label: str) -> Optional[str]:
+        """Writes the plan to plan_dir as a .sqlplan file and returns its path."""
+        if not plan_xml:
+            return None
+
+        os.makedirs(self.plan_dir, exist_ok=True)
+        path = os.path.join(self.plan_dir, f"{len(self.traces) + 1:03d}_{label}.sqlplan")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(plan_xml)
+        return path
+
+    def summary(self) -> List[dict]:
+        """
+        Returns one summary per recorded query.
+
+        Besides the recorded timings, each summary holds the server side CPU and
+        elapsed time, and the client time not spent in the server
+        (network and driver overhead), which tells a slow plan from a slow network.
+        """
+        summaries = []
+        for trace in self.traces:
+            statistics = trace.statistics()
+            server_seconds = (statistics["compile_elapsed_ms"] + statistics["server_elapsed_ms"]) / 1000
+            summaries.append({
+                "label": trace.label,
+                "row_count": trace.row_count,
+                "execute_seconds": trace.execute_seconds,
+                "fetch_seconds": trace.fetch_seconds,
+                "server_cpu_ms": statistics["server_cpu_ms"],
+                "server_elapsed_ms": statistics["server_elapsed_ms"],
+                "compile_elapsed_ms": statistics["compile_elapsed_ms"],
+                "overhead_seconds": max(0.0, trace.client_seconds - server_seconds) if trace.messages else None,
+                "logical_reads": sum(io["logical_reads"] for io in statistics["io"].values()),
+                "physical_reads": sum(io["physical_reads"] for io in statistics["io"].values()),
+                "io": statistics["io"],
+                "plan": trace.plan_summary(),
+                "plan_path": trace.plan_path,
+            })
+        return summaries
+
+    def report(self) -> str:
+        """Returns a human readable report of the recorded queries."""
+        lines = []
+        for summary in self.summary():
+            lines.append(
+                f"{summary['label']}: {summary['row_count']} rows, "
+                f"execute {summary['execute_seconds'] * 1000:.0f} ms, fetch {summary['fetch_seconds'] * 1000:.0f} ms, "
+                f"server elapsed {summary['server_elapsed_ms']} ms (cpu {summary['server_cpu_ms']} ms, "
+                f"compile {summary['compile_elapsed_ms']} ms), logical reads {summary['logical_reads']}, "
+                f"physical reads {summary['physical_reads']}"
+            )
+            for table, io in sorted(summary["io"].items(), key=lambda item: -item[1]["logical_reads"]):
+                lines.append(f"    {table}: {io['logical_reads']} logical reads, {io['scan_count']} scans")
+            plan = summary["plan"]
+            if plan:
+                lines.append(f"    estimated cost {plan['estimated_cost']:.4f}, estimated rows {plan['estimated_rows']:.0f}")
+                for scan in plan["scans"]:
+                    lines.append(f"    {scan['operator']} on {scan['table']} ({scan['index'] or 'heap'})")
+                for index in plan["missing_indexes"]:
+                    lines.append(f"    missing index on {index['table']} (impact {index['impact']:.1f}%): {index['columns']}")
+        return "\n".join(lines)
+
+    def save(self, path: str) -> None:
+        """
+        Saves the recorded traces to a JSON fixture.
+
+        Args:
+            path (str): Path of the JSON file.
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump([trace.to_dict() for trace in self.traces], file, indent=2, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "QueryDiagnostics":
+        """
+        Loads traces from a JSON fixture written by save, for offline analysis.
+
+        Args:
+            path (str): Path of the JSON file.
+
+        Returns:
+            QueryDiagnostics: A recorder holding the loaded traces.
+        """
+        with open(path, "r", encoding="utf-8") as file:
+            traces = json.load(file)
+
+        diagnostics = cls()
+        diagnostics.traces = [QueryTrace(**trace) for trace in traces]
+        return diagnostics
+
+
+def _message_texts(cursor) -> List[str]:
+    """Returns the texts of the informational messages currently on the cursor."""
+    return [str(message[1]) for message in getattr(cursor, "messages", None) or []]
+
+
+def _json_safe(value):
+    """Converts parameter values JSON can not represent to strings."""
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return value.isoformat()
+    return str(value)
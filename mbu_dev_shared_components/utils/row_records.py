@@ -0,0 +1,120 @@
+"""
+This module provides compact, read-mostly record objects for query results.
+
+Converting every fetched row to a dict allocates a hash table per row, which
+dominates memory on large scans. A record instead keeps a reference to the row
+values (e.g. the pyodbc Row itself) in a single slot, and resolves column names
+through an index shared by all records of the same query. Records support both
+key access (record["cpr"]) and attribute access (record.cpr), and behave as a
+read-only mapping, so most code written against the dict rows keeps working.
+
+Records keep the fetched rows alive, which dicts let go, so the saving is smaller
+than the per-row allocations suggest: about half the memory retained by dict rows,
+rows included, on the 11-column rows of tests/benchmarks/row_records_benchmark.py.
+"""
+import functools
+from collections.abc import Mapping
+from typing import Sequence, Tuple
+
+
+class RowRecord(Mapping):
+    """Base class for records generated by record_class. Not instantiated directly."""
+
+    __slots__ = ("_values",)
+
+    _columns: Tuple[str, ...] = ()
+    _index: dict = {}
+
+    def __init__(self, values: Sequence):
+        """
+        Initializes the record.
+
+        Args:
+            values (Sequence): The row values in column order, e.g. a pyodbc Row or a tuple.
+        """
+        self._values = values
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self._values[key]
+        return self._values[self._index[key]]
+
+    def __setitem__(self, key, value):
+        position = key if isinstance(key, int) else self._index[key]
+        if not hasattr(self._values, "__setitem__"):
+            self._values = list(self._values)
+        self._values[position] = value
+
+    def __getattr__(self, name):
+        index = type(self)._index
+        if name in index:
+            return self._values[index[name]]
+        raise AttributeError(f"{type(self).__name__!s} has no column {name!r}")
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __len__(self):
+        return len(self._columns)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def __reduce__(self):
+        return (_rebuild_record, (self._columns, tuple(self._values)))
+
+    def to_dict(self) -> dict:
+        """Returns the record as a plain dict, e.g. for JSON serialization."""
+        return dict(zip(self._columns, self._values))
+
+    def copy(self) -> "RowRecord":
+        """Returns a shallow copy of the record, not sharing the underlying row values."""
+        return type(self)(list(self._values))
+
+
+@functools.lru_cache(maxsize=512)
+def record_class(columns: Tuple[str, ...]) -> type:
+    """
+    Returns the record class for a tuple of column names, generating it on first use.
+
+    Args:
+        columns (tuple): The column names of the query, in order.
+
+    Returns:
+        type: A RowRecord subclass for rows with the given columns.
+    """
+    if len(set(columns)) != len(columns):
+        raise ValueError(f"Duplicate column names in query result: {columns}")
+
+    return type(
+        "Record",
+        (RowRecord,),
+        {
+            "__slots__": (),
+            "_columns": columns,
+            "_index": {column: position for position, column in enumerate(columns)},
+        },
+    )
+
+
+def _rebuild_record(columns: Tuple[str, ...], values: tuple) -> RowRecord:
+    """Recreates a record when unpickling, e.g. from a persisted query cache."""
+    return record_class(columns)(values)
+
+
+def rows_to_records(columns: Sequence[str], rows: Sequence[Sequence]) -> list:
+    """
+    Wraps fetched rows in records sharing one generated class.
+
+    Args:
+        columns (Sequence[str]): The column names, e.g. from cursor.description.
+        rows (Sequence[Sequence]): The fetched rows.
+
+    Returns:
+        list: A list of records, one per row.
+    """
+    cls = record_class(tuple(columns))
+    return [cls(row) for row in rows]
@@ -0,0 +1,84 @@
+"""
+This module provides a small JSON file backed store for high-water marks,
+used by incremental ("changed since") synchronization of database queries.
+
+For every sync key the store keeps the latest seen timestamp (the watermark)
+and the identities of the rows seen close to it, so rows re-read because of an
+overlap window can be recognized as duplicates.
+"""
+import datetime
+import json
+import os
+import threading
+from typing import Iterable, Optional, Set, Tuple
+
+
+class WatermarkStore:
+    """Persists a watermark and a set of recently seen row identities per sync key."""
+
+    def __init__(self, path: str):
+        """
+        Initializes the store.
+
+        Args:
+            path (str): Path to the JSON file holding the state. Created on first save.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def _write(self, states: dict) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(states, file, indent=2)
+        os.replace(temp_path, self.path)
+
+    def get(self, sync_key: str) -> Tuple[Optional[datetime.datetime], Set[str]]:
+        """
+        Returns the state for a sync key.
+
+        Args:
+            sync_key (str): Name identifying the synchronized query.
+
+        Returns:
+            tuple: The watermark (None if the key was never synchronized) and the set of seen row identities.
+        """
+        with self._lock:
+            state = self._read().get(sync_key)
+
+        if not state:
+            return None, set()
+        return datetime.datetime.fromisoformat(state["watermark"]), set(state["seen"])
+
+    def set(self, sync_key: str, watermark: datetime.datetime, seen: Iterable[str]) -> None:
+        """
+        Stores the state for a sync key, replacing the file atomically.
+
+        Args:
+            sync_key (str): Name identifying the synchronized query.
+            watermark (datetime.datetime): The latest timestamp seen.
+            seen (Iterable[str]): Identities of the rows seen within the overlap window before the watermark.
+        """
+        with self._lock:
+            states = self._read()
+            states[sync_key] = {"watermark": watermark.isoformat(), "seen": sorted(seen)}
+            self._write(states)
+
+    def reset(self, sync_key: str) -> None:
+        """
+        Forgets the state for a sync key, so the next synchronization reads everything again.
+
+        Args:
+            sync_key (str): Name identifying the synchronized query.
+        """
+        with self._lock:
+            states = self._read()
+            if states.pop(sync_key, None) is not None:
+                self._write(states)
@@ -0,0 +1,63 @@
+"""
+Microbenchmark for the query builder behind SolteqTandDatabase._construct_sql_statement.
+
+Reports the time per build for each kind of filter (comparator, BETWEEN, IN,
+LIKE, OR filters, nested groups) against a typical Solteq Tand base query.
+Needs no database connection.
+
+Run from the repository root:
+    python -m tests.benchmarks.query_builder_benchmark --number 100000
+"""
+
+import argparse
+import timeit
+
+from mbu_dev_shared_components.utils.query_builder import And, Or, QueryBuilder, build_sql_statement
+
+BASE_QUERY = """
+    SELECT  e.[eventId], e.[type], e.[timestamp], p.cpr
+    FROM [EVENT] e
+    JOIN [PATIENT] p ON p.patientId = e.entityId
+    WHERE	1=1
+"""
+
+CASES = {
+    "equality": {"filters": {"p.cpr": "0101011234"}},
+    "comparator": {"filters": {"e.[timestamp]": (">=", "2025-01-01")}},
+    "between": {"filters": {"e.eventTriggerDate": ("2024-01-01", "2024-12-31")}},
+    "in (10)": {"filters": {"e.type": [f"TYPE{i}" for i in range(10)]}},
+    "in (1000)": {"filters": {"p.cpr": [f"{i:010d}" for i in range(1000)]}},
+    "not in": {"filters": {"e.type": ("NOT IN", ["A", "B", "C"])}},
+    "like": {"filters": {"c.name": "%Tandklinik%"}},
+    "is null": {"filters": {"p.dentistId": None}},
+    "or filters": {"or_filters": [{"e.name": "Clinic A", "e.msg": "%Sched%"}, {"e.name": "Clinic B"}]},
+    "nested groups": {"filters": Or({"e.type": "A"}, And({"e.type": "B"}, {"e.archived": 0, "p.cpr": ["1", "2"]}))},
+    "typical getter": {
+        "filters": {"p.cpr": "0101011234", "e.archived": 0, "e.[timestamp]": (">=", "2025-01-01")},
+        "order_by": "e.[timestamp]",
+        "order_direction": "DESC",
+    },
+}
+
+
+def main():
+    """Parses arguments and runs the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=50_000, help="Number of builds per case.")
+    args = parser.parse_args()
+
+    whitelisted = QueryBuilder(allowed_columns={"p.cpr", "e.archived", "e.[timestamp]"})
+
+    print(f"{'case':<16} {'us/build':>10}")
+    for name, kwargs in CASES.items():
+        number = args.number // 100 if name == "in (1000)" else args.number
+        seconds = timeit.timeit(lambda kwargs=kwargs: build_sql_statement(BASE_QUERY, **kwargs), number=number)
+        print(f"{name:<16} {seconds / number * 1e6:>10.2f}")
+
+    kwargs = CASES["typical getter"]
+    seconds = timeit.timeit(lambda: whitelisted.build(BASE_QUERY, **kwargs), number=args.number)
+    print(f"{'whitelisted':<16} {seconds / args.number * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Memory benchmark of the Romexis label bar annotation.
+
+Compares the peak memory of the previous annotation (PIL image of the decoded
+array pasted into a new full-size canvas) with add_label_bar (canvas allocated
+once from the array, text drawn into the bar only), from the decoded array to
+the final PIL image that is saved. Each variant runs in a fresh process, and
+the peak resident set size above the process's baseline is reported.
+
+Uses the resource module, so it runs on Linux and macOS.
+
+Run from the repository root:
+    python -m tests.benchmarks.romexis_annotation_memory_benchmark --width 3000 --height 6000
+"""
+
+import argparse
+import multiprocessing
+import resource
+import sys
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from mbu_dev_shared_components.romexis.helper_functions import add_label_bar, get_font, measure_text
+
+LINE1 = "0101011234 : Test Person"
+LINE2 = "01-01-2025"
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def _decoded_image(width: int, height: int) -> np.ndarray:
+    """A stand-in for the array returned by rawpy, filled so every page is touched."""
+    rgb = np.empty((height, width, 3), dtype=np.uint8)
+    rgb[:] = (np.arange(width, dtype=np.uint16) % 256).astype(np.uint8)[None, :, None]
+    return rgb
+
+
+def paste_variant(width: int, height: int) -> Image.Image:
+    """The annotation before add_label_bar."""
+    rgb = _decoded_image(width, height)
+    image = Image.fromarray(rgb)
+    font = get_font(None, max(24, height // 30))
+    _, line1_height = measure_text(LINE1, font)
+    _, line2_height = measure_text(LINE2, font)
+    margin_y = max(10, height // 50)
+    spacing = max(5, height // 80)
+    box_height = line1_height + line2_height + spacing + 2 * margin_y
+
+    new_image = Image.new("RGB", (width, height + box_height), color=(255, 255, 255))
+    new_image.paste(image, (0, 0))
+    draw = ImageDraw.Draw(new_image)
+    draw.rectangle([(0, height), (width, height + box_height)], fill="black")
+    draw.text((5, height + margin_y), LINE1, font=font, fill=(255, 255, 255))
+    draw.text((5, height + margin_y + line1_height + spacing), LINE2, font=font, fill=(255, 255, 255))
+    return new_image
+
+
+def label_bar_variant(width: int, height: int) -> Image.Image:
+    """The annotation with add_label_bar, freeing each buffer as soon as it is copied."""
+    rgb = _decoded_image(width, height)
+    canvas = add_label_bar(rgb, LINE1, LINE2)
+    del rgb
+    image = Image.fromarray(canvas)
+    del canvas
+    return image
+
+
+VARIANTS = {"paste into new canvas": paste_variant, "add_label_bar": label_bar_variant}
+
+
+def _measure(name: str, width: int, height: int, queue) -> None:
+    get_font(None, max(24, height // 30))
+    baseline = _peak_rss_mb()
+    VARIANTS[name](width, height)
+    queue.put(_peak_rss_mb() - baseline)
+
+
+def main():
+    """Runs the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=3000)
+    parser.add_argument("--height", type=int, default=6000)
+    args = parser.parse_args()
+
+    decoded_mb = args.width * args.height * 3 / 1024 / 1024
+    print(f"Image {args.width}x{args.height}, decoded RGB array {decoded_mb:.0f} MB\n")
+    print(f"{'variant':<24}{'peak MB':>10}{'x decoded':>11}")
+
+    context = multiprocessing.get_context("spawn")
+    for name in VARIANTS:
+        queue = context.Queue()
+        process = context.Process(target=_measure, args=(name, args.width, args.height, queue))
+        process.start()
+        peak_mb = queue.get()
+        process.join()
+        print(f"{name:<24}{peak_mb:>10.0f}{peak_mb / decoded_mb:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
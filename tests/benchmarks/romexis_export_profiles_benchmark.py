@@ -0,0 +1,64 @@
+"""
+Benchmark of the Romexis export profiles: file size and encode time per profile.
+
+Encodes a synthetic X-ray-like image (smooth gradients, noise and a label bar)
+with every profile in romexis.export_profiles.PROFILES. 16-bit profiles encode a
+16-bit grayscale version of the same image. Needs no Romexis data.
+
+Run from the repository root:
+    python -m tests.benchmarks.romexis_export_profiles_benchmark --width 3000 --height 1500
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from mbu_dev_shared_components.romexis.export_profiles import PROFILES
+from mbu_dev_shared_components.romexis.helper_functions import add_label_bar
+
+
+def synthetic_xray(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """A 16-bit grayscale image with the smooth structure and sensor noise of a panoramic X-ray."""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(-1, 1, width)[None, :]
+    y = np.linspace(-1, 1, height)[:, None]
+    arches = np.exp(-((y - 0.3 * x ** 2) ** 2) / 0.02) + 0.6 * np.exp(-((y + 0.3 - 0.25 * x ** 2) ** 2) / 0.03)
+    image = 0.15 + 0.6 * arches + 0.1 * np.cos(20 * x) * np.exp(-y ** 2)
+    image += rng.normal(0, 0.02, size=image.shape)
+    return (image.clip(0, 1) * 65535).astype(np.uint16)
+
+
+def main():
+    """Runs the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=3000)
+    parser.add_argument("--height", type=int, default=1500)
+    parser.add_argument("--repeat", type=int, default=3, help="Encodes per profile; the fastest is reported.")
+    args = parser.parse_args()
+
+    gray16 = add_label_bar(synthetic_xray(args.width, args.height), "0101011234 : Test Person", "01-01-2025")
+    images = {
+        8: Image.fromarray(np.repeat((gray16 >> 8).astype(np.uint8)[:, :, None], 3, axis=2)),
+        16: Image.fromarray(gray16),
+    }
+    raw_mb = {8: gray16.size * 3 / 1024 / 1024, 16: gray16.size * 2 / 1024 / 1024}
+
+    print(f"Image {gray16.shape[1]}x{gray16.shape[0]}\n")
+    print(f"{'profile':<24}{'size MB':>10}{'ratio':>8}{'encode ms':>12}")
+    with tempfile.TemporaryDirectory() as folder:
+        for name, profile in PROFILES.items():
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                path = profile.save(images[profile.bit_depth], os.path.join(folder, name))
+                best = min(best, time.perf_counter() - start)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            print(f"{name:<24}{size_mb:>10.2f}{raw_mb[profile.bit_depth] / size_mb:>8.1f}{best * 1000:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Benchmark of the Romexis image helpers, per image type and per stage.
+
+Generates a synthetic source image of a realistic size for each Romexis image
+type, then runs the stages of an export on it in a fresh process:
+
+    decode     decode_image
+    transform  transform_image (rotation and mirroring)
+    annotate   add_label_bar
+    encode     the image type's default export profile
+    zip        zip_folder_contents of the exported image
+    total      add_black_bar_and_text_to_image, end to end
+
+and reports the wall time, the process's peak resident set size above its
+baseline after the stage, and the size of the stage's output. Needs no Romexis data or network.
+
+The X-ray types are written as 16-bit grayscale TIFF, which is the sensor data
+of a RAW file without the RAW container, and photos as JPEG. Writing a RAW file
+that rawpy can read needs a DNG encoder, so the synthetic images take the
+Pillow decode path; pass real files with --raw to measure rawpy as well.
+
+Uses the resource module, so it runs on Linux and macOS.
+
+Run from the repository root:
+    python -m tests.benchmarks.romexis_helpers_benchmark
+    python -m tests.benchmarks.romexis_helpers_benchmark --types pano ceph --repeat 3
+    python -m tests.benchmarks.romexis_helpers_benchmark --raw pano=/data/pano.img ceph=/data/ceph.img
+"""
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from mbu_dev_shared_components.romexis.export_profiles import get_profile
+from mbu_dev_shared_components.romexis.helper_functions import (
+    add_black_bar_and_text_to_image, add_label_bar, decode_image, transform_image, zip_folder_contents
+)
+from tests.benchmarks.romexis_export_profiles_benchmark import synthetic_xray
+
+# name: (image_type, width, height, rotation_angle, is_mirror)
+IMAGE_TYPES = {
+    "pano": (1, 2900, 1450, 0, False),
+    "ceph": (2, 2400, 1900, 0, True),
+    "intraoral": (3, 1600, 1200, 90, False),
+    "photo": (4, 4000, 3000, 0, False),
+}
+
+GAMMA = 1.5
+STAGES = ("decode", "transform", "annotate", "encode", "zip", "total")
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def write_source(name: str, folder: str) -> str:
+    """Writes the synthetic source image of an image type and returns its path."""
+    image_type, width, height, _, _ = IMAGE_TYPES[name]
+    gray16 = synthetic_xray(width, height, seed=image_type)
+    if image_type == 4:
+        path = os.path.join(folder, f"{name}.jpg")
+        rgb = np.stack([gray16 >> 8, (gray16 >> 8) * 9 // 10, (gray16 >> 8) * 8 // 10], axis=2).astype(np.uint8)
+        Image.fromarray(rgb).save(path, format="JPEG", quality=92)
+    else:
+        path = os.path.join(folder, f"{name}.tif")
+        Image.fromarray(gray16).save(path, format="TIFF")
+    return path
+
+
+def _measure(name: str, source_path: str, repeat: int, queue) -> None:
+    """Runs the stages on one image, keeping the fastest time of each, and puts the rows on the queue."""
+    image_type, _, _, rotation_angle, is_mirror = IMAGE_TYPES[name]
+    profile = get_profile(None, image_type)
+    rows = {stage: [float("inf"), 0.0, 0] for stage in STAGES}
+    baseline = _peak_rss_mb()
+
+    def record(stage, started, output_bytes):
+        row = rows[stage]
+        row[0] = min(row[0], time.perf_counter() - started)
+        row[1] = max(row[1], _peak_rss_mb() - baseline)
+        row[2] = output_bytes
+
+    with tempfile.TemporaryDirectory() as folder:
+        stage_folder = os.path.join(folder, "stages")
+        os.makedirs(stage_folder)
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rgb = decode_image(source_path, image_type, GAMMA, bit_depth=profile.bit_depth)
+            record("decode", started, rgb.nbytes)
+
+            started = time.perf_counter()
+            rgb = np.ascontiguousarray(transform_image(rgb, rotation_angle, is_mirror))
+            record("transform", started, rgb.nbytes)
+
+            started = time.perf_counter()
+            canvas = add_label_bar(rgb, "0101011234 : Test Person", "01-01-2025")
+            del rgb
+            image = Image.fromarray(canvas)
+            del canvas
+            record("annotate", started, image.width * image.height * len(image.getbands()))
+
+            started = time.perf_counter()
+            exported = profile.save(image, os.path.join(stage_folder, name))
+            del image
+            record("encode", started, os.path.getsize(exported))
+
+            started = time.perf_counter()
+            zip_path = os.path.join(folder, f"{name}.zip")
+            zip_folder_contents(stage_folder, zip_path)
+            record("zip", started, os.path.getsize(zip_path))
+
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                exported = add_black_bar_and_text_to_image(source_path, os.path.join(folder, "total"), "0101011234",
+                                                           "Test Person", "01-01-2025", image_type, GAMMA, rotation_angle, is_mirror)
+            record("total", started, os.path.getsize(exported))
+
+    queue.put({stage: tuple(row) for stage, row in rows.items()})
+
+
+def main():
+    """Runs the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--types", nargs="+", choices=sorted(IMAGE_TYPES), default=list(IMAGE_TYPES))
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per image; the fastest time is reported.")
+    parser.add_argument("--raw", nargs="*", default=[], metavar="TYPE=PATH",
+                        help="Use a real source file instead of the synthetic image of a type.")
+    args = parser.parse_args()
+    sources = dict(item.split("=", 1) for item in args.raw)
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as folder:
+        # Written in another process, since on Linux a process starts with the peak RSS of its parent
+        with context.Pool(1) as pool:
+            synthetic = [name for name in args.types if name not in sources]
+            sources.update(zip(synthetic, pool.starmap(write_source, [(name, folder) for name in synthetic])))
+
+        for name in args.types:
+            source_path = sources[name]
+            image_type, width, height, rotation_angle, is_mirror = IMAGE_TYPES[name]
+            print(f"\n{name} (image_type {image_type}), {os.path.basename(source_path)}, "
+                  f"{os.path.getsize(source_path) / 1024 / 1024:.1f} MB, rotation {rotation_angle}, mirror {is_mirror}")
+            print(f"{'stage':<12}{'ms':>10}{'peak MB':>10}{'output MB':>12}")
+
+            queue = context.Queue()
+            process = context.Process(target=_measure, args=(name, source_path, args.repeat, queue))
+            process.start()
+            rows = queue.get()
+            process.join()
+            for stage, (seconds, peak_mb, output_bytes) in rows.items():
+                print(f"{stage:<12}{seconds * 1000:>10.0f}{peak_mb:>10.0f}{output_bytes / 1024 / 1024:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
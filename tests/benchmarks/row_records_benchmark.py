@@ -0,0 +1,74 @@
+"""
+Benchmark comparing dict rows with RowRecord rows for query results.
+
+Simulates fetching a large event scan (the column layout of
+SolteqTandDatabase.get_list_of_events) and reports, for both representations,
+the time to build the result list and the memory it retains once the fetched
+rows are released, as a caller holding only the result would. The fetched rows
+are created inside the traced region, as records keep them alive while dict
+conversion lets them be freed, so the retained memory includes what records hold.
+
+Run from the repository root:
+    python -m tests.benchmarks.row_records_benchmark --rows 500000
+"""
+
+import argparse
+import datetime
+import gc
+import time
+import tracemalloc
+
+from mbu_dev_shared_components.utils.row_records import rows_to_records
+
+EVENT_COLUMNS = [
+    "eventId", "type", "currentStateText", "currentStateDate", "timestamp",
+    "clinicId", "name", "entityId", "eventTriggerDate", "cpr", "archived",
+]
+
+
+def make_rows(count: int) -> list:
+    """Creates synthetic event rows as tuples, standing in for pyodbc Row objects."""
+    now = datetime.datetime(2025, 1, 1)
+    return [
+        (i, "EVENT", "Afventer", now, now, i % 40, "Tandklinik", i, now, f"{i:010d}", 0)
+        for i in range(count)
+    ]
+
+
+def measure(label: str, build, columns: list, count: int) -> None:
+    """Fetches the rows and builds the result list, printing the build time and the retained and peak memory."""
+    gc.collect()
+    tracemalloc.start()
+    rows = make_rows(count)
+    start = time.perf_counter()
+    result = build(columns, rows)
+    elapsed = time.perf_counter() - start
+    del rows
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert result[-1]["cpr"] == f"{count - 1:010d}"
+    print(f"{label:<8} {elapsed * 1000:>10.1f} ms {retained / 1024 ** 2:>10.1f} MiB {retained / count:>8.0f} B/row"
+          f" {peak / 1024 ** 2:>10.1f} MiB")
+
+
+def build_dicts(columns: list, rows: list) -> list:
+    """The representation used by default by SolteqTandDatabase._fetch_rows."""
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def main():
+    """Parses arguments and runs the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000, help="Number of rows to simulate.")
+    args = parser.parse_args()
+
+    print(f"{args.rows} rows x {len(EVENT_COLUMNS)} columns")
+    print(f"{'rows as':<8} {'time':>13} {'retained':>14} {'per row':>12} {'peak':>14}")
+    measure("dict", build_dicts, EVENT_COLUMNS, args.rows)
+    measure("record", rows_to_records, EVENT_COLUMNS, args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Load test of the SolteqTandDatabase getter queries against the local fixture database.
+
+Generates (or reuses) a fixture database of the requested size and reports the
+time per query of each getter filtered by a random patient's CPR, so query and
+index changes can be compared at production-like volumes without the server.
+
+Run from the repository root, e.g. for roughly 2.5 million rows:
+    python -m tests.benchmarks.solteq_load_test --patients 200000 --queries 200
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from mbu_dev_shared_components.utils.query_builder import build_sql_statement
+from tests.fixtures.solteq_fixture_db import FixtureSize, connect, cpr_for, create_fixture_database, getter_base_queries
+
+TABLES = ["PATIENT", "BOOKING", "EVENT", "DocumentStore", "DocumentStoreStatus", "DiagnostikNotat"]
+
+PATIENT_GETTERS = [
+    "get_list_of_documents",
+    "get_list_of_extern_dentist",
+    "get_list_of_bookings",
+    "get_list_of_events",
+    "get_list_of_primary_dental_clinics",
+    "get_list_of_journal_notes",
+]
+
+
+def main():
+    """Runs the load test."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=FixtureSize.patients)
+    parser.add_argument("--queries", type=int, default=100, help="Queries per getter.")
+    parser.add_argument("--path", default=None, help="Fixture database file. Defaults to one per size in the temp dir.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--overwrite", action="store_true", help="Regenerate an existing fixture database.")
+    args = parser.parse_args()
+
+    path = args.path or os.path.join(tempfile.gettempdir(), f"solteq_fixture_{args.patients}_{args.seed}.sqlite")
+    start = time.perf_counter()
+    create_fixture_database(path, FixtureSize(patients=args.patients), seed=args.seed, overwrite=args.overwrite)
+    print(f"Fixture database {path} ready in {time.perf_counter() - start:.1f} s")
+
+    connection = connect(path)
+    rows_total = connection.cursor().execute(
+        "SELECT " + " + ".join(f"(SELECT COUNT(*) FROM {table})" for table in TABLES)
+    ).fetchone()[0]
+    print(f"{rows_total:,} rows\n")
+
+    queries = getter_base_queries()
+    rng = random.Random(args.seed)
+    print(f"{'getter':<38}{'ms/query':>10}{'rows/query':>12}")
+    for getter in PATIENT_GETTERS:
+        rows = 0
+        start = time.perf_counter()
+        for _ in range(args.queries):
+            query, params = build_sql_statement(queries[getter], filters={"p.cpr": cpr_for(rng.randrange(1, args.patients + 1))})
+            rows += len(connection.cursor().execute(query, params).fetchall())
+        elapsed = time.perf_counter() - start
+        print(f"{getter:<38}{elapsed / args.queries * 1000:>10.2f}{rows / args.queries:>12.1f}")
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Local stand-in for the GetOrganized API, for testing the getorganized module without a server.
+
+The stub authenticates connections like IIS does with NTLM: the first request on a new
+connection is answered with 401, the client's negotiate message with a fixed challenge,
+and the authenticate message with the response, after which the connection is trusted
+until it is closed. An authenticate message on a connection that was not sent the
+challenge is refused with 401, as the handshake of a client that sent the legs on
+different connections fails on IIS. The credentials are not checked.
+
+Responses are JSON, returned by a route per path; HEAD requests and paths without a route return {}.
+A route returning bytes has them sent as they are, e.g. for a body that is not JSON.
+
+Example:
+    with GetOrganizedStub() as stub:
+        stub.routes["/_goapi/Documents/AddToCase"] = lambda body: (200, {"DocumentId": 1})
+        documents.upload_file_to_case(file_data, stub.url + "/_goapi/Documents/AddToCase", "user", "password")
+        assert stub.handshakes == 1
+"""
+
+import base64
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple
+
+# An NTLM challenge message with a fixed server challenge, for computers named GO in the domain TEST
+NTLM_CHALLENGE = "TlRMTVNTUAACAAAAAAAAADAAAAAxgohgASNFZ4mrze8AAAAAAAAAABgAGAAwAAAAAQAEAEcATwACAAgAVABFAFMAVAAAAAAA"
+
+Route = Callable[[bytes], Tuple[int, object]]
+
+
+def _ntlm_message_type(authorization: str) -> int:
+    token = base64.b64decode(authorization.split(" ", 1)[1])
+    return int.from_bytes(token[8:12], "little")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "GetOrganizedStub"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def _send(self, status: int, headers: Dict[str, str] = None, body: bytes = b"") -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _handle(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        authorization = self.headers.get("Authorization")
+        self.server.record(self, body)
+
+        if not getattr(self, "authenticated", False):
+            if authorization is None:
+                self._send(401, {"WWW-Authenticate": "NTLM"})
+                return
+            if _ntlm_message_type(authorization) == 1:
+                self.challenged = True  # pylint: disable=attribute-defined-outside-init
+                self._send(401, {"WWW-Authenticate": f"NTLM {NTLM_CHALLENGE}"})
+                return
+            if not getattr(self, "challenged", False):
+                self.server.add_refused_handshake()
+                self._send(401, {"WWW-Authenticate": "NTLM"})
+                return
+            self.authenticated = True  # pylint: disable=attribute-defined-outside-init
+            self.server.add_handshake()
+
+        self.server.record(self, body, served=True)
+        # HEAD requests have no payload, so they are answered without the route
+        route = self.server.routes.get(self.path) if self.command != "HEAD" else None
+        status, payload = route(body) if route else (200, {})
+        content = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self._send(status, {"Content-Type": "application/json"}, content)
+
+    do_GET = _handle
+    do_HEAD = _handle
+    do_POST = _handle
+
+
+class GetOrganizedStub(ThreadingHTTPServer):
+    """
+    The stub server, serving on a free local port on a background thread while used as a context manager.
+
+    Attributes:
+        url (str): The base URL of the server.
+        routes (dict): Path to a function of the request body returning the status and JSON payload, or bytes.
+        requests (list): (client port, method, path, body) of every request, including those answered with 401.
+        served (list): (client port, method, path, body) of the requests that reached a route.
+        handshakes (int): Number of completed NTLM handshakes, i.e. of authenticated connections.
+        refused_handshakes (int): Number of authenticate messages sent on a connection without the challenge.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.routes: Dict[str, Route] = {}
+        self.requests: List[Tuple[int, str, str, bytes]] = []
+        self.served: List[Tuple[int, str, str, bytes]] = []
+        self.handshakes = 0
+        self.refused_handshakes = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def record(self, handler: _Handler, body: bytes, served: bool = False) -> None:
+        """Records a request, or that a request reached a route."""
+        entry = (handler.client_address[1], handler.command, handler.path, body)
+        with self._lock:
+            if served:
+                self.served.append(entry)
+            else:
+                self.requests.append(entry)
+
+    def add_handshake(self) -> None:
+        """Counts a completed handshake."""
+        with self._lock:
+            self.handshakes += 1
+
+    def add_refused_handshake(self) -> None:
+        """Counts an authenticate message sent on a connection without the challenge."""
+        with self._lock:
+            self.refused_handshakes += 1
+
+    @property
+    def connections(self) -> int:
+        """Number of connections the requests were sent on."""
+        return len({port for port, _, _, _ in self.requests})
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
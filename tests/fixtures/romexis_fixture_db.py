@@ -0,0 +1,124 @@
+"""
+Local stand-in for the Romexis database, with the tables used by RomexisDbHandler.
+
+The Romexis queries are run on SQLite with the T-SQL shim of solteq_fixture_db.
+External ids are compared without trailing spaces, as SQL Server compares them.
+
+Example:
+    connection = solteq_fixture_db.connect()
+    populate(connection._connection, patients=100)
+    connection.cursor().execute(persons_query(1), ["0101500001"]).fetchall()
+"""
+
+import random
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE RRM_Person (
+    person_id INTEGER PRIMARY KEY,
+    external_id TEXT NOT NULL COLLATE RTRIM,
+    first_name TEXT,
+    second_name TEXT,
+    third_name TEXT,
+    last_name TEXT,
+    date_of_birth TEXT,
+    gender INTEGER,
+    doctor_id INTEGER
+);
+CREATE TABLE RIM_Image_Info (
+    image_id INTEGER PRIMARY KEY,
+    patient_id INTEGER NOT NULL,
+    image_size INTEGER,
+    image_date TEXT,
+    image_time TEXT,
+    image_source INTEGER,
+    image_type INTEGER,
+    image_subtype INTEGER,
+    image_format INTEGER,
+    bit_depth INTEGER,
+    pixel_size REAL,
+    rotation_angle INTEGER,
+    is_mirrored INTEGER,
+    tooth_mask INTEGER,
+    tooth_mask_child INTEGER,
+    operator_id INTEGER,
+    status INTEGER
+);
+CREATE TABLE RIM_Image_Attrib (
+    image_id INTEGER NOT NULL,
+    attrib_type INTEGER NOT NULL,
+    string_value TEXT
+);
+CREATE TABLE RIM_Image_Operation (
+    operation_id INTEGER PRIMARY KEY,
+    image_id INTEGER NOT NULL,
+    status INTEGER,
+    updated_date TEXT,
+    updated_time TEXT
+);
+CREATE TABLE RIM_Image_Op_Param (
+    operation_id INTEGER NOT NULL,
+    param_type INTEGER NOT NULL,
+    param_value TEXT,
+    local_change_id INTEGER,
+    master_change_id INTEGER,
+    original_local_id INTEGER
+);
+CREATE INDEX IX_RRM_Person_external_id ON RRM_Person (external_id);
+CREATE INDEX IX_RIM_Image_Info_patient_id ON RIM_Image_Info (patient_id);
+CREATE INDEX IX_RIM_Image_Operation_image_id ON RIM_Image_Operation (image_id);
+"""
+
+
+def external_id_for(person_id: int) -> str:
+    """Returns the unique, deterministic external id (CPR number) of a generated person."""
+    return f"0101{50 + person_id // 10_000:02d}{person_id % 10_000:04d}"
+
+
+def populate(connection: sqlite3.Connection, patients: int = 100, images_per_patient: int = 8, seed: int = 0) -> None:
+    """
+    Creates the schema and fills it with synthetic persons and images.
+
+    Images get zero to three active operations, some with a gamma parameter, and a
+    few images are deleted (status 5) or of a type that is not exported.
+
+    Args:
+        connection (sqlite3.Connection): An empty SQLite database.
+        patients (int): Number of persons.
+        images_per_patient (int): Maximum number of images per person.
+        seed (int): Seed making the generated data reproducible.
+    """
+    rng = random.Random(seed)
+    connection.executescript(SCHEMA)
+
+    image_id, operation_id = 0, 0
+    for person_id in range(1, patients + 1):
+        connection.execute(
+            "INSERT INTO RRM_Person VALUES (?, ?, ?, NULL, NULL, ?, ?, ?, ?)",
+            (person_id, external_id_for(person_id), f"Fornavn{person_id}", f"Efternavn{person_id}", "1950-01-01", rng.randint(1, 2), rng.randint(1, 20)),
+        )
+        for _ in range(rng.randint(0, images_per_patient)):
+            image_id += 1
+            image_type = rng.choice([1, 2, 3, 3, 3, 4, 5])
+            status = 5 if rng.random() < 0.1 else 1
+            connection.execute(
+                "INSERT INTO RIM_Image_Info VALUES (?, ?, 1024, ?, ?, 1, ?, 0, 1, 16, 0.1, ?, ?, 0, 0, 1, ?)",
+                (image_id, person_id, f"2024{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}", f"{rng.randint(8, 16):02d}0000",
+                 image_type, rng.choice([0, 90, 180, 270]), rng.randint(0, 1), status),
+            )
+            connection.execute("INSERT INTO RIM_Image_Attrib VALUES (?, 1, ?)", (image_id, f"\\\\romexis\\images\\{image_id}.img"))
+            connection.execute("INSERT INTO RIM_Image_Attrib VALUES (?, 2, 'other attribute')", (image_id,))
+
+            for day in range(rng.randint(0, 3)):
+                operation_id += 1
+                connection.execute(
+                    "INSERT INTO RIM_Image_Operation VALUES (?, ?, ?, ?, ?)",
+                    (operation_id, image_id, rng.choice([1, 1, 0]), f"202501{day + 1:02d}", f"{rng.randint(8, 16):02d}0000"),
+                )
+                if rng.random() < 0.8:
+                    connection.execute(
+                        "INSERT INTO RIM_Image_Op_Param VALUES (?, 3, ?, 1, 1, 1)", (operation_id, f"{rng.uniform(0.5, 2.0):.2f}")
+                    )
+                connection.execute("INSERT INTO RIM_Image_Op_Param VALUES (?, 1, 'contrast', 1, 1, 1)", (operation_id,))
+
+    connection.commit()
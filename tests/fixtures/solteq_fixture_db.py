@@ -0,0 +1,490 @@
+"""
+Local stand-in for the Solteq Tand (tmtdata_prod) database, for load testing
+SolteqTandDatabase without access to the production server.
+
+The module provides:
+    - SCHEMA: SQLite tables mirroring the Solteq Tand tables and columns used by SolteqTandDatabase.
+    - populate: a deterministic synthetic data generator, able to write millions of rows.
+    - connect: a pyodbc-like connection translating the T-SQL used by SolteqTandDatabase to SQLite.
+
+Example:
+    path = create_fixture_database("solteq_fixture.sqlite", FixtureSize(patients=200_000))
+
+    class FixtureSolteqTandDatabase(SolteqTandDatabase):
+        def _connect(self):
+            return connect(path)
+
+    db = FixtureSolteqTandDatabase(conn_str="fixture")
+    db.get_list_of_bookings(filters={"p.cpr": "0101501234"})
+
+getter_base_queries returns the base queries of the getters without importing
+solteqtand, whose GUI dependencies are only available on Windows.
+"""
+
+import ast
+import dataclasses
+import datetime
+import itertools
+import os
+import random
+import re
+import sqlite3
+from typing import Iterator, List, Optional, Sequence
+
+SCHEMA = """
+CREATE TABLE PATIENT (
+    patientId INTEGER PRIMARY KEY,
+    cpr TEXT NOT NULL,
+    firstName TEXT,
+    lastName TEXT,
+    patientStatus INTEGER,
+    preferredDentalClinicId INTEGER,
+    isPreferredDentalClinicLocked INTEGER,
+    privateClinicId INTEGER,
+    dentistId INTEGER
+);
+CREATE TABLE CLINIC (
+    clinicId INTEGER PRIMARY KEY,
+    name TEXT,
+    type TEXT,
+    streetAddress TEXT,
+    countyCode TEXT,
+    zip TEXT,
+    phoneNumber TEXT,
+    contractorId TEXT,
+    isPrimary INTEGER
+);
+CREATE TABLE KEYWORD (
+    keywordId TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    text TEXT,
+    PRIMARY KEY (keywordId, value)
+);
+CREATE TABLE DENTIST (
+    dentistId INTEGER PRIMARY KEY,
+    name TEXT
+);
+CREATE TABLE DocumentStore (
+    DocumentId INTEGER PRIMARY KEY,
+    entityId INTEGER NOT NULL,
+    OriginalFilename TEXT,
+    UniqueFilename TEXT,
+    DocumentType TEXT,
+    DocumentDescription TEXT,
+    Priviledged INTEGER,
+    ContentType TEXT
+);
+CREATE TABLE DocumentStoreStatus (
+    Document_HistoryId INTEGER PRIMARY KEY,
+    DocumentId INTEGER NOT NULL,
+    DocumentStoreStatusId INTEGER,
+    SentToNemSMS INTEGER,
+    DocumentedBy TEXT,
+    Documented DATETIME,
+    Decided DATETIME
+);
+CREATE TABLE BOOKINGTYPE (
+    BookingTypeID INTEGER PRIMARY KEY,
+    Description TEXT,
+    PrinterFriendlyText TEXT
+);
+CREATE TABLE BOOKING (
+    BookingID INTEGER PRIMARY KEY,
+    patientId INTEGER NOT NULL,
+    BookingTypeID INTEGER NOT NULL,
+    StartTime DATETIME,
+    EndTime DATETIME,
+    PatientNotified INTEGER,
+    PatientNotifiedVia TEXT,
+    BookingText TEXT,
+    Warnings TEXT,
+    CreatedDateTime DATETIME,
+    LastModifiedDateTime DATETIME
+);
+CREATE TABLE EVENT (
+    eventId INTEGER PRIMARY KEY,
+    type TEXT,
+    currentStateText TEXT,
+    currentStateDate DATETIME,
+    timestamp DATETIME,
+    clinicId INTEGER,
+    entityId INTEGER NOT NULL,
+    eventTriggerDate DATETIME,
+    archived INTEGER
+);
+CREATE TABLE Forloeb (
+    ForloebID INTEGER PRIMARY KEY,
+    patientId INTEGER NOT NULL
+);
+CREATE TABLE ForloebSymbolisering (
+    ForloebID INTEGER NOT NULL,
+    DiagnoseID INTEGER NOT NULL
+);
+CREATE TABLE DiagnoseStatus (
+    GEpjID INTEGER PRIMARY KEY,
+    KontekstID INTEGER NOT NULL,
+    Dokumenteret DATETIME,
+    Besluttet DATETIME,
+    Art TEXT,
+    EjerArt TEXT
+);
+CREATE TABLE DiagnostikNotat (
+    KontekstID INTEGER PRIMARY KEY,
+    Beskrivelse TEXT
+);
+"""
+
+# Indexes mirroring the lookups SolteqTandDatabase does, created after populating for speed
+INDEXES = """
+CREATE UNIQUE INDEX IX_PATIENT_cpr ON PATIENT (cpr);
+CREATE INDEX IX_DocumentStore_entityId ON DocumentStore (entityId);
+CREATE INDEX IX_DocumentStoreStatus_DocumentId ON DocumentStoreStatus (DocumentId);
+CREATE INDEX IX_BOOKING_patientId ON BOOKING (patientId);
+CREATE INDEX IX_BOOKING_LastModifiedDateTime ON BOOKING (LastModifiedDateTime);
+CREATE INDEX IX_EVENT_entityId ON EVENT (entityId);
+CREATE INDEX IX_EVENT_timestamp ON EVENT (timestamp);
+CREATE INDEX IX_Forloeb_patientId ON Forloeb (patientId);
+CREATE INDEX IX_ForloebSymbolisering_ForloebID ON ForloebSymbolisering (ForloebID);
+"""
+
+PATIENT_STATUSES = ["Aktiv", "Afgået", "Udskrevet", "Død", "Fraflyttet"]
+EVENT_TYPES = ["AFGANG", "TILGANG", "INDKALDELSE", "UDEBLIVELSE"]
+EVENT_STATES = ["Afventer", "Behandlet", "Afsluttet"]
+FIRST_NAMES = ["Anna", "Mads", "Freja", "Noah", "Ida", "Oscar", "Emma", "William", "Alma", "Karl"]
+LAST_NAMES = ["Jensen", "Nielsen", "Hansen", "Pedersen", "Andersen", "Christensen", "Larsen", "Sørensen"]
+
+DB_HANDLER_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "..", "mbu_dev_shared_components", "solteqtand", "database", "db_handler.py"
+)
+
+_BATCH_SIZE = 10_000
+_EPOCH = datetime.datetime(2020, 1, 1, 8, 0, 0)
+
+
+@dataclasses.dataclass
+class FixtureSize:
+    """Number of rows generated. Per patient counts are averages."""
+    patients: int = 10_000
+    clinics: int = 60
+    dentists: int = 200
+    bookings_per_patient: int = 4
+    events_per_patient: int = 3
+    documents_per_patient: int = 3
+    statuses_per_document: int = 2
+    journal_notes_per_patient: int = 2
+
+
+def cpr_for(patient_id: int) -> str:
+    """Returns the unique, deterministic CPR number of a generated patient."""
+    birth_date = datetime.date(1950, 1, 1) + datetime.timedelta(days=patient_id // 10_000)
+    return f"{birth_date:%d%m%y}{patient_id % 10_000:04d}"
+
+
+def _timestamp(rng: random.Random) -> str:
+    return (_EPOCH + datetime.timedelta(minutes=rng.randrange(5 * 365 * 24 * 60))).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _insert(connection: sqlite3.Connection, table: str, columns: Sequence[str], rows: Iterator[tuple]) -> int:
+    """Inserts rows in batches, so the generated rows never have to be held in memory at once."""
+    statement = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    count = 0
+    while True:
+        batch = list(itertools.islice(rows, _BATCH_SIZE))
+        if not batch:
+            return count
+        connection.executemany(statement, batch)
+        count += len(batch)
+
+
+def populate(connection: sqlite3.Connection, size: FixtureSize = FixtureSize(), seed: int = 0) -> dict:
+    """
+    Creates the schema and fills it with synthetic data.
+
+    Args:
+        connection (sqlite3.Connection): An empty SQLite database.
+        size (FixtureSize): Number of rows to generate.
+        seed (int): Seed making the generated data reproducible.
+
+    Returns:
+        dict: Number of rows inserted per table.
+    """
+    rng = random.Random(seed)
+    connection.executescript(SCHEMA)
+    counts = {}
+
+    counts["KEYWORD"] = _insert(connection, "KEYWORD", ["keywordId", "value", "text"], (
+        ("patientStatus", value, text) for value, text in enumerate(PATIENT_STATUSES)
+    ))
+    counts["BOOKINGTYPE"] = _insert(connection, "BOOKINGTYPE", ["BookingTypeID", "Description", "PrinterFriendlyText"], (
+        (i, description, description.upper()) for i, description in enumerate(["Undersøgelse", "Behandling", "Akut", "Kontrol"], start=1)
+    ))
+    counts["CLINIC"] = _insert(connection, "CLINIC", ["clinicId", "name", "type", "streetAddress", "countyCode", "zip", "phoneNumber", "contractorId", "isPrimary"], (
+        (i, f"Tandklinik {i}", rng.choice(["KOMMUNAL", "PRIVAT"]), f"Klinikvej {i}", "751", f"{8000 + i % 300}", f"8{i:07d}", f"C{i:05d}", i % 2)
+        for i in range(1, size.clinics + 1)
+    ))
+    counts["DENTIST"] = _insert(connection, "DENTIST", ["dentistId", "name"], (
+        (i, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}") for i in range(1, size.dentists + 1)
+    ))
+    counts["PATIENT"] = _insert(connection, "PATIENT", ["patientId", "cpr", "firstName", "lastName", "patientStatus", "preferredDentalClinicId", "isPreferredDentalClinicLocked", "privateClinicId", "dentistId"], (
+        (
+            i, cpr_for(i), rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), rng.randrange(len(PATIENT_STATUSES)),
+            rng.randint(1, size.clinics), rng.randint(0, 1), rng.randint(1, size.clinics),
+            rng.randint(1, size.dentists) if rng.random() < 0.9 else None,
+        )
+        for i in range(1, size.patients + 1)
+    ))
+
+    def bookings():
+        booking_id = itertools.count(1)
+        for patient_id in range(1, size.patients + 1):
+            for _ in range(rng.randint(0, 2 * size.bookings_per_patient)):
+                start = _timestamp(rng)
+                created = _timestamp(rng)
+                yield (next(booking_id), patient_id, rng.randint(1, 4), start, start, rng.randint(0, 1), rng.choice(["SMS", "Brev", None]), "Tid", None, created, max(created, _timestamp(rng)))
+
+    counts["BOOKING"] = _insert(connection, "BOOKING", ["BookingID", "patientId", "BookingTypeID", "StartTime", "EndTime", "PatientNotified", "PatientNotifiedVia", "BookingText", "Warnings", "CreatedDateTime", "LastModifiedDateTime"], bookings())
+
+    def events():
+        event_id = itertools.count(1)
+        for patient_id in range(1, size.patients + 1):
+            for _ in range(rng.randint(0, 2 * size.events_per_patient)):
+                timestamp = _timestamp(rng)
+                yield (next(event_id), rng.choice(EVENT_TYPES), rng.choice(EVENT_STATES), timestamp, timestamp, rng.randint(1, size.clinics), patient_id, _timestamp(rng), int(rng.random() < 0.3))
+
+    counts["EVENT"] = _insert(connection, "EVENT", ["eventId", "type", "currentStateText", "currentStateDate", "timestamp", "clinicId", "entityId", "eventTriggerDate", "archived"], events())
+
+    documents_per_patient = [rng.randint(0, 2 * size.documents_per_patient) for _ in range(size.patients)]
+
+    def documents():
+        document_id = itertools.count(1)
+        for patient_id, count in enumerate(documents_per_patient, start=1):
+            for _ in range(count):
+                doc_id = next(document_id)
+                unique_name = f"{doc_id:08x}.pdf"
+                yield (doc_id, patient_id, f"dokument_{doc_id}.pdf", unique_name, rng.choice(["Journal", "Brev", "Røntgen"]), "Dokument", 0, "application/pdf")
+
+    counts["DocumentStore"] = _insert(connection, "DocumentStore", ["DocumentId", "entityId", "OriginalFilename", "UniqueFilename", "DocumentType", "DocumentDescription", "Priviledged", "ContentType"], documents())
+
+    def document_statuses():
+        history_id = itertools.count(1)
+        for doc_id in range(1, counts["DocumentStore"] + 1):
+            for _ in range(rng.randint(1, 2 * size.statuses_per_document - 1)):
+                documented = _timestamp(rng)
+                yield (next(history_id), doc_id, rng.randint(1, 4), rng.randint(0, 1), "RPA", documented, max(documented, _timestamp(rng)))
+
+    counts["DocumentStoreStatus"] = _insert(connection, "DocumentStoreStatus", ["Document_HistoryId", "DocumentId", "DocumentStoreStatusId", "SentToNemSMS", "DocumentedBy", "Documented", "Decided"], document_statuses())
+
+    counts["Forloeb"] = _insert(connection, "Forloeb", ["ForloebID", "patientId"], ((i, i) for i in range(1, size.patients + 1)))
+    notes_per_patient = [rng.randint(0, 2 * size.journal_notes_per_patient) for _ in range(size.patients)]
+    note_ids = [(patient_id, note_id) for patient_id, note_id in zip(
+        (patient_id for patient_id, count in enumerate(notes_per_patient, start=1) for _ in range(count)),
+        itertools.count(1),
+    )]
+    counts["ForloebSymbolisering"] = _insert(connection, "ForloebSymbolisering", ["ForloebID", "DiagnoseID"], iter(note_ids))
+    counts["DiagnoseStatus"] = _insert(connection, "DiagnoseStatus", ["GEpjID", "KontekstID", "Dokumenteret", "Besluttet", "Art", "EjerArt"], (
+        (note_id, note_id, _timestamp(rng), _timestamp(rng), "Notat", "Tandlæge") for _, note_id in note_ids
+    ))
+    counts["DiagnostikNotat"] = _insert(connection, "DiagnostikNotat", ["KontekstID", "Beskrivelse"], (
+        (note_id, f"Journalnotat {note_id}") for _, note_id in note_ids
+    ))
+
+    connection.executescript(INDEXES)
+    connection.commit()
+    return counts
+
+
+def create_fixture_database(path: str, size: FixtureSize = FixtureSize(), seed: int = 0, overwrite: bool = False) -> str:
+    """
+    Creates a populated fixture database file, unless it already exists.
+
+    Args:
+        path (str): Path of the SQLite file.
+        size (FixtureSize): Number of rows to generate.
+        seed (int): Seed making the generated data reproducible.
+        overwrite (bool): Whether to recreate an existing file.
+
+    Returns:
+        str: The path of the database file.
+    """
+    if os.path.exists(path):
+        if not overwrite:
+            return path
+        os.remove(path)
+
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode = OFF")
+    connection.execute("PRAGMA synchronous = OFF")
+    try:
+        populate(connection, size, seed)
+    finally:
+        connection.close()
+    return path
+
+
+def getter_base_queries(path: str = DB_HANDLER_PATH) -> dict:
+    """
+    Reads the base queries of the SolteqTandDatabase get_list_of_* methods from source.
+
+    Returns:
+        dict: The base query of each getter, by method name.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        tree = ast.parse(file.read())
+
+    # Base queries shared between getters are module level constants
+    constants = {
+        statement.targets[0].id: statement.value.value
+        for statement in tree.body
+        if isinstance(statement, ast.Assign) and isinstance(statement.value, ast.Constant)
+        and isinstance(statement.targets[0], ast.Name)
+    }
+
+    queries = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.FunctionDef) and node.name.startswith("get_list_of_"):
+            for statement in node.body:
+                if isinstance(statement, ast.Assign) and getattr(statement.targets[0], "id", None) == "base_query":
+                    value = statement.value
+                    queries[node.name] = constants[value.id] if isinstance(value, ast.Name) else value.value
+    return queries
+
+
+# ---------------------------------------------------------------------------
+# T-SQL to SQLite shim
+# ---------------------------------------------------------------------------
+
+_DATABASE_PREFIX = re.compile(r"\[(tmtdata_prod|romexis_db)\]\.\[dbo\]\.", re.IGNORECASE)
+_STATEMENT_SPLIT = re.compile(r";(?=(?:[^']*'[^']*')*[^']*$)")
+
+
+def _tsql_substring(value, start, length):
+    """T-SQL SUBSTRING, where a start below 1 shortens the result instead of shifting it."""
+    if value is None:
+        return None
+    end = start + length - 1
+    return str(value)[max(start, 1) - 1:max(end, 0)]
+
+
+def _tsql_concat(*values):
+    """T-SQL CONCAT, which treats NULL as an empty string."""
+    return "".join("" if value is None else str(value) for value in values)
+
+
+def translate_tsql(query: str) -> str:
+    """
+    Translates the T-SQL used by the database handlers to SQLite.
+
+    Bracketed identifiers, CTEs, window functions and ? parameters work as is in SQLite.
+    Only the three part database names are removed; T-SQL functions are provided
+    as SQLite functions by connect.
+
+    Args:
+        query (str): The T-SQL query.
+
+    Returns:
+        str: The query for SQLite.
+    """
+    return _DATABASE_PREFIX.sub("", query)
+
+
+class FixtureCursor:
+    """pyodbc-like cursor over a SQLite connection, supporting multi statement batches with nextset."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self._connection = connection
+        self._results: List[tuple] = []
+        self._rows = iter(())
+        self.description = None
+        self.messages = []
+        self.rowcount = -1
+
+    def execute(self, query: str, params: Optional[Sequence] = ()):
+        """Executes a T-SQL query or batch; the result sets are read with fetch* and nextset."""
+        params = list(params or ())
+        statements = [statement for statement in _STATEMENT_SPLIT.split(translate_tsql(query)) if statement.strip()]
+        self._results = []
+        for statement in statements:
+            count = statement.count("?")
+            cursor = self._connection.execute(statement, params[:count])
+            params = params[count:]
+            if cursor.description:
+                self._results.append((cursor.description, cursor.fetchall()))
+            else:
+                self.rowcount = cursor.rowcount
+        self._next_result()
+        return self
+
+    def _next_result(self) -> bool:
+        if not self._results:
+            self.description, self._rows = None, []
+            return False
+        self.description, rows = self._results.pop(0)
+        self._rows = iter(rows)
+        return True
+
+    def fetchall(self) -> list:
+        """Returns the remaining rows of the current result set."""
+        return list(self._rows)
+
+    def fetchone(self):
+        """Returns the next row of the current result set, or None."""
+        return next(self._rows, None)
+
+    def fetchmany(self, size: int = 1) -> list:
+        """Returns up to size rows of the current result set."""
+        return list(itertools.islice(self._rows, size))
+
+    def nextset(self) -> bool:
+        """Moves to the next result set of the batch, returning False when there is none."""
+        return self._next_result()
+
+    def close(self) -> None:
+        """Releases the result sets."""
+        self._results, self._rows = [], iter(())
+
+
+class FixtureConnection:
+    """pyodbc-like connection to a fixture database."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self._connection = connection
+
+    def cursor(self) -> FixtureCursor:
+        """Returns a new cursor."""
+        return FixtureCursor(self._connection)
+
+    def commit(self) -> None:
+        """Commits the current transaction."""
+        self._connection.commit()
+
+    def rollback(self) -> None:
+        """Rolls back the current transaction."""
+        self._connection.rollback()
+
+    def close(self) -> None:
+        """Closes the connection."""
+        self._connection.close()
+
+
+def connect(path: str = ":memory:") -> FixtureConnection:
+    """
+    Opens a fixture database with the T-SQL shim.
+
+    Args:
+        path (str): Path of the SQLite file.
+
+    Returns:
+        FixtureConnection: A connection usable in place of a pyodbc connection.
+    """
+    connection = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+    connection.create_function("SUBSTRING", 3, _tsql_substring, deterministic=True)
+    connection.create_function("CONCAT", -1, _tsql_concat, deterministic=True)
+    connection.create_function("ISNULL", 2, lambda value, default: default if value is None else value, deterministic=True)
+    connection.create_function("LEN", 1, lambda value: None if value is None else len(str(value).rstrip(" ")), deterministic=True)
+    connection.create_function("GETDATE", 0, lambda: datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    return FixtureConnection(connection)
+
+
+sqlite3.register_adapter(datetime.datetime, lambda value: value.strftime("%Y-%m-%d %H:%M:%S"))
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_converter("DATETIME", lambda value: datetime.datetime.fromisoformat(value.decode()))
@@ -0,0 +1,72 @@
+"""
+Unit tests for the AsyncQueryRunner wrapping blocking database handlers.
+A fake handler with blocking methods stands in for the pyodbc based handlers.
+"""
+
+import asyncio
+import threading
+
+import pytest
+from mbu_dev_shared_components.utils.async_query_runner import AsyncQueryRunner
+
+
+class FakeHandler:
+    """Blocking handler recording how many calls run at the same time."""
+
+    def __init__(self, barrier):
+        self.barrier = barrier
+        self.running = 0
+        self.max_running = 0
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def get_person_data(self, external_id):
+        """Waits at the barrier for another call and returns a row for the external id."""
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        # Only passes once another call is running as well, and raises BrokenBarrierError otherwise
+        self.barrier.wait()
+        with self._lock:
+            self.running -= 1
+        return [{"external_id": external_id}]
+
+    def close(self):
+        """Records that the handler was closed."""
+        self.closed = True
+
+
+def test_methods_are_awaitable_and_respect_concurrency_limit():
+    """
+    Ensure that wrapped methods can be gathered, return results in order,
+    and never run more calls at once than max_concurrency.
+    """
+    handler = FakeHandler(threading.Barrier(2, timeout=5))
+
+    async def main():
+        async with AsyncQueryRunner(handler, max_concurrency=2) as runner:
+            return await asyncio.gather(*(runner.get_person_data(str(i)) for i in range(6)))
+
+    results = asyncio.run(main())
+
+    assert results == [[{"external_id": str(i)}] for i in range(6)]
+    assert handler.max_running == 2
+    assert handler.closed
+
+
+def test_independent_runners_run_concurrently():
+    """Ensure that two databases with a limit of 1 each are queried in parallel."""
+    barrier = threading.Barrier(2, timeout=5)
+    solteq, romexis = FakeHandler(barrier), FakeHandler(barrier)
+
+    async def main():
+        async with AsyncQueryRunner(solteq, 1) as solteq_runner, AsyncQueryRunner(romexis, 1) as romexis_runner:
+            return await asyncio.gather(solteq_runner.get_person_data("a"), romexis_runner.get_person_data("b"))
+
+    assert asyncio.run(main()) == [[{"external_id": "a"}], [{"external_id": "b"}]]
+
+
+def test_invalid_concurrency_limit_raises():
+    """Ensure that a concurrency limit below 1 is rejected."""
+    with pytest.raises(ValueError):
+        AsyncQueryRunner(FakeHandler(threading.Barrier(2)), max_concurrency=0)
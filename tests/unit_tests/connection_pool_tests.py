@@ -0,0 +1,167 @@
+"""
+Unit tests for the ConnectionPool used by RomexisDbHandler, with SQLite connections.
+"""
+
+import sqlite3
+import threading
+
+import pytest
+from mbu_dev_shared_components.utils.connection_pool import ConnectionPool, shared_pool
+
+
+class CountingConnect:
+    """Opens in-memory SQLite connections and keeps them for inspection."""
+
+    def __init__(self):
+        self.opened = []
+
+    def __call__(self):
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self.opened.append(conn)
+        return conn
+
+
+def _is_closed(conn):
+    try:
+        conn.execute("SELECT 1")
+    except sqlite3.ProgrammingError:
+        return True
+    return False
+
+
+def test_connections_are_reused():
+    """Ensure that sequential queries reuse one connection."""
+    connect = CountingConnect()
+    pool = ConnectionPool(connect, max_size=2)
+
+    for _ in range(5):
+        with pool.connection() as conn:
+            conn.execute("SELECT 1")
+
+    assert len(connect.opened) == 1
+    assert pool.idle_count == 1
+
+
+def test_connection_is_discarded_after_error():
+    """Ensure that a connection that raised is closed and not handed out again."""
+    connect = CountingConnect()
+    pool = ConnectionPool(connect)
+
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection() as conn:
+            conn.execute("SELECT * FROM missing_table")
+
+    assert _is_closed(connect.opened[0])
+    with pool.connection() as conn:
+        assert conn is not connect.opened[0]
+
+
+def test_released_connection_is_rolled_back(tmp_path):
+    """Ensure that an uncommitted transaction does not leak to the next borrower of the connection."""
+    path = str(tmp_path / "pool.sqlite")
+    pool = ConnectionPool(lambda: sqlite3.connect(path, check_same_thread=False))
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE patient (cpr TEXT)")
+        conn.commit()
+        conn.execute("INSERT INTO patient VALUES ('0101011234')")
+
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM patient").fetchone() == (0,)
+
+
+def test_connection_failing_rollback_is_discarded():
+    """Ensure that a connection that can not be rolled back is not kept."""
+    connect = CountingConnect()
+    pool = ConnectionPool(connect)
+    conn = pool.acquire()
+    conn.close()
+
+    pool.release(conn)
+
+    assert pool.idle_count == 0
+
+
+def test_dropped_idle_connection_is_replaced():
+    """Ensure that an idle connection failing the ping query is closed and a new connection is handed out."""
+    connect = CountingConnect()
+    pool = ConnectionPool(connect, ping_query="SELECT alive FROM server", ping_after=0)
+    first = pool.acquire()
+    first.execute("CREATE TABLE server (alive INTEGER)")
+    pool.release(first)
+    # The next ping fails, as a query on a connection dropped by the server would
+    first.execute("DROP TABLE server")
+
+    second = pool.acquire()
+
+    assert second is not first
+    assert _is_closed(first)
+    assert len(connect.opened) == 2
+
+
+def test_connection_reused_straight_away_is_not_pinged():
+    """Ensure that a connection idle for less than ping_after is handed out again without the ping query."""
+    connect = CountingConnect()
+    # The ping query fails on every connection, so a pinged connection would be replaced
+    pool = ConnectionPool(connect, ping_query="SELECT alive FROM server", ping_after=60)
+
+    for _ in range(3):
+        with pool.connection() as conn:
+            conn.execute("SELECT 1")
+
+    assert len(connect.opened) == 1
+    assert not _is_closed(connect.opened[0])
+
+
+def test_only_max_size_idle_connections_are_kept():
+    """Ensure that connections beyond max_size are closed when released."""
+    connect = CountingConnect()
+    pool = ConnectionPool(connect, max_size=2)
+
+    connections = [pool.acquire() for _ in range(4)]
+    for conn in connections:
+        pool.release(conn)
+
+    assert pool.idle_count == 2
+    assert [_is_closed(conn) for conn in connections] == [False, False, True, True]
+
+    pool.close()
+    assert pool.idle_count == 0
+    assert all(_is_closed(conn) for conn in connections)
+
+
+def test_concurrent_use_never_shares_a_connection():
+    """Ensure that threads using the pool at the same time each get their own connection."""
+    pool = ConnectionPool(CountingConnect(), max_size=4)
+    in_use, errors = set(), []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(50):
+            with pool.connection() as conn:
+                with lock:
+                    if id(conn) in in_use:
+                        errors.append(conn)
+                    in_use.add(id(conn))
+                conn.execute("SELECT 1")
+                with lock:
+                    in_use.discard(id(conn))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert pool.idle_count <= 4
+
+
+def test_shared_pool_is_keyed_by_connection_string():
+    """Ensure that handlers with the same connection string share one pool."""
+    first = shared_pool("DRIVER=test;SERVER=a", CountingConnect())
+    second = shared_pool("DRIVER=test;SERVER=a", CountingConnect())
+    other = shared_pool("DRIVER=test;SERVER=b", CountingConnect())
+
+    assert first is second
+    assert first is not other
@@ -0,0 +1,56 @@
+"""
+Unit tests for the GetOrganized client, against the local stub server authenticating connections with NTLM.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from mbu_dev_shared_components.getorganized import api, cases
+from mbu_dev_shared_components.getorganized.client import GetOrganizedClient, close_clients, get_client
+from tests.fixtures.getorganized_stub_server import GetOrganizedStub
+
+
+@pytest.fixture
+def stub():
+    """
+    Fixture to provide a running stub server, and close the shared clients afterwards.
+    """
+    with GetOrganizedStub() as server:
+        yield server
+    close_clients()
+
+
+def test_client_authenticates_a_connection_once(stub):
+    """Ensure that requests after the first reuse the authenticated connection without a new handshake."""
+    with GetOrganizedClient("user", "password") as client:
+        responses = [client.request("GET", stub.url + "/_goapi/Cases/Metadata") for _ in range(5)]
+
+    assert [response.status_code for response in responses] == [200] * 5
+    assert stub.handshakes == 1
+    assert stub.connections == 1
+    # Three requests for the handshake of the first call, then one per call
+    assert len(stub.requests) == 3 + 4
+
+
+def test_module_functions_share_a_client(stub):
+    """Ensure that the module functions reuse the shared client of the credentials."""
+    assert api.health_check(stub.url, "user", "password")
+    response = cases.create_case({"CaseTypePrefix": "BOR"}, stub.url + "/_goapi/Cases", "user", "password")
+
+    assert response.ok
+    assert get_client("user", "password") is get_client("user", "password")
+    assert get_client("user", "password") is not get_client("other", "password")
+    assert stub.handshakes == 1
+
+
+def test_concurrent_requests_use_one_connection_per_thread(stub):
+    """Ensure that concurrent calls complete their handshakes on one connection each and reuse them afterwards."""
+    client = GetOrganizedClient("user", "password", pool_maxsize=8)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        responses = list(executor.map(lambda _: client.request("GET", stub.url), range(64)))
+    client.close()
+
+    assert all(response.ok for response in responses)
+    assert stub.refused_handshakes == 0
+    assert stub.handshakes == stub.connections <= 8
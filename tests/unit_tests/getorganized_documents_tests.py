@@ -0,0 +1,123 @@
+"""
+Unit tests for the bulk upload of documents to GetOrganized, against the local stub server.
+"""
+
+import json
+import threading
+
+import pytest
+from mbu_dev_shared_components.getorganized.client import close_clients
+from mbu_dev_shared_components.getorganized.documents import upload_files_to_case
+from mbu_dev_shared_components.getorganized.objects import DocumentJsonCreator
+from tests.fixtures.getorganized_stub_server import GetOrganizedStub
+
+UPLOAD = "/_goapi/Documents/AddToCase"
+MARK = "/_goapi/Documents/MarkMultipleAsCaseRecord/ByDocumentId"
+FINALIZE = "/_goapi/Documents/FinalizeMultiple/ByDocumentId"
+
+
+@pytest.fixture
+def stub():
+    """
+    Fixture to provide a stub server that gives each uploaded file the DocumentId 100 + its number
+    in the file name, failing the files named in stub.failures with the given statuses first.
+    """
+    with GetOrganizedStub() as server:
+        server.failures = {}
+        lock = threading.Lock()
+
+        def upload(body):
+            filename = json.loads(body)["FileName"]
+            with lock:
+                statuses = server.failures.get(filename)
+                if statuses:
+                    return statuses.pop(0), {}
+            return 200, {"DocumentId": 100 + int(filename.split(".")[0][4:])}
+
+        server.routes[UPLOAD] = upload
+        yield server
+    close_clients()
+
+
+def _files(count):
+    creator = DocumentJsonCreator()
+    return [creator.document_data_json("BOR-2025-000001", "Dokumenter", "", f"file{i}.pdf", "<z:row/>", True, "")
+            for i in range(count)]
+
+
+def _requests(stub, path):
+    return [json.loads(body) for _, _, request_path, body in stub.served if request_path == path]
+
+
+def test_uploads_are_ordered_and_followed_up_in_one_call(stub):
+    """Ensure that the results follow the files and all DocumentIds are marked and finalized in one call each."""
+    result = upload_files_to_case(_files(12), stub.url + UPLOAD, "user", "password", max_workers=4,
+                                  case_record_endpoint=stub.url + MARK, finalize_endpoint=stub.url + FINALIZE)
+
+    assert [upload.index for upload in result.uploads] == list(range(12))
+    assert result.document_ids == [100 + i for i in range(12)]
+    assert not result.failed and result.follow_up_error is None
+    assert _requests(stub, MARK) == [{"DocumentIds": result.document_ids}]
+    assert _requests(stub, FINALIZE) == [{"DocumentIds": result.document_ids, "ShouldCloseOpenTasks": False}]
+
+
+def test_failed_uploads_are_retried(stub):
+    """Ensure that server errors are retried, client errors are not, and only uploaded files are followed up."""
+    stub.failures = {"file1.pdf": [503, 502], "file2.pdf": [400], "file3.pdf": [500, 500, 500]}
+
+    result = upload_files_to_case(_files(4), stub.url + UPLOAD, "user", "password", max_attempts=3, backoff=0,
+                                  case_record_endpoint=stub.url + MARK)
+
+    assert [(upload.ok, upload.attempts) for upload in result.uploads] == [(True, 1), (True, 3), (False, 1), (False, 3)]
+    assert result.uploads[3].response.status_code == 500
+    assert _requests(stub, MARK) == [{"DocumentIds": [100, 101]}]
+
+
+def test_connection_errors_are_retried_and_reported():
+    """Ensure that an unreachable server is retried and reported per file instead of raising."""
+    with GetOrganizedStub() as server:
+        url = server.url
+    result = upload_files_to_case(_files(2), url + UPLOAD, "user", "password", max_attempts=2, backoff=0)
+    close_clients()
+
+    assert [upload.attempts for upload in result.uploads] == [2, 2]
+    assert all(upload.error is not None and upload.response is None for upload in result.uploads)
+    assert result.document_ids == []
+
+
+def test_follow_up_errors_keep_the_document_ids(stub):
+    """Ensure that a failing follow-up call is reported without losing the uploaded DocumentIds."""
+    stub.routes[MARK] = lambda body: (500, {})
+
+    result = upload_files_to_case(_files(2), stub.url + UPLOAD, "user", "password", case_record_endpoint=stub.url + MARK,
+                                  finalize_endpoint=stub.url + FINALIZE)
+
+    assert result.document_ids == [100, 101]
+    assert result.follow_up_error is not None
+    assert result.finalize_response is None
+    assert _requests(stub, FINALIZE) == []
+
+
+def test_unexpected_errors_are_reported_per_file(stub):
+    """Ensure that a payload that can not be serialized fails its own upload without losing the others."""
+    files = _files(3)
+    files[1]["FileName"] = b"file1.pdf"
+
+    result = upload_files_to_case(files, stub.url + UPLOAD, "user", "password", backoff=0, case_record_endpoint=stub.url + MARK)
+
+    assert [(upload.ok, upload.attempts) for upload in result.uploads] == [(True, 1), (False, 1), (True, 1)]
+    assert isinstance(result.uploads[1].error, TypeError)
+    assert _requests(stub, MARK) == [{"DocumentIds": [100, 102]}]
+
+
+@pytest.mark.parametrize("payload", [b"<html>Saved</html>", [100], {"Message": "Saved"}, {"DocumentId": None}])
+def test_responses_without_a_document_id_are_failed(stub, payload):
+    """Ensure that a successful response without a DocumentId counts as a failed upload instead of raising."""
+    stub.routes[UPLOAD] = lambda body: (200, payload)
+
+    result = upload_files_to_case(_files(2), stub.url + UPLOAD, "user", "password", case_record_endpoint=stub.url + MARK)
+
+    assert [upload.ok for upload in result.uploads] == [False, False]
+    assert [upload.response.status_code for upload in result.uploads] == [200, 200]
+    assert result.document_ids == []
+    assert _requests(stub, MARK) == []
@@ -0,0 +1,100 @@
+"""
+Unit tests for the streaming upload of large files to GetOrganized.
+"""
+
+import base64
+import json
+import os
+
+import pytest
+from mbu_dev_shared_components.getorganized.client import GetOrganizedClient, close_clients
+from mbu_dev_shared_components.getorganized.documents import upload_large_file_to_case
+from mbu_dev_shared_components.getorganized.objects import DocumentJsonCreator
+from mbu_dev_shared_components.getorganized.upload_stream import DocumentUploadStream
+from tests.fixtures.getorganized_stub_server import GetOrganizedStub
+
+UPLOAD = "/_goapi/Documents/AddToCase"
+FIELDS = ("BOR-2025-000001", "Dokumenter", "Journal", "scan.pdf", '<z:row xmlns:z="#RowsetSchema" ows_Title="Scan" />', True)
+
+
+@pytest.fixture(params=[0, 1, 2, 3, 200_001])
+def document(request, tmp_path):
+    """
+    Fixture to provide files of sizes covering every base64 padding, and one larger than a block.
+    """
+    path = tmp_path / "scan.pdf"
+    path.write_bytes(os.urandom(request.param))
+    return str(path)
+
+
+@pytest.fixture
+def stub():
+    """
+    Fixture to provide a stub server decoding the uploaded payloads, and close the shared clients afterwards.
+    """
+    with GetOrganizedStub() as server:
+        server.uploads = []
+        server.routes[UPLOAD] = lambda body: (server.uploads.append(json.loads(body)), (200, {"DocumentId": 1}))[1]
+        yield server
+    close_clients()
+
+
+def _expected_payload(path):
+    with open(path, "rb") as file:
+        payload = DocumentJsonCreator().document_data_json(*FIELDS, base64.b64encode(file.read()).decode())
+    return json.dumps(payload).encode()
+
+
+def test_stream_matches_the_json_payload(document):
+    """Ensure that the stream produces the JSON of document_data_json with the file as base64, whatever the read size."""
+    expected = _expected_payload(document)
+
+    with DocumentUploadStream(document, *FIELDS) as stream:
+        assert len(stream) == len(expected)
+        assert stream.read() == expected
+        for size in (1, 5, 4096):
+            stream.seek(0)
+            assert b"".join(iter(lambda: stream.read(size), b"")) == expected
+
+
+def test_stream_seeks_anywhere(document):
+    """Ensure that reading after a seek returns the payload from that position."""
+    expected = _expected_payload(document)
+
+    with DocumentUploadStream(document, *FIELDS) as stream:
+        for position in sorted({0, 1, len(expected) // 3, len(expected) - 3, len(expected)}):
+            stream.seek(position)
+            assert stream.read(50) == expected[position:position + 50]
+        stream.read()
+        stream.seek(-len(expected), os.SEEK_CUR)
+        assert stream.tell() == 0
+
+
+def test_large_file_is_uploaded_once_with_progress(stub, tmp_path):
+    """Ensure that the file is sent once, on a connection authenticated before, and progress reaches the payload size."""
+    path = tmp_path / "scan.pdf"
+    content = os.urandom(3_000_000)
+    path.write_bytes(content)
+    progress = []
+
+    response = upload_large_file_to_case(str(path), *FIELDS, stub.url + UPLOAD, "user", "password",
+                                         progress=lambda sent, total: progress.append((sent, total)))
+
+    assert response.ok
+    assert [base64.b64decode(upload["Bytes"]) for upload in stub.uploads] == [content]
+    assert stub.uploads[0]["FileName"] == "scan.pdf" and stub.uploads[0]["Overwrite"] is True
+    assert [len(body) for _, method, _, body in stub.requests if method == "POST"] == [len(_expected_payload(str(path)))]
+    assert progress[-1][0] == progress[-1][1] == len(_expected_payload(str(path)))
+    assert [sent for sent, _ in progress] == sorted(sent for sent, _ in progress)
+
+
+def test_stream_is_resent_during_a_handshake(stub, document):
+    """Ensure that the body is rewound and sent again when it is posted on a connection that is not authenticated."""
+    with GetOrganizedClient("user", "password") as client, DocumentUploadStream(document, *FIELDS) as body:
+        response = client.request("POST", stub.url + UPLOAD, data=body)
+
+    assert response.ok
+    assert stub.uploads == [json.loads(_expected_payload(document))]
+    # Once per leg of the handshake, the whole payload every time
+    assert [body for _, _, _, body in stub.requests] == [_expected_payload(document)] * 3
+    assert stub.handshakes == 1
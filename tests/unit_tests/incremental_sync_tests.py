@@ -0,0 +1,104 @@
+"""
+Unit tests for IncrementalSync, the "changed since" synchronization
+used by SolteqTandDatabase.get_new_events and get_new_bookings.
+An in-memory list of event rows stands in for the database.
+"""
+
+import datetime
+
+import pytest
+from mbu_dev_shared_components.utils.incremental_sync import IncrementalSync
+
+T0 = datetime.datetime(2025, 3, 1, 12, 0, 0)
+
+
+class FakeEventTable:
+    """In-memory event rows, queried like SolteqTandDatabase.get_list_of_events with a timestamp filter."""
+
+    def __init__(self):
+        self.rows = []
+        self.queried_since = []
+
+    def add(self, event_id, minutes, state="Afventer"):
+        """Adds an event with a timestamp relative to T0."""
+        self.rows.append({"eventId": event_id, "timestamp": T0 + datetime.timedelta(minutes=minutes), "currentStateText": state})
+
+    def fetch(self, since):
+        """Returns the rows at or after since, ordered by timestamp."""
+        self.queried_since.append(since)
+        rows = [row for row in self.rows if since is None or row["timestamp"] >= since]
+        return sorted(rows, key=lambda row: row["timestamp"])
+
+
+@pytest.fixture
+def sync(tmp_path):
+    """
+    Fixture to provide an IncrementalSync with a five minute overlap persisted in a temp dir.
+    """
+    return IncrementalSync(str(tmp_path / "sync.json"), overlap=datetime.timedelta(minutes=5))
+
+
+def _ids(rows):
+    return [row["eventId"] for row in rows]
+
+
+def test_first_run_reads_everything_and_later_runs_only_new_rows(sync: IncrementalSync):
+    """Ensure that the second run queries from the watermark minus overlap and only returns new rows."""
+    table = FakeEventTable()
+    table.add(1, 0)
+    table.add(2, 10)
+
+    assert _ids(sync.fetch("events", table.fetch, "timestamp")) == [1, 2]
+
+    table.add(3, 12)
+    assert _ids(sync.fetch("events", table.fetch, "timestamp")) == [3]
+    assert table.queried_since == [None, T0 + datetime.timedelta(minutes=5)]
+
+
+def test_late_row_within_overlap_is_returned_once(sync: IncrementalSync):
+    """
+    Ensure that a row committed late with a timestamp slightly before the watermark
+    (e.g. because of clock skew) is picked up, and not returned again afterwards.
+    """
+    table = FakeEventTable()
+    table.add(1, 10)
+    sync.fetch("events", table.fetch, "timestamp")
+
+    table.add(2, 8)
+    assert _ids(sync.fetch("events", table.fetch, "timestamp")) == [2]
+    assert _ids(sync.fetch("events", table.fetch, "timestamp")) == []
+
+
+def test_changed_row_is_returned_again(sync: IncrementalSync):
+    """Ensure that a row changing values within the overlap window is not suppressed as a duplicate."""
+    table = FakeEventTable()
+    table.add(1, 10)
+    sync.fetch("events", table.fetch, "timestamp")
+
+    table.rows[0]["currentStateText"] = "Afsluttet"
+    assert _ids(sync.fetch("events", table.fetch, "timestamp")) == [1]
+
+
+def test_watermark_is_persisted_only_on_commit(sync: IncrementalSync, tmp_path):
+    """Ensure that with commit=False a crash before commit makes the next run return the rows again."""
+    table = FakeEventTable()
+    table.add(1, 0)
+
+    assert _ids(sync.fetch("events", table.fetch, "timestamp", commit=False)) == [1]
+    restarted = IncrementalSync(str(tmp_path / "sync.json"), overlap=datetime.timedelta(minutes=5))
+    assert _ids(restarted.fetch("events", table.fetch, "timestamp", commit=False)) == [1]
+
+    restarted.commit("events")
+    assert _ids(IncrementalSync(str(tmp_path / "sync.json")).fetch("events", table.fetch, "timestamp")) == []
+
+
+def test_sync_keys_are_independent_and_can_be_reset(sync: IncrementalSync):
+    """Ensure that watermarks are tracked per key and that reset starts a key over."""
+    table = FakeEventTable()
+    table.add(1, 0)
+
+    sync.fetch("a", table.fetch, "timestamp")
+    assert _ids(sync.fetch("b", table.fetch, "timestamp")) == [1]
+
+    sync.reset("a")
+    assert _ids(sync.fetch("a", table.fetch, "timestamp")) == [1]
@@ -0,0 +1,231 @@
+"""
+Unit tests for the connection-free query builder used by SolteqTandDatabase._construct_sql_statement.
+
+The example based tests pin the SQL generated for each kind of filter.
+The property based tests generate thousands of filter combinations, run the
+generated SQL against an in-memory SQLite table and compare the matched rows
+with the same filters evaluated in Python.
+"""
+
+import re
+import sqlite3
+
+import pytest
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from mbu_dev_shared_components.utils.query_builder import And, Or, QueryBuilder, build_sql_statement
+
+BASE = "SELECT * FROM t WHERE 1=1"
+
+
+@pytest.mark.parametrize("filters, expected_sql, expected_params", [
+    ({"p.cpr": "0101011234"}, " AND p.cpr = ?", ["0101011234"]),
+    ({"e.name": "%Klinik%"}, " AND e.name LIKE ?", ["%Klinik%"]),
+    ({"e.msg": ["A", "B"]}, " AND e.msg IN (?, ?)", ["A", "B"]),
+    ({"e.date": ("2024-01-01", "2024-12-31")}, " AND e.date BETWEEN ? AND ?", ["2024-01-01", "2024-12-31"]),
+    ({"e.date": ("<", "2024-01-01")}, " AND e.date < ?", ["2024-01-01"]),
+    ({"e.date": (">=", 5)}, " AND e.date >= ?", [5]),
+    ({"e.msg": ("NOT IN", ["A", "B"])}, " AND e.msg NOT IN (?, ?)", ["A", "B"]),
+    ({"e.name": ("NOT LIKE", "%Test%")}, " AND e.name NOT LIKE ?", ["%Test%"]),
+    ({"p.dentistId": None}, " AND p.dentistId IS NULL", []),
+    ({"p.dentistId": ("IS NOT", None)}, " AND p.dentistId IS NOT NULL", []),
+    ({"p.dentistId": ("<>", None)}, " AND p.dentistId IS NOT NULL", []),
+    ({"e.msg": []}, " AND 1=0", []),
+    ({"e.range": ("in", "out")}, " AND e.range BETWEEN ? AND ?", ["in", "out"]),
+    ({"p.cpr": "1", "e.archived": 0}, " AND p.cpr = ? AND e.archived = ?", ["1", 0]),
+])
+def test_single_and_filters(filters, expected_sql, expected_params):
+    """Ensure that every kind of filter value produces the expected condition and parameters."""
+    sql, params = build_sql_statement(BASE, filters=filters)
+
+    assert sql == BASE + expected_sql
+    assert params == expected_params
+
+
+def test_or_filters_and_ordering_match_previous_behaviour():
+    """
+    Ensure that or_filters keep their original semantics: the conditions of each
+    dictionary are combined with OR, as are the dictionaries, and invalid directions fall back to ASC.
+    """
+    sql, params = build_sql_statement(
+        BASE,
+        filters={"e.archived": 0},
+        or_filters=[{"e.name": "Clinic A", "e.msg": "%Sched%"}, {"e.name": "Clinic B"}],
+        order_by="e.timestamp",
+        order_direction="sideways",
+    )
+
+    assert sql == BASE + " AND e.archived = ? AND ((e.name = ? OR e.msg LIKE ?) OR (e.name = ?)) ORDER BY e.timestamp ASC"
+    assert params == [0, "Clinic A", "%Sched%", "Clinic B"]
+
+
+def test_nested_groups():
+    """Ensure that nested And/Or groups are parenthesized and parameters kept in order."""
+    sql, params = build_sql_statement(
+        BASE,
+        filters=Or({"e.type": "A"}, And({"e.type": "B"}, {"e.archived": 0, "e.name": None})),
+        order_by="e.timestamp",
+        order_direction="desc",
+    )
+
+    assert sql == BASE + " AND ((e.type = ?) OR ((e.type = ?) AND (e.archived = ? AND e.name IS NULL))) ORDER BY e.timestamp DESC"
+    assert params == ["A", "B", 0]
+
+
+def test_column_whitelist():
+    """Ensure that a builder with allowed columns rejects other columns in filters and ORDER BY."""
+    builder = QueryBuilder(allowed_columns={"p.cpr", "e.timestamp"})
+
+    assert builder.build(BASE, filters={"p.cpr": "1"}, order_by="e.timestamp")[1] == ["1"]
+    with pytest.raises(ValueError):
+        builder.build(BASE, filters={"p.cpr; DROP TABLE PATIENT --": "1"})
+    with pytest.raises(ValueError):
+        builder.build(BASE, order_by="(SELECT 1)")
+    with pytest.raises(ValueError):
+        builder.build(BASE, filters=Or({"p.cpr": "1"}, {"p.name": "x"}))
+
+
+def test_invalid_groups_raise():
+    """Ensure that groups reject empty contents and values that are not filters."""
+    with pytest.raises(ValueError):
+        Or()
+    with pytest.raises(TypeError):
+        And("p.cpr = 1")
+
+
+# ---------------------------------------------------------------------------
+# Property based tests against SQLite
+# ---------------------------------------------------------------------------
+
+COLUMNS = ["t.a", "t.b", "t.c"]
+numbers = st.integers(min_value=0, max_value=5)
+texts = st.text(alphabet="xyz", max_size=3)
+rows_strategy = st.lists(
+    st.tuples(st.none() | numbers, st.none() | numbers, st.none() | texts),
+    max_size=12,
+)
+
+
+def _values_for(column):
+    return numbers if column != "t.c" else texts
+
+
+@st.composite
+def condition_values(draw, column):
+    """Draws one filter value of any supported kind for a column."""
+    values = _values_for(column)
+    kinds = ["eq", "null", "in", "not_in", "between", "cmp", "is_not"]
+    if column == "t.c":
+        kinds += ["like", "not_like"]
+    kind = draw(st.sampled_from(kinds))
+    if kind == "eq":
+        return draw(values)
+    if kind == "null":
+        return None
+    if kind == "in":
+        return draw(st.lists(values, max_size=4))
+    if kind == "not_in":
+        return ("NOT IN", draw(st.lists(values, max_size=4)))
+    if kind == "between":
+        return (draw(values), draw(values))
+    if kind == "cmp":
+        return (draw(st.sampled_from(["<", "<=", ">", ">=", "=", "<>", "!="])), draw(values))
+    if kind == "is_not":
+        return ("IS NOT", None)
+    pattern = draw(st.sampled_from(["%", "x%", "%y", "%z%", "%xy%"]))
+    return pattern if kind == "like" else ("NOT LIKE", pattern)
+
+
+@st.composite
+def filter_dicts(draw):
+    """Draws a dictionary of one to three column conditions."""
+    columns = draw(st.lists(st.sampled_from(COLUMNS), min_size=1, max_size=3, unique=True))
+    return {column: draw(condition_values(column)) for column in columns}
+
+
+groups = st.recursive(
+    filter_dicts(),
+    lambda children: st.builds(lambda cls, items: cls(*items), st.sampled_from([And, Or]), st.lists(children, min_size=1, max_size=3)),
+    max_leaves=6,
+)
+
+
+def _like(value, pattern):
+    regex = "".join(".*" if char == "%" else re.escape(char) for char in pattern)
+    return re.fullmatch(regex, value) is not None
+
+
+def _matches(value, condition):
+    """Evaluates a filter value in Python, treating SQL's unknown (NULL) results as no match."""
+    if isinstance(condition, tuple):
+        operator, operand = condition
+        if operator == "IS NOT":
+            return value is not None
+        if operator == "<>" and operand is None:
+            return value is not None
+        if operator == "NOT IN" and not operand:
+            return True
+        if value is None:
+            return False
+        if operator == "NOT IN":
+            return value not in operand
+        if operator == "NOT LIKE":
+            return not _like(value, operand)
+        if operator in ("<", "<=", ">", ">=", "=", "<>", "!="):
+            return {
+                "<": value < operand, "<=": value <= operand, ">": value > operand, ">=": value >= operand,
+                "=": value == operand, "<>": value != operand, "!=": value != operand,
+            }[operator]
+        return condition[0] <= value <= condition[1]
+    if condition is None:
+        return value is None
+    if value is None:
+        return False
+    if isinstance(condition, list):
+        return value in condition
+    if isinstance(condition, str) and "%" in condition:
+        return _like(value, condition)
+    return value == condition
+
+
+def _evaluate(filters, row):
+    values = dict(zip(COLUMNS, row))
+    if isinstance(filters, And):
+        return all(_evaluate(item, row) for item in filters.items)
+    if isinstance(filters, Or):
+        return any(_evaluate(item, row) for item in filters.items)
+    return all(_matches(values[column], condition) for column, condition in filters.items())
+
+
+_CONNECTION = sqlite3.connect(":memory:")
+# Case sensitive LIKE, as with the default collation of the Solteq Tand database
+_CONNECTION.execute("PRAGMA case_sensitive_like = ON")
+_CONNECTION.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, a INTEGER, b INTEGER, c TEXT)")
+
+
+def _run(rows, sql, params):
+    connection = _CONNECTION
+    connection.execute("DELETE FROM t")
+    connection.executemany("INSERT INTO t (id, a, b, c) VALUES (?, ?, ?, ?)", [(i, *row) for i, row in enumerate(rows)])
+    return sorted(row_id for (row_id,) in connection.execute(sql, params))
+
+
+@settings(max_examples=1000, deadline=None)
+@given(rows=rows_strategy, filters=st.none() | groups, or_filters=st.lists(filter_dicts(), max_size=3))
+def test_generated_sql_matches_python_semantics(rows, filters, or_filters):
+    """
+    Ensure that for any combination of filters, groups and or_filters the generated
+    SQL selects exactly the rows the filters describe, with one parameter per placeholder.
+    """
+    sql, params = build_sql_statement("SELECT id FROM t WHERE 1=1", filters, or_filters, order_by="t.id")
+
+    assert sql.count("?") == len(params)
+
+    expected = [
+        i for i, row in enumerate(rows)
+        if (filters is None or _evaluate(filters, row))
+        and (not or_filters or any(_matches(dict(zip(COLUMNS, row))[column], value) for or_filter in or_filters for column, value in or_filter.items()))
+    ]
+
+    assert _run(rows, sql, params) == expected
@@ -0,0 +1,87 @@
+"""
+Unit tests for the QueryCache used for Solteq Tand reference data.
+These tests need no database connection.
+"""
+
+import pytest
+from mbu_dev_shared_components.utils import query_cache
+from mbu_dev_shared_components.utils.query_cache import QueryCache
+
+
+def test_make_key_normalizes_whitespace_and_hides_namespace():
+    """
+    Ensure that the same query with different indentation maps to the same key,
+    and that the namespace (connection string) is not stored in clear text.
+    """
+    key_a = QueryCache.make_key("SELECT *\n    FROM CLINIC\n WHERE 1=1", ["a"], namespace="PWD=secret")
+    key_b = QueryCache.make_key("SELECT * FROM CLINIC WHERE 1=1", ("a",), namespace="PWD=secret")
+
+    assert key_a == key_b
+    assert "secret" not in repr(key_a)
+
+
+def test_get_or_load_only_calls_loader_on_miss():
+    """Ensure that a cached value is returned without calling the loader again."""
+    cache = QueryCache()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return [{"clinicId": 1}]
+
+    assert cache.get_or_load("key", loader) == [{"clinicId": 1}]
+    assert cache.get_or_load("key", loader) == [{"clinicId": 1}]
+    assert len(calls) == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    """Ensure that entries older than the TTL are treated as misses and removed."""
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, "time", lambda: now[0])
+
+    cache = QueryCache(ttl_seconds=10)
+    cache.set("key", "value")
+    assert cache.get("key") == (True, "value")
+
+    now[0] += 11
+    assert cache.get("key") == (False, None)
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    """Ensure that the least recently used entry is evicted when the cache is full."""
+    cache = QueryCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == (True, 1)
+    assert cache.get("b") == (False, None)
+    assert cache.get("c") == (True, 3)
+
+
+def test_persisted_cache_is_loaded_by_new_instance(tmp_path):
+    """Ensure that entries survive between two cache instances using the same file."""
+    path = str(tmp_path / "cache" / "reference.pickle")
+    QueryCache(persist_path=path).set("key", [{"name": "Tandklinik"}])
+
+    assert QueryCache(persist_path=path).get("key") == (True, [{"name": "Tandklinik"}])
+
+
+def test_corrupt_persisted_cache_is_ignored(tmp_path):
+    """Ensure that a corrupt cache file does not prevent the cache from being used."""
+    path = tmp_path / "reference.pickle"
+    path.write_bytes(b"not a pickle")
+
+    cache = QueryCache(persist_path=str(path))
+
+    assert len(cache) == 0
+
+
+def test_invalid_arguments_raise():
+    """Ensure that non-positive TTL and size limits are rejected."""
+    with pytest.raises(ValueError):
+        QueryCache(ttl_seconds=0)
+    with pytest.raises(ValueError):
+        QueryCache(max_entries=0)
@@ -0,0 +1,137 @@
+"""
+Unit tests for the query diagnostics tooling.
+
+The analysis is tested offline against a recorded fixture
+(fixtures/solteq_query_diagnostics.json) of two Solteq Tand queries,
+and the recording against a minimal fake pyodbc connection.
+"""
+
+import os
+
+import pytest
+from mbu_dev_shared_components.utils.query_diagnostics import (
+    QueryDiagnostics,
+    parse_statistics_messages,
+)
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "solteq_query_diagnostics.json")
+
+
+@pytest.fixture
+def recorded_diagnostics():
+    """
+    Fixture to provide diagnostics replayed from the recorded fixture.
+    """
+    return QueryDiagnostics.load(FIXTURE_PATH)
+
+
+def test_parse_statistics_messages_splits_compile_and_execution_time():
+    """Ensure that compile and execution times and per table IO are parsed from driver messages."""
+    statistics = parse_statistics_messages([
+        "[Microsoft][ODBC Driver 17 for SQL Server][SQL Server]SQL Server parse and compile time: \n   CPU time = 5 ms, elapsed time = 7 ms.",
+        "[Microsoft][ODBC Driver 17 for SQL Server][SQL Server]Table 'EVENT'. Scan count 2, logical reads 100, physical reads 1, read-ahead reads 0.",
+        "[Microsoft][ODBC Driver 17 for SQL Server][SQL Server]Table 'EVENT'. Scan count 1, logical reads 50, physical reads 0, read-ahead reads 0.",
+        "[Microsoft][ODBC Driver 17 for SQL Server][SQL Server] SQL Server Execution Times:\n   CPU time = 30 ms,  elapsed time = 40 ms.",
+    ])
+
+    assert statistics["compile_cpu_ms"] == 5
+    assert statistics["compile_elapsed_ms"] == 7
+    assert statistics["server_cpu_ms"] == 30
+    assert statistics["server_elapsed_ms"] == 40
+    assert statistics["io"]["EVENT"] == {"scan_count": 3, "logical_reads": 150, "physical_reads": 1}
+
+
+def test_summary_of_recorded_fixture(recorded_diagnostics: QueryDiagnostics):
+    """
+    Ensure that the replayed traces explain the slow queries:
+    the event query is dominated by server time on a scan of EVENT,
+    and the clinic query by client side fetch overhead.
+    """
+    events, clinics = recorded_diagnostics.summary()
+
+    assert events["label"] == "get_list_of_events"
+    assert events["row_count"] == 37
+    assert events["server_elapsed_ms"] == 1702
+    assert events["logical_reads"] == 48214
+    assert events["plan"]["scans"] == [{
+        "operator": "Clustered Index Scan",
+        "table": "EVENT",
+        "index": "PK_EVENT",
+        "estimated_rows": 1850000.0,
+    }]
+    assert events["plan"]["missing_indexes"][0]["table"] == "EVENT"
+    assert events["plan"]["missing_indexes"][0]["columns"]["EQUALITY"] == ["entityId"]
+
+    assert clinics["plan"] is None
+    assert clinics["overhead_seconds"] == pytest.approx(0.976)
+
+
+def test_report_and_save_round_trip(recorded_diagnostics: QueryDiagnostics, tmp_path):
+    """Ensure that the report renders and that saving and loading preserves the traces."""
+    report = recorded_diagnostics.report()
+    assert "get_list_of_events: 37 rows" in report
+    assert "missing index on EVENT" in report
+
+    path = str(tmp_path / "trace.json")
+    recorded_diagnostics.save(path)
+
+    assert QueryDiagnostics.load(path).summary() == recorded_diagnostics.summary()
+
+
+class FakeCursor:
+    """Minimal stand-in for a pyodbc cursor returning one result set and statistics messages."""
+
+    def __init__(self, executed):
+        self.executed = executed
+        self.messages = []
+        self.description = [("cpr",), ("name",)]
+
+    def execute(self, query, params=()):
+        """Records the statement and sets the messages the server would return."""
+        self.executed.append(query)
+        self.messages = [("[01000] (3615)", "Table 'PATIENT'. Scan count 1, logical reads 3, physical reads 0.")]
+        return self
+
+    def fetchall(self):
+        """Returns the rows and the execution time message, which arrives with the last row."""
+        self.messages = [("[01000] (3612)", "SQL Server Execution Times: CPU time = 1 ms,  elapsed time = 2 ms.")]
+        return [("0101011234", "Test Person")]
+
+    def fetchone(self):
+        """Returns a plan document, as when SHOWPLAN_XML is on."""
+        return ("<ShowPlanXML xmlns='http://schemas.microsoft.com/sqlserver/2004/07/showplan'/>",)
+
+    def nextset(self):
+        """Reports that there are no more result sets."""
+        self.messages = []
+        return False
+
+
+class FakeConnection:
+    """Minimal stand-in for a pyodbc connection."""
+
+    def __init__(self):
+        self.executed = []
+
+    def cursor(self):
+        """Returns a new fake cursor sharing the list of executed statements."""
+        return FakeCursor(self.executed)
+
+
+def test_execute_records_trace_and_dumps_plan(tmp_path):
+    """Ensure that execute returns the rows and records statistics and the estimated plan."""
+    diagnostics = QueryDiagnostics(plan_dir=str(tmp_path))
+    connection = FakeConnection()
+
+    columns, rows = diagnostics.execute(connection, "SELECT cpr, name FROM PATIENT WHERE cpr = ?", ["0101011234"], label="get_patient")
+
+    assert columns == ["cpr", "name"]
+    assert rows == [("0101011234", "Test Person")]
+    assert connection.executed[0] == "SET SHOWPLAN_XML ON"
+    assert "SET STATISTICS TIME ON; SET STATISTICS IO ON;" in connection.executed
+
+    summary = diagnostics.summary()[0]
+    assert summary["row_count"] == 1
+    assert summary["server_elapsed_ms"] == 2
+    assert summary["logical_reads"] == 3
+    assert os.path.exists(summary["plan_path"])
@@ -0,0 +1,135 @@
+"""
+Unit tests for the bulk getters of RomexisDbHandler, run against the local Romexis fixture database.
+
+The handler takes its connections from a ConnectionPool over the fixture database,
+and is imported with pyodbc mocked. MAX_QUERY_PARAMETERS is lowered so the values
+are split over several chunks.
+"""
+
+import sqlite3
+import sys
+from unittest import mock
+
+import pytest
+from mbu_dev_shared_components.romexis.queries import image_metadata_query
+from mbu_dev_shared_components.utils.connection_pool import ConnectionPool
+from tests.fixtures.romexis_fixture_db import external_id_for, populate
+from tests.fixtures.solteq_fixture_db import connect
+
+PATIENTS = 40
+# A person stored with a trailing space, which SQL Server ignores when comparing
+PADDED_PERSON_ID = 9999
+
+
+@pytest.fixture(scope="module")
+def romexis_path(tmp_path_factory):
+    """
+    Fixture to provide the path of a Romexis fixture database, with one person stored with a padded external id.
+    """
+    path = str(tmp_path_factory.mktemp("romexis") / "romexis.sqlite")
+    connection = connect(path)
+    # pylint: disable=protected-access
+    populate(connection._connection, patients=PATIENTS, seed=4)
+    connection._connection.execute("INSERT INTO RRM_Person (person_id, external_id, first_name) VALUES (?, ?, 'Padded')",
+                                   (PADDED_PERSON_ID, external_id_for(PADDED_PERSON_ID) + "  "))
+    connection._connection.execute("UPDATE RIM_Image_Info SET patient_id = ?, image_type = 1, status = 1 WHERE image_id = 1", (PADDED_PERSON_ID,))
+    connection.commit()
+    connection.close()
+    return path
+
+
+@pytest.fixture
+def db_handler(monkeypatch):
+    """
+    Fixture to provide the db_handler module, imported with pyodbc mocked and querying 7 values per chunk.
+    """
+    with mock.patch.dict(sys.modules, {"pyodbc": mock.MagicMock()}):
+        # pylint: disable=import-outside-toplevel
+        from mbu_dev_shared_components.romexis import db_handler as module
+
+    monkeypatch.setattr(module, "MAX_QUERY_PARAMETERS", 7)
+    return module
+
+
+@pytest.fixture
+def handler(db_handler, romexis_path):  # pylint: disable=redefined-outer-name
+    """
+    Fixture to provide a RomexisDbHandler on a pool of fixture connections.
+    """
+    with db_handler.RomexisDbHandler("fixture", pool=ConnectionPool(lambda: connect(romexis_path))) as romexis:
+        romexis.executed = []
+        execute_query = romexis._execute_query  # pylint: disable=protected-access
+
+        def recording_execute_query(query, params):
+            romexis.executed.append(params)
+            return execute_query(query, params)
+
+        romexis._execute_query = recording_execute_query  # pylint: disable=protected-access
+        yield romexis
+
+
+def test_image_metadata_bulk_matches_single_query(handler):
+    """Ensure that the chunked, deduplicated lookups give every id its person and images, and unknown ids defaults."""
+    external_ids = [external_id_for(person_id) for person_id in range(1, PATIENTS + 1)]
+
+    result = handler.get_image_metadata_bulk(external_ids + external_ids[:5] + ["unknown"])
+
+    assert list(result) == external_ids + ["unknown"]
+    assert result["unknown"] == {"person": None, "images": []}
+    # Two queries per chunk of 7 of the 41 distinct ids
+    assert [len(params) for params in handler.executed] == [7, 7] * 5 + [6, 6]
+    rows = handler._execute_query(image_metadata_query(len(external_ids)), tuple(external_ids))  # pylint: disable=protected-access
+    for external_id in external_ids:
+        assert [person["person_id"] for person in handler.get_person_data(external_id)] == [result[external_id]["person"]["person_id"]]
+        assert result[external_id]["images"] == [row for row in rows if row["external_id"] == external_id]
+
+
+def test_image_metadata_bulk_is_keyed_by_the_given_ids(handler):
+    """Ensure that rows returned with the stored form of an id are given to the ids the caller passed."""
+    external_id = external_id_for(PADDED_PERSON_ID)
+
+    result = handler.get_image_metadata_bulk([external_id, external_id + " "])
+
+    assert list(result) == [external_id, external_id + " "]
+    assert [len(params) for params in handler.executed] == [1, 1]
+    for entry in result.values():
+        assert entry["person"]["first_name"] == "Padded"
+        assert [image["image_id"] for image in entry["images"]] == [1]
+
+
+def test_gamma_data_bulk_matches_single_image_getter(handler):
+    """Ensure that the chunked gamma lookup equals get_gamma_data per image, with None for images without gamma."""
+    missing = [10_000, 10_001]
+    image_ids = list(range(1, 31)) + missing
+
+    result = handler.get_gamma_data_bulk(image_ids + [1, 2])
+
+    assert list(result) == image_ids
+    assert [len(params) for params in handler.executed] == [7, 7, 7, 7, 4]
+    assert result[10_000] is None and result[10_001] is None
+    assert any(row is None for image_id, row in result.items() if image_id not in missing)
+    for image_id in image_ids:
+        assert handler.get_gamma_data(image_id) == ([result[image_id]] if result[image_id] is not None else [])
+
+
+def test_handlers_share_a_pool_by_connection_string(db_handler, romexis_path):  # pylint: disable=redefined-outer-name
+    """Ensure that handlers with the same connection string reuse one pooled connection, discarded after an error."""
+    opened = []
+    db_handler.pyodbc.connect = lambda conn_str: opened.append(conn_str) or connect(romexis_path)
+    conn_str = f"DRIVER=fixture;DATABASE={romexis_path}"
+    first, second = db_handler.RomexisDbHandler(conn_str), db_handler.RomexisDbHandler(conn_str)
+
+    for romexis in (first, second, first):
+        assert romexis.get_person_data(external_id_for(1))[0]["person_id"] == 1
+    assert first.pool is second.pool
+    assert opened == [conn_str]
+    assert first.pool.idle_count == 1
+
+    first.close()
+    assert second.pool.idle_count == 0
+    with pytest.raises(sqlite3.OperationalError):
+        second._execute_query("SELECT * FROM missing_table", ())  # pylint: disable=protected-access
+    assert second.pool.idle_count == 0
+    assert second.get_image_ids(1) == first.get_image_ids(1)
+    assert len(opened) == 3
+    second.close()
@@ -0,0 +1,92 @@
+"""
+Unit tests for the cache of decoded Romexis images.
+"""
+
+import os
+import shutil
+
+import numpy as np
+import pytest
+from PIL import Image
+from mbu_dev_shared_components.romexis import helper_functions
+from mbu_dev_shared_components.romexis.decode_cache import DecodeCache
+from mbu_dev_shared_components.romexis.helper_functions import add_black_bar_and_text_to_image
+
+
+@pytest.fixture
+def source_image(tmp_path):
+    """
+    Fixture to provide a 120x80 grayscale source image.
+    """
+    path = tmp_path / "source" / "1234.img"
+    path.parent.mkdir()
+    Image.fromarray((np.arange(120 * 80).reshape(80, 120) % 256).astype(np.uint8)).save(path, format="PNG")
+    return str(path)
+
+
+def test_key_depends_on_content_and_parameters(source_image, tmp_path):
+    """Ensure that the key follows the file content and the decode parameters, not the path."""
+    copy = str(tmp_path / "copy.img")
+    shutil.copy(source_image, copy)
+    key = DecodeCache.key(source_image, 3, 2.2)
+
+    assert DecodeCache.key(copy, 3, 2.2) == key
+    assert DecodeCache.key(source_image, 2, 2.2) != key
+    assert DecodeCache.key(source_image, 3, 1.0) != key
+    assert DecodeCache.key(source_image, 3, 2.2, 16) != key
+
+    with open(copy, "ab") as file:
+        file.write(b"\0")
+    assert DecodeCache.key(copy, 3, 2.2) != key
+
+
+def test_put_and_get(tmp_path):
+    """Ensure that a stored array is returned memory-mapped and read-only, and a missing key gives None."""
+    cache = DecodeCache(str(tmp_path / "cache"))
+    array = np.arange(60, dtype=np.uint16).reshape(4, 5, 3)
+
+    assert cache.get("missing") is None
+    cache.put("key", array)
+    cached = cache.get("key")
+
+    assert isinstance(cached, np.memmap)
+    assert not cached.flags.writeable
+    assert np.array_equal(cached, array)
+    assert os.listdir(cache.cache_dir) == ["key.npy"]
+
+
+def test_least_recently_used_arrays_are_evicted(tmp_path):
+    """Ensure that writing past max_bytes removes the arrays that were used least recently."""
+    array = np.zeros((100, 100), dtype=np.uint8)
+    cache = DecodeCache(str(tmp_path / "cache"))
+    cache.put("a", array)
+    cache.put("b", array)
+    entry_size = cache.size // 2
+    cache.max_bytes = 2 * entry_size
+    os.utime(os.path.join(cache.cache_dir, "a.npy"), (1000, 1000))
+    os.utime(os.path.join(cache.cache_dir, "b.npy"), (2000, 2000))
+    cache.get("a")
+
+    cache.put("c", array)
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+    assert cache.size == 2 * entry_size
+
+
+def test_annotator_uses_cached_decode(source_image, tmp_path, monkeypatch):
+    """Ensure that a second export of the same image reads the cached array instead of decoding."""
+    cache = DecodeCache(str(tmp_path / "cache"))
+    first = add_black_bar_and_text_to_image(source_image, str(tmp_path / "first"), "0101011234", "Test Person",
+                                            "01-01-2025", 3, 2.2, rotation_angle=90, decode_cache=cache)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("decoded again")
+
+    monkeypatch.setattr(helper_functions, "decode_image", fail)
+    second = add_black_bar_and_text_to_image(source_image, str(tmp_path / "second"), "0101011234", "Test Person",
+                                             "01-01-2025", 3, 2.2, rotation_angle=90, decode_cache=cache)
+
+    with Image.open(first) as expected, Image.open(second) as result:
+        assert np.array_equal(np.asarray(result), np.asarray(expected))
@@ -0,0 +1,78 @@
+"""
+Unit tests for the parallel Romexis image export pipeline.
+
+The source images are small grayscale PNG files named .img, which rawpy can not
+decode, so the annotator takes its Pillow fallback path.
+"""
+
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from PIL import Image
+from mbu_dev_shared_components.romexis.export_pipeline import ImageExportJob, export_images
+from mbu_dev_shared_components.romexis.export_profiles import ExportProfile
+
+
+def _write_image(path, width=120, height=80, value=0):
+    array = (np.arange(width * height, dtype=np.uint32).reshape(height, width) + value) % 256
+    Image.fromarray(array.astype(np.uint8)).save(path, format="PNG")
+    return str(path)
+
+
+def _job(source_path, destination_path, image_type=3):
+    return ImageExportJob(source_path, str(destination_path), "0101011234", "Test Person", "01-01-2025", image_type, 1.0)
+
+
+def test_images_are_exported_in_order(tmp_path):
+    """Ensure that every image is exported, with results in job order and one progress call per image."""
+    jobs = [
+        _job(_write_image(tmp_path / f"image{i}.img", value=i), tmp_path / "out", image_type=4 if i % 2 else 3)
+        for i in range(6)
+    ]
+    calls = []
+
+    results = export_images(jobs, max_workers=2, max_in_flight=3, progress=lambda done, total, result: calls.append((done, total)))
+
+    assert [result.index for result in results] == list(range(6))
+    assert all(result.ok for result in results)
+    assert [os.path.basename(result.output_path) for result in results] == [
+        f"image{i}.jpg" if i % 2 else f"image{i}.tiff" for i in range(6)
+    ]
+    assert sorted(calls) == [(done, 6) for done in range(1, 7)]
+
+
+def test_failing_images_are_reported_per_image(tmp_path):
+    """Ensure that a failing image does not stop the export and is reported in its own result."""
+    jobs = [_job(str(tmp_path / f"missing{i}.img"), tmp_path / "out") for i in range(3)]
+    progress_results = []
+
+    results = export_images(jobs, max_workers=2, max_in_flight=1, progress=lambda done, total, result: progress_results.append(result))
+
+    assert [result.index for result in results] == [0, 1, 2]
+    assert all(isinstance(result.error, OSError) for result in results)
+    assert not any(result.ok for result in results)
+    assert len(progress_results) == 3
+
+
+def test_no_jobs():
+    """Ensure that an empty export returns without starting a pool."""
+    assert export_images([]) == []
+
+
+class CrashingProfile(ExportProfile):
+    """Export profile ending the worker process, as when it is killed for running out of memory."""
+
+    def save(self, image, path_stem):
+        os._exit(1)  # pylint: disable=protected-access
+
+
+def test_dead_worker_fails_its_images_and_the_export_continues(tmp_path):
+    """Ensure that the images after a worker died are exported on a new pool."""
+    jobs = [_job(_write_image(tmp_path / f"image{i}.img", value=i), tmp_path / "out") for i in range(4)]
+    jobs[1].profile = CrashingProfile("TIFF")
+
+    results = export_images(jobs, max_workers=1, max_in_flight=1)
+
+    assert [result.ok for result in results] == [True, False, True, True]
+    assert isinstance(results[1].error, BrokenProcessPool)
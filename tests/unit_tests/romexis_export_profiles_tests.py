@@ -0,0 +1,125 @@
+"""
+Unit tests for the Romexis export profiles.
+"""
+
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+from mbu_dev_shared_components.romexis.export_profiles import PROFILES, ExportProfile, get_profile
+from mbu_dev_shared_components.romexis.helper_functions import _to_gray16, add_black_bar_and_text_to_image
+
+LOSSLESS_8BIT = ["tiff", "tiff_lzw", "tiff_deflate", "tiff_zstd", "tiff_deflate_pyramid", "webp_lossless", "png"]
+
+
+def _xray(height=96, width=128, dtype=np.uint8):
+    """A grayscale gradient with noise, stored as RGB for 8-bit and as one channel for 16-bit."""
+    rng = np.random.default_rng(0)
+    maximum = np.iinfo(dtype).max
+    gray = (np.linspace(0, 1, width)[None, :] * np.linspace(0.2, 1, height)[:, None] * maximum * 0.9).astype(dtype)
+    gray = gray + rng.integers(0, maximum // 20, size=gray.shape, dtype=dtype)
+    return gray if dtype == np.uint16 else np.repeat(gray[:, :, None], 3, axis=2)
+
+
+@pytest.mark.parametrize("name", sorted(name for name, profile in PROFILES.items() if profile.bit_depth == 8))
+def test_profiles_save_readable_files(name, tmp_path):
+    """Ensure that every 8-bit profile writes a file with its extension that reads back at full size, lossless ones unchanged."""
+    rgb = _xray()
+    path = PROFILES[name].save(Image.fromarray(rgb), str(tmp_path / "image"))
+
+    assert path == str(tmp_path / "image") + PROFILES[name].extension
+    with Image.open(path) as image:
+        assert image.size == (128, 96)
+        if name in LOSSLESS_8BIT:
+            assert np.array_equal(np.asarray(image.convert("RGB")), rgb)
+
+
+def test_pyramid_pages_halve_in_size(tmp_path):
+    """Ensure that a pyramidal TIFF stores the reduced resolutions as pages."""
+    path = PROFILES["tiff_deflate_pyramid"].save(Image.fromarray(_xray()), str(tmp_path / "image"))
+
+    with Image.open(path) as image:
+        sizes = []
+        for page in range(image.n_frames):
+            image.seek(page)
+            sizes.append(image.size)
+
+    assert sizes == [(128, 96), (64, 48), (32, 24), (16, 12)]
+
+
+@pytest.mark.parametrize("name", ["tiff_16bit", "png_16bit"])
+def test_16bit_export_keeps_depth(name, tmp_path):
+    """Ensure that a 16-bit source is exported as 16-bit grayscale, with the label bar at full white."""
+    source = str(tmp_path / "source.img")
+    gray = _xray(dtype=np.uint16)
+    Image.fromarray(gray).save(source, format="PNG")
+
+    path = add_black_bar_and_text_to_image(source, str(tmp_path / "out"), "0101011234", "Test Person", "01-01-2025", 1, 1.0, profile=name)
+
+    with Image.open(path) as image:
+        assert image.mode == "I;16"
+        result = np.asarray(image)
+    assert np.array_equal(result[:96], gray)
+    assert result[96:].max() == 65535
+
+
+def test_16bit_rgb_is_weighted_to_gray():
+    """Ensure that 16-bit RGB is converted with the luma weights, without wrapping around in 16 bits."""
+    rgb = np.array([[[65535, 0, 0], [0, 65535, 0], [0, 0, 65535], [65535, 65535, 65535], [40000, 30000, 20000]]],
+                   dtype=np.uint16)
+
+    gray = _to_gray16(rgb)
+
+    assert gray.dtype == np.uint16
+    expected = np.rint(rgb.astype(np.float64) @ np.array([19595, 38470, 7471]) / 65536)
+    assert np.abs(gray.astype(np.int64) - expected).max() <= 1
+    assert gray[0, 3] == 65535
+
+
+def test_photos_keep_their_colour_under_a_16bit_profile(tmp_path):
+    """Ensure that a photo exported with a 16-bit profile is saved as 8-bit RGB in the profile's format."""
+    source = str(tmp_path / "photo.img")
+    rgb = np.zeros((96, 128, 3), dtype=np.uint8)
+    rgb[..., 0], rgb[..., 1], rgb[..., 2] = 200, 120, 40
+    Image.fromarray(rgb).save(source, format="PNG")
+
+    path = add_black_bar_and_text_to_image(source, str(tmp_path / "out"), "1", "Test", "01-01-2025", 4, 1.0, profile="tiff_16bit")
+
+    assert os.path.splitext(path)[1] == ".tiff"
+    with Image.open(path) as image:
+        assert image.mode == "RGB"
+        assert np.array_equal(np.asarray(image)[:96], rgb)
+    assert get_profile("tiff_16bit", 4) == ExportProfile("TIFF", compression="tiff_adobe_deflate")
+    assert get_profile("png_16bit", 1) is PROFILES["png_16bit"]
+
+
+def test_get_profile():
+    """Ensure that the default profiles match the previous output and unknown names are rejected."""
+    assert get_profile(None, 4) == ExportProfile("JPEG")
+    assert get_profile(None, 1) == ExportProfile("TIFF")
+    assert get_profile("tiff_zstd", 1) is PROFILES["tiff_zstd"]
+    with pytest.raises(ValueError):
+        get_profile("bmp", 1)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"format": "BMP"},
+    {"format": "TIFF", "compression": "jpeg2000"},
+    {"format": "JPEG", "bit_depth": 16},
+    {"format": "PNG", "pyramid_levels": 2},
+])
+def test_invalid_profiles(kwargs):
+    """Ensure that unsupported combinations are rejected when the profile is created."""
+    with pytest.raises(ValueError):
+        ExportProfile(**kwargs)
+
+
+def test_profile_is_used_by_the_annotator(tmp_path):
+    """Ensure that the annotator saves with the given profile."""
+    source = str(tmp_path / "source.img")
+    Image.fromarray(_xray()).save(source, format="PNG")
+
+    path = add_black_bar_and_text_to_image(source, str(tmp_path / "out"), "1", "Test", "01-01-2025", 3, 1.0, profile="webp")
+
+    assert os.path.splitext(path)[1] == ".webp"
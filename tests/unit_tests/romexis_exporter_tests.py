@@ -0,0 +1,134 @@
+"""
+Unit tests for the end-to-end Romexis exporter.
+
+The database handler is replaced by an object returning metadata in the form of
+RomexisDbHandler.get_image_metadata_bulk, and the images are small PNG files
+named .img, which the annotator decodes with its Pillow fallback.
+"""
+
+import os
+from concurrent.futures.process import BrokenProcessPool
+import zipfile
+
+import numpy as np
+import pytest
+from PIL import Image
+from mbu_dev_shared_components.romexis.export_profiles import ExportProfile
+from mbu_dev_shared_components.romexis.exporter import RomexisExporter, label_date
+
+
+class FakeRomexis:
+    """Returns the metadata of a dictionary of external id to images and records the queried batches."""
+
+    def __init__(self, images):
+        self.images = images
+        self.batches = []
+
+    def get_image_metadata_bulk(self, external_ids):
+        self.batches.append(list(external_ids))
+        return {external_id: {"person": None, "images": self.images.get(external_id, [])} for external_id in external_ids}
+
+
+def _image(folder, image_id, image_type=3, gamma_value="1.5"):
+    path = folder / f"{image_id}.img"
+    Image.fromarray((np.arange(60 * 40).reshape(40, 60) % 256).astype(np.uint8)).save(path, format="PNG")
+    return {"image_id": image_id, "first_name": "Test", "last_name": "Person", "image_date": "20240131", "image_type": image_type,
+            "rotation_angle": 90, "is_mirrored": 0, "gamma_value": gamma_value, "file_path": str(path)}
+
+
+@pytest.fixture
+def share(tmp_path):
+    """
+    Fixture to provide a folder standing in for the Romexis image share.
+    """
+    folder = tmp_path / "share"
+    folder.mkdir()
+    return folder
+
+
+def test_export_annotates_and_zips_every_patient(share, tmp_path):
+    """Ensure that every image is exported to its patient's folder and each folder is zipped."""
+    romexis = FakeRomexis({
+        "0101011234": [_image(share, 1), _image(share, 2, image_type=4, gamma_value=None)],
+        "0202021234": [_image(share, 3)],
+    })
+    output_dir = tmp_path / "out"
+
+    report = RomexisExporter(romexis, str(output_dir), io_workers=2, cpu_workers=2, metadata_batch_size=1).export(
+        ["0101011234", "0202021234", "0303031234"]
+    )
+
+    assert romexis.batches == [["0101011234"], ["0202021234"], ["0303031234"]]
+    assert not report.failed
+    assert [os.path.relpath(result.output_path, output_dir) for result in report.images] == [
+        os.path.join("0101011234", "1.tiff"), os.path.join("0101011234", "2.jpg"), os.path.join("0202021234", "3.tiff")
+    ]
+    assert report.images[1].job.gamma_value == 1.0
+    assert report.images[0].job.optaget_dato == "31-01-2024"
+    assert sorted(report.archives) == ["0101011234", "0202021234"]
+    with zipfile.ZipFile(report.archives["0101011234"]) as archive:
+        assert archive.namelist() == ["1.tiff", "2.jpg"]
+    assert {name: timing.items for name, timing in report.stages.items()} == {
+        "metadata": 3, "fetch": 3, "decode": 3, "annotate": 3, "encode": 3, "zip": 2
+    }
+    assert "3 images, 0 failed, 2 archives" in report.summary()
+
+
+def test_failed_images_are_reported_without_stopping_the_export(share, tmp_path):
+    """Ensure that a missing source file fails only its image, and the patient's other images are still zipped."""
+    missing = _image(share, 2)
+    os.remove(missing["file_path"])
+    romexis = FakeRomexis({"0101011234": [_image(share, 1), missing], "0202021234": [missing]})
+
+    report = RomexisExporter(romexis, str(tmp_path / "out"), io_workers=2, cpu_workers=1).export(["0101011234", "0202021234"])
+
+    assert [result.ok for result in report.images] == [True, False, False]
+    assert isinstance(report.images[1].error, FileNotFoundError)
+    assert list(report.archives) == ["0101011234"]
+    assert not report.archive_errors
+
+
+def test_export_with_minimal_bounds(share, tmp_path):
+    """Ensure that the export completes when a single image may be staged and in a worker at a time."""
+    romexis = FakeRomexis({"0101011234": [_image(share, image_id) for image_id in range(1, 6)]})
+
+    report = RomexisExporter(romexis, str(tmp_path / "out"), io_workers=1, cpu_workers=1, max_in_flight=1, max_staged=1,
+                             zip_archives=False).export(["0101011234"])
+
+    assert [result.ok for result in report.images] == [True] * 5
+    assert not report.archives
+    assert sorted(os.listdir(tmp_path / "out" / "0101011234")) == [f"{image_id}.tiff" for image_id in range(1, 6)]
+
+
+@pytest.mark.parametrize("image_date, expected", [("20240131", "31-01-2024"), ("2024-01-31", "2024-01-31")])
+def test_label_date(image_date, expected):
+    """Ensure that Romexis dates are formatted as dd-mm-yyyy and other values are kept as they are."""
+    assert label_date(image_date) == expected
+
+
+class CrashingProfile(ExportProfile):
+    """Export profile ending the worker process, as when it is killed for running out of memory."""
+
+    def save(self, image, path_stem):
+        os._exit(1)  # pylint: disable=protected-access
+
+
+def test_dead_worker_fails_its_image_and_the_export_continues(share, tmp_path):
+    """Ensure that the images after a worker died are exported on a new pool and the report is returned."""
+    romexis = FakeRomexis({"0101011234": [_image(share, image_id) for image_id in range(1, 5)]})
+    exporter = RomexisExporter(romexis, str(tmp_path / "out"), io_workers=1, cpu_workers=1, max_in_flight=1)
+    make_job = exporter._job  # pylint: disable=protected-access
+
+    def job(external_id, image):
+        result = make_job(external_id, image)
+        if image["image_id"] == 2:
+            result.profile = CrashingProfile("TIFF")
+        return result
+
+    exporter._job = job  # pylint: disable=protected-access
+    report = exporter.export(["0101011234"])
+
+    assert [result.ok for result in report.images] == [True, False, True, True]
+    assert isinstance(report.images[1].error, BrokenProcessPool)
+    with zipfile.ZipFile(report.archives["0101011234"]) as archive:
+        assert archive.namelist() == ["1.tiff", "3.tiff", "4.tiff"]
@@ -0,0 +1,154 @@
+"""
+Unit tests for the Romexis image helper functions.
+
+The source images are small PNG files named .img, which rawpy can not
+decode, so the annotator takes its Pillow fallback path.
+"""
+
+import os
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageOps
+from mbu_dev_shared_components.romexis.helper_functions import (
+    add_black_bar_and_text_to_image, add_label_bar, apply_gamma, decode_image, gamma_lut, get_font, measure_text, transform_image
+)
+
+
+@pytest.fixture
+def source_image(tmp_path):
+    """
+    Fixture to provide a 120x80 grayscale source image outside the destination folder.
+    """
+    path = tmp_path / "source" / "1234.img"
+    path.parent.mkdir()
+    Image.fromarray((np.arange(120 * 80).reshape(80, 120) % 256).astype(np.uint8)).save(path, format="PNG")
+    return str(path)
+
+
+def test_only_the_annotated_image_is_written(source_image, tmp_path):
+    """Ensure that the image is decoded from the source path and no raw copy is left in the destination."""
+    destination = str(tmp_path / "out")
+
+    final_path = add_black_bar_and_text_to_image(source_image, destination, "0101011234", "Test Person", "01-01-2025", 3, 1.0)
+
+    assert final_path == os.path.join(destination, "1234.tiff")
+    assert os.listdir(destination) == ["1234.tiff"]
+    with Image.open(final_path) as image:
+        assert image.width == 120 and image.height > 80
+
+
+def test_keep_raw_copies_the_original(source_image, tmp_path):
+    """Ensure that keep_raw copies the raw original next to the exported image."""
+    destination = str(tmp_path / "out")
+
+    add_black_bar_and_text_to_image(source_image, destination, "0101011234", "Test Person", "01-01-2025", 4, 1.0, keep_raw=True)
+
+    assert sorted(os.listdir(destination)) == ["1234.img", "1234.jpg"]
+
+
+def test_fonts_are_cached_and_fall_back_to_the_bundled_font():
+    """Ensure that a font is loaded once per path and size, and that a missing font falls back instead of raising."""
+    font = get_font("missing-font.ttf", 30)
+
+    assert get_font("missing-font.ttf", 30) is font
+    assert get_font("missing-font.ttf", 31) is not font
+    assert font.size == 30
+
+
+@pytest.mark.parametrize("text", ["0101011234 : Test Person", "01-01-2025", "Åse Ørum-Jæger"])
+def test_measure_text_matches_textbbox(text):
+    """Ensure that measuring without an image gives the same size as ImageDraw.textbbox."""
+    font = get_font("missing-font.ttf", 40)
+    left, top, right, bottom = ImageDraw.Draw(Image.new("RGB", (1, 1))).textbbox((0, 0), text, font=font)
+
+    assert measure_text(text, font) == (right - left, bottom - top)
+
+
+def _paste_label_bar(rgb, line1, line2, font):
+    """The previous annotation: paste the image into a new canvas and draw the bar on the whole canvas."""
+    image = Image.fromarray(rgb)
+    width, height = image.size
+    _, line1_height = measure_text(line1, font)
+    _, line2_height = measure_text(line2, font)
+    margin_y = max(10, height // 50)
+    spacing = max(5, height // 80)
+    box_height = line1_height + line2_height + spacing + 2 * margin_y
+
+    canvas = Image.new("RGB", (width, height + box_height), color=(255, 255, 255))
+    canvas.paste(image, (0, 0))
+    draw = ImageDraw.Draw(canvas)
+    draw.rectangle([(0, height), (width, height + box_height)], fill="black")
+    draw.text((5, height + margin_y), line1, font=font, fill=(255, 255, 255))
+    draw.text((5, height + margin_y + line1_height + spacing), line2, font=font, fill=(255, 255, 255))
+    return np.asarray(canvas)
+
+
+@pytest.mark.parametrize("width, height", [(300, 200), (64, 900)])
+def test_add_label_bar_matches_pasted_canvas(width, height):
+    """Ensure that drawing only the bar gives the same pixels as pasting the image into a new canvas."""
+    rgb = np.random.default_rng(0).integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    font = get_font(None, max(24, height // 30))
+
+    result = add_label_bar(rgb, "0101011234 : Test Person", "01-01-2025")
+
+    assert result.dtype == np.uint8
+    assert np.array_equal(result, _paste_label_bar(rgb, "0101011234 : Test Person", "01-01-2025", font))
+
+
+@pytest.mark.parametrize("rotation_angle", [0, 90, 180, 270, -90, 450])
+@pytest.mark.parametrize("is_mirror", [False, True])
+def test_transform_image_matches_pillow_without_copying(rotation_angle, is_mirror):
+    """Ensure that right-angle rotations and mirroring give Pillow's pixels as views of the decoded array."""
+    rgb = np.random.default_rng(0).integers(0, 256, size=(40, 70, 3), dtype=np.uint8)
+    expected = Image.fromarray(rgb).rotate(rotation_angle, expand=True)
+    if is_mirror:
+        expected = ImageOps.mirror(expected)
+
+    result = transform_image(rgb, rotation_angle, is_mirror)
+
+    assert np.array_equal(result, np.asarray(expected))
+    assert np.shares_memory(result, rgb)
+
+
+def test_transform_image_rotates_other_angles_with_pillow():
+    """Ensure that an angle that is not a multiple of 90 degrees is rotated by Pillow with an enlarged canvas."""
+    rgb = np.full((40, 70), 200, dtype=np.uint16)
+
+    result = transform_image(rgb, 30, True)
+
+    expected = ImageOps.mirror(Image.fromarray(rgb).rotate(30, expand=True))
+    assert np.array_equal(result, np.asarray(expected))
+
+
+def test_gamma_lut():
+    """Ensure that the lookup table keeps the end points, brightens for gamma above 1 and is cached."""
+    lut = gamma_lut(2.2)
+
+    assert lut.dtype == np.uint8 and lut.shape == (256,)
+    assert lut[0] == 0 and lut[255] == 255
+    assert lut[64] == round(255 * (64 / 255) ** (1 / 2.2))
+    assert gamma_lut(2.2) is lut
+    assert gamma_lut(2.2, 16).shape == (65536,)
+    with pytest.raises(ValueError):
+        gamma_lut(0.0)
+
+
+def test_apply_gamma_leaves_unit_gamma_alone():
+    """Ensure that a gamma of 1 or None returns the array without mapping it."""
+    rgb = np.arange(256, dtype=np.uint8).reshape(16, 16)
+
+    assert apply_gamma(rgb, 1.0) is rgb
+    assert apply_gamma(rgb, None) is rgb
+    assert np.array_equal(apply_gamma(rgb, 2.2), gamma_lut(2.2)[rgb])
+
+
+@pytest.mark.parametrize("image_type, brightened", [(3, True), (2, False)])
+def test_fallback_decode_applies_gamma(source_image, image_type, brightened):
+    """Ensure that images decoded by Pillow get the gamma like RAW images, except cephalostat images."""
+    linear = decode_image(source_image, image_type, 1.0)
+
+    result = decode_image(source_image, image_type, 2.2)
+
+    assert np.array_equal(result, gamma_lut(2.2)[linear]) == brightened
+    assert np.array_equal(result, linear) != brightened
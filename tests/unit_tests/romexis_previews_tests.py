@@ -0,0 +1,105 @@
+"""
+Unit tests for the Romexis image previews.
+
+rawpy can not decode the synthetic source images, so the previews are
+decoded with the Pillow fallback, which uses draft mode for JPEG files.
+"""
+
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+from mbu_dev_shared_components.romexis.helper_functions import decode_image
+from mbu_dev_shared_components.romexis.previews import create_preview, preview_filename
+
+
+def _save_source(path, width, height, image_format):
+    path.parent.mkdir(exist_ok=True)
+    pixels = (np.arange(width * height).reshape(height, width) % 256).astype(np.uint8)
+    Image.fromarray(pixels).convert("RGB").save(path, format=image_format)
+    return str(path)
+
+
+@pytest.fixture
+def source_image(tmp_path):
+    """
+    Fixture to provide a 800x400 source image.
+    """
+    return _save_source(tmp_path / "source" / "1234.img", 800, 400, "PNG")
+
+
+def _preview(source_path, cache_dir, **kwargs):
+    arguments = {"image_id": "1234", "patient_id": "0101011234", "patient_name": "Test Person",
+                 "optaget_dato": "01-01-2025", "image_type": 3, "gamma_value": 1.0, "max_size": 200}
+    arguments.update(kwargs)
+    return create_preview(source_path, cache_dir, **arguments)
+
+
+def test_preview_fits_in_max_size(source_image, tmp_path):
+    """Ensure that the preview is scaled to max_size, keeping the aspect ratio, with the label bar below."""
+    path = _preview(source_image, str(tmp_path / "cache"))
+
+    assert os.path.basename(path) == preview_filename("1234", 1.0, 0, False, 200, label="0101011234 : Test Person\n01-01-2025")
+    with Image.open(path) as image:
+        assert image.format == "JPEG"
+        assert image.width == 200
+        assert 100 < image.height < 200
+
+
+def test_rotated_preview_fits_in_max_size(source_image, tmp_path):
+    """Ensure that a rotation that enlarges the image does not make the preview larger than max_size."""
+    path = _preview(source_image, str(tmp_path / "cache"), rotation_angle=45)
+
+    with Image.open(path) as image:
+        assert image.width <= 200
+
+
+def test_cached_preview_is_reused(source_image, tmp_path):
+    """Ensure that a cached preview is returned without decoding the source again."""
+    cache_dir = str(tmp_path / "cache")
+    first = _preview(source_image, cache_dir)
+    os.remove(source_image)
+
+    assert _preview(source_image, cache_dir) == first
+    assert os.listdir(cache_dir) == [os.path.basename(first)]
+
+
+def test_changed_parameters_create_a_new_preview(source_image, tmp_path):
+    """Ensure that the gamma, rotation, mirroring, label text and font are part of the cache key."""
+    cache_dir = str(tmp_path / "cache")
+
+    paths = {
+        _preview(source_image, cache_dir),
+        _preview(source_image, cache_dir, gamma_value=2.2),
+        _preview(source_image, cache_dir, rotation_angle=90),
+        _preview(source_image, cache_dir, is_mirror=True),
+        _preview(source_image, cache_dir, patient_name="Other Name"),
+        _preview(source_image, cache_dir, optaget_dato="02-01-2025"),
+        _preview(source_image, cache_dir, font_path="DejaVuSans.ttf"),
+    }
+
+    assert len(paths) == 7
+    assert sorted(os.listdir(cache_dir)) == sorted(os.path.basename(path) for path in paths)
+
+
+def test_image_without_gamma_uses_default_gamma(source_image, tmp_path):
+    """Ensure that an image without a gamma operation, with gamma_value None, is previewed with the default gamma."""
+    cache_dir = str(tmp_path / "cache")
+
+    assert _preview(source_image, cache_dir, gamma_value=None) == _preview(source_image, cache_dir, gamma_value=1.0)
+
+
+def test_jpeg_is_decoded_at_reduced_resolution(tmp_path):
+    """Ensure that a JPEG source is decoded in draft mode, at a scale that still covers max_size."""
+    source = _save_source(tmp_path / "source" / "photo.jpg", 1600, 1200, "JPEG")
+
+    rgb = decode_image(source, 4, 1.0, max_size=200)
+
+    assert rgb.shape == (150, 200, 3)
+
+
+def test_invalid_max_size(source_image, tmp_path):
+    """Ensure that a preview size below one pixel is rejected."""
+    with pytest.raises(ValueError):
+        _preview(source_image, str(tmp_path / "cache"), max_size=0)
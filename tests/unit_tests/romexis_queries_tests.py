@@ -0,0 +1,104 @@
+"""
+Unit tests for the set-based Romexis queries, run against the local Romexis fixture database.
+
+The results of the bulk queries are compared with the same data looked up
+one patient and one image at a time, as RomexisDbHandler did before.
+"""
+
+import pytest
+from mbu_dev_shared_components.romexis.queries import image_metadata_query, latest_gamma_query, persons_query
+from mbu_dev_shared_components.utils.query_builder import chunks
+from tests.fixtures.romexis_fixture_db import external_id_for, populate
+from tests.fixtures.solteq_fixture_db import connect
+
+PATIENTS = 60
+
+
+@pytest.fixture(scope="module")
+def romexis_connection():
+    """
+    Fixture to provide an in-memory Romexis fixture database.
+    """
+    connection = connect(":memory:")
+    # pylint: disable=protected-access
+    populate(connection._connection, patients=PATIENTS, seed=2)
+    return connection
+
+
+def _rows(connection, query, params):
+    cursor = connection.cursor().execute(query, params)
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _expected_images(connection, external_id):
+    """Looks up the exportable images and their latest gamma of one patient, one image at a time."""
+    images = _rows(connection, """
+        SELECT rii.image_id, rii.image_date, rii.image_time FROM RIM_Image_Info rii
+        JOIN RRM_Person rp ON rp.person_id = rii.patient_id
+        WHERE rp.external_id = ? AND rii.image_type IN (1, 2, 3, 4) AND rii.status != 5
+    """, [external_id])
+
+    expected = {}
+    for image in images:
+        operations = _rows(connection, """
+            SELECT operation_id FROM RIM_Image_Operation WHERE image_id = ? AND status = 1
+            ORDER BY updated_date DESC, updated_time DESC
+        """, [image["image_id"]])
+        gamma = None
+        if operations:
+            params = _rows(connection, "SELECT param_value FROM RIM_Image_Op_Param WHERE operation_id = ? AND param_type = 3",
+                           [operations[0]["operation_id"]])
+            gamma = params[0]["param_value"] if params else None
+        expected[image["image_id"]] = gamma
+    return expected
+
+
+def test_image_metadata_query_matches_per_image_lookups(romexis_connection):
+    """Ensure that the bulk query returns the same images and latest gamma values as per image lookups."""
+    external_ids = [external_id_for(person_id) for person_id in range(1, PATIENTS + 1)]
+
+    rows = []
+    for chunk in chunks(external_ids, 7):
+        rows += _rows(romexis_connection, image_metadata_query(len(chunk)), chunk)
+
+    for external_id in external_ids:
+        images = [row for row in rows if row["external_id"] == external_id]
+        assert {row["image_id"]: row["gamma_value"] for row in images} == _expected_images(romexis_connection, external_id)
+        assert [(row["image_date"], row["image_time"]) for row in images] == sorted((row["image_date"], row["image_time"]) for row in images)
+        assert all(row["file_path"].endswith(f"{row['image_id']}.img") for row in images)
+
+
+def test_latest_gamma_query_matches_single_image_query(romexis_connection):
+    """Ensure that the bulk gamma query returns one row per image, equal to the single image query."""
+    image_ids = [image_id for (image_id,) in romexis_connection.cursor().execute("SELECT image_id FROM RIM_Image_Info").fetchall()]
+
+    bulk = {}
+    for chunk in chunks(image_ids, 50):
+        for row in _rows(romexis_connection, latest_gamma_query(len(chunk)), chunk):
+            assert row["image_id"] not in bulk
+            bulk[row["image_id"]] = row
+
+    assert bulk
+    for image_id in image_ids:
+        single = _rows(romexis_connection, latest_gamma_query(1), [image_id])
+        assert single == ([bulk[image_id]] if image_id in bulk else [])
+
+
+def test_persons_query(romexis_connection):
+    """Ensure that the persons query returns the requested persons only."""
+    persons = _rows(romexis_connection, persons_query(3), [external_id_for(1), external_id_for(2), "unknown"])
+
+    assert sorted(person["external_id"] for person in persons) == [external_id_for(1), external_id_for(2)]
+
+
+def test_queries_need_values():
+    """Ensure that a query for no values is rejected instead of generating "IN ()"."""
+    with pytest.raises(ValueError):
+        persons_query(0)
+
+
+def test_chunks():
+    """Ensure that chunks keeps the order and the size limit."""
+    assert list(chunks(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert not list(chunks([], 2))
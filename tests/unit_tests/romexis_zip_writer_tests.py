@@ -0,0 +1,123 @@
+"""
+Unit tests for the parallel ZIP writer used by romexis.zip_folder_contents.
+"""
+
+import io
+import os
+import zipfile
+
+import numpy as np
+import pytest
+from mbu_dev_shared_components.romexis.helper_functions import zip_folder_contents
+from mbu_dev_shared_components.romexis import zip_writer
+from mbu_dev_shared_components.romexis.zip_writer import folder_entries, write_zip
+
+
+class StreamOnly(io.RawIOBase):
+    """A write-only, non-seekable stream, like a pipe or a streaming upload."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+
+@pytest.fixture
+def export_folder(tmp_path):
+    """
+    Fixture to provide a folder with TIFF and JPEG files, an empty file and a subfolder.
+    """
+    folder = tmp_path / "export"
+    (folder / "sub").mkdir(parents=True)
+    rng = np.random.default_rng(0)
+    contents = {
+        "a.tiff": bytes(rng.integers(0, 8, size=300_000, dtype=np.uint8)),
+        "b.jpg": bytes(rng.integers(0, 256, size=50_000, dtype=np.uint8)),
+        "c.tiff": b"",
+        "sub/d.tiff": b"tiff" * 10_000,
+    }
+    for name, data in contents.items():
+        (folder / name).write_bytes(data)
+    return str(folder), contents
+
+
+def _read(archive):
+    with zipfile.ZipFile(archive) as zipf:
+        assert zipf.testzip() is None
+        return {info.filename: (zipf.read(info), info.compress_type) for info in zipf.infolist()}
+
+
+def test_folder_is_zipped_in_parallel(export_folder, tmp_path):
+    """Ensure that all files round trip, TIFF files are deflated and JPEG files are stored."""
+    folder, contents = export_folder
+    archive = str(tmp_path / "export.zip")
+
+    zip_folder_contents(folder, archive, max_workers=3)
+    entries = _read(archive)
+
+    assert list(entries) == ["a.tiff", "b.jpg", "c.tiff"]
+    assert {name: data for name, (data, _) in entries.items()} == {name: contents[name] for name in entries}
+    assert entries["a.tiff"][1] == zipfile.ZIP_DEFLATED
+    assert entries["b.jpg"][1] == zipfile.ZIP_STORED
+    assert os.path.getsize(archive) < len(contents["a.tiff"])
+
+
+def test_recursive_zip_to_non_seekable_stream(export_folder):
+    """Ensure that an archive streamed to a non-seekable destination is valid and includes subfolders."""
+    folder, contents = export_folder
+    stream = StreamOnly()
+
+    write_zip(folder_entries(folder, recursive=True), stream, compresslevel=1, max_workers=2, max_in_flight=1)
+    entries = _read(io.BytesIO(b"".join(stream.chunks)))
+
+    assert sorted(entries) == sorted(contents)
+    assert all(entries[name][0] == data for name, data in contents.items())
+
+
+def test_archive_inside_the_folder_is_not_zipped_into_itself(export_folder):
+    """Ensure that writing the archive into the zipped folder does not add the archive to itself."""
+    folder, _ = export_folder
+    archive = os.path.join(folder, "export.zip")
+    open(archive, "wb").close()
+
+    zip_folder_contents(folder, archive)
+
+    assert "export.zip" not in _read(archive)
+
+
+def test_zip64_records_and_spilled_spools(export_folder, tmp_path, monkeypatch):
+    """
+    Ensure that entries and archives past the ZIP64 limits, lowered here, get ZIP64 records zipfile can read,
+    and that entries larger than the spool are written from its temporary file.
+    """
+    folder, contents = export_folder
+    monkeypatch.setattr(zip_writer, "_ZIP64_LIMIT", 1000)
+    monkeypatch.setattr(zip_writer, "_ZIP64_ENTRY_LIMIT", 2)
+    monkeypatch.setattr(zip_writer, "SPOOL_SIZE", 1024)
+    archive = str(tmp_path / "export.zip")
+
+    write_zip(folder_entries(folder, recursive=True), archive, max_workers=2)
+    entries = _read(archive)
+
+    assert sorted(entries) == sorted(contents)
+    assert all(entries[name][0] == data for name, data in contents.items())
+    with open(archive, "rb") as file:
+        assert b"PK\x06\x06" in file.read()
+
+
+def test_non_ascii_names_and_empty_archive(tmp_path):
+    """Ensure that names outside ASCII are stored as UTF-8, and an archive without entries is valid."""
+    source = tmp_path / "Røntgen æøå.tiff"
+    source.write_bytes(b"tiff" * 100)
+    archive, empty = str(tmp_path / "names.zip"), str(tmp_path / "empty.zip")
+
+    write_zip([(str(source), source.name)], archive)
+    write_zip([], empty)
+
+    assert list(_read(archive)) == ["Røntgen æøå.tiff"]
+    assert _read(empty) == {}
@@ -0,0 +1,66 @@
+"""
+Unit tests for RowRecord, the compact alternative to dict rows in query results.
+"""
+
+import json
+import pickle
+
+import pytest
+from mbu_dev_shared_components.utils.row_records import record_class, rows_to_records
+
+
+COLUMNS = ["patientId", "cpr", "name"]
+
+
+def test_records_support_key_attribute_and_mapping_access():
+    """Ensure that a record can be used like the dict row it replaces."""
+    record = rows_to_records(COLUMNS, [(1, "0101011234", "Tandklinik")])[0]
+
+    assert record["cpr"] == "0101011234"
+    assert record.cpr == "0101011234"
+    assert record.get("missing", "default") == "default"
+    assert "name" in record
+    assert list(record) == COLUMNS
+    assert record == {"patientId": 1, "cpr": "0101011234", "name": "Tandklinik"}
+    assert json.dumps(record.to_dict())
+
+
+def test_records_of_the_same_query_share_a_class():
+    """Ensure that the record class is generated once per column layout."""
+    records = rows_to_records(COLUMNS, [(1, "a", "x"), (2, "b", "y")])
+
+    assert type(records[0]) is type(records[1]) is record_class(tuple(COLUMNS))
+    assert not hasattr(records[0], "__dict__")
+
+
+def test_unknown_column_raises():
+    """Ensure that unknown keys and attributes raise like dict and object access does."""
+    record = rows_to_records(COLUMNS, [(1, "a", "x")])[0]
+
+    with pytest.raises(KeyError):
+        _ = record["missing"]
+    with pytest.raises(AttributeError):
+        _ = record.missing
+
+
+def test_copy_and_assignment_do_not_share_values():
+    """Ensure that assigning to a copied record leaves the original untouched."""
+    original = rows_to_records(COLUMNS, [(1, "a", "x")])[0]
+    copied = original.copy()
+    copied["name"] = "changed"
+
+    assert original["name"] == "x"
+    assert copied.name == "changed"
+
+
+def test_records_can_be_pickled():
+    """Ensure that records survive pickling, as used by a persisted QueryCache."""
+    record = rows_to_records(COLUMNS, [(1, "a", "x")])[0]
+
+    assert pickle.loads(pickle.dumps(record)) == record
+
+
+def test_duplicate_columns_raise():
+    """Ensure that ambiguous column layouts are rejected."""
+    with pytest.raises(ValueError):
+        record_class(("cpr", "cpr"))
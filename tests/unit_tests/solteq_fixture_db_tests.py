@@ -0,0 +1,235 @@
+"""
+Unit tests for the local Solteq Tand fixture database and its T-SQL shim.
+
+The base queries of the SolteqTandDatabase getters are read from the source of
+db_handler.py and run against a small generated fixture, so changes to the
+queries or the schema that break the load testing setup are caught on Linux.
+Methods combining several queries are tested on SolteqTandDatabase itself,
+imported with its Windows-only dependencies mocked.
+"""
+
+import datetime
+import sys
+from unittest import mock
+
+import pytest
+from mbu_dev_shared_components.utils.incremental_sync import IncrementalSync
+from mbu_dev_shared_components.utils.query_builder import build_sql_statement
+from mbu_dev_shared_components.utils.query_cache import QueryCache
+from mbu_dev_shared_components.utils.query_diagnostics import QueryDiagnostics
+from tests.fixtures.solteq_fixture_db import FixtureSize, connect, cpr_for, getter_base_queries, populate, translate_tsql
+
+# Getters whose base query joins PATIENT as p, and so can be filtered by CPR
+PATIENT_GETTERS = [
+    "get_list_of_documents",
+    "get_list_of_extern_dentist",
+    "get_list_of_bookings",
+    "get_list_of_events",
+    "get_list_of_primary_dental_clinics",
+    "get_list_of_journal_notes",
+]
+
+
+@pytest.fixture(scope="module")
+def fixture_connection():
+    """
+    Fixture to provide an in-memory fixture database with 200 patients.
+    """
+    connection = connect(":memory:")
+    # pylint: disable=protected-access
+    populate(connection._connection, FixtureSize(patients=200), seed=1)
+    return connection
+
+
+@pytest.fixture(scope="module")
+def fixture_database_class(fixture_connection):
+    """
+    Fixture to provide a SolteqTandDatabase subclass connected to the fixture database.
+
+    The GUI and ODBC dependencies of the solteqtand package are replaced by mocks while it is imported.
+    """
+    stubs = {name: mock.MagicMock() for name in ("uiautomation", "psutil", "docx2pdf", "pyodbc")}
+    with mock.patch.dict(sys.modules, stubs):
+        # pylint: disable=import-outside-toplevel
+        from mbu_dev_shared_components.solteqtand.database.db_handler import SolteqTandDatabase
+
+    class FixtureSolteqTandDatabase(SolteqTandDatabase):
+        """SolteqTandDatabase querying the fixture database."""
+
+        def _connect(self):
+            return fixture_connection
+
+    return FixtureSolteqTandDatabase
+
+
+def test_populate_is_deterministic():
+    """Ensure that the same seed generates the same row counts."""
+    first, second = connect(), connect()
+    # pylint: disable=protected-access
+    assert populate(first._connection, FixtureSize(patients=50), seed=3) == populate(second._connection, FixtureSize(patients=50), seed=3)
+
+
+@pytest.mark.parametrize("getter", PATIENT_GETTERS)
+def test_patient_getter_queries_run_against_fixture(fixture_connection, getter):
+    """Ensure that every patient getter query runs through the shim and returns the patient's rows."""
+    queries = getter_base_queries()
+    cpr = cpr_for(7)
+    query, params = build_sql_statement(queries[getter], filters={"p.cpr": cpr})
+
+    cursor = fixture_connection.cursor().execute(query, params)
+    columns = [column[0] for column in cursor.description]
+    rows = cursor.fetchall()
+
+    assert columns
+    if "cpr" in columns:
+        assert all(row[columns.index("cpr")] == cpr for row in rows)
+
+
+def test_documents_query_uses_tsql_functions_and_datetimes(fixture_connection):
+    """Ensure that CONCAT/SUBSTRING behave like T-SQL and DATETIME columns come back as datetimes."""
+    query, params = build_sql_statement(getter_base_queries()["get_list_of_documents"], filters={"ds.rn": 1}, order_by="ds.DocumentId")
+
+    cursor = fixture_connection.cursor().execute(query, params)
+    columns = [column[0] for column in cursor.description]
+    row = dict(zip(columns, cursor.fetchone()))
+
+    assert row["fileSourcePath"] == "\\\\srvapptmt02\\WebDav\\" + row["UniqueFilename"][:2] + "\\" + row["UniqueFilename"]
+    assert isinstance(row["DocumentCreatedDate"], datetime.datetime)
+
+
+def test_reference_queries_and_datetime_parameters(fixture_connection):
+    """Ensure that reference queries run and datetime parameters compare correctly."""
+    queries = getter_base_queries()
+    clinics = fixture_connection.cursor().execute(queries["get_list_of_clinics"], []).fetchall()
+    assert len(clinics) == FixtureSize().clinics
+
+    query, params = build_sql_statement(queries["get_list_of_events"], filters={"e.[timestamp]": (">=", datetime.datetime(2024, 1, 1))})
+    cursor = fixture_connection.cursor().execute(query, params)
+    timestamp_index = [column[0] for column in cursor.description].index("timestamp")
+    assert all(row[timestamp_index] >= datetime.datetime(2024, 1, 1) for row in cursor.fetchall())
+
+
+def test_batches_return_result_sets_in_order(fixture_connection):
+    """Ensure that a multi statement batch can be read with nextset, with parameters split per statement."""
+    cursor = fixture_connection.cursor().execute(
+        "SELECT cpr FROM [tmtdata_prod].[dbo].[PATIENT] WHERE patientId = ?; SELECT COUNT(*) FROM CLINIC WHERE name LIKE ?;",
+        [3, "Tandklinik%"],
+    )
+
+    assert cursor.fetchall() == [(cpr_for(3),)]
+    assert cursor.nextset()
+    assert cursor.fetchone() == (FixtureSize().clinics,)
+    assert not cursor.nextset()
+
+
+# Getter and ordering of each section of a patient snapshot
+SNAPSHOT_GETTERS = {
+    "primary_dental_clinics": ("get_list_of_primary_dental_clinics", None),
+    "extern_dentist": ("get_list_of_extern_dentist", None),
+    "bookings": ("get_list_of_bookings", "b.StartTime"),
+    "events": ("get_list_of_events", "e.[timestamp]"),
+}
+
+
+@pytest.mark.parametrize("row_type", ["dict", "record"])
+def test_patient_snapshot_matches_the_getters(fixture_database_class, row_type, monkeypatch):
+    """
+    Ensure that get_patient_snapshot groups the rows of its batches by CPR number and section,
+    with the same rows as the getters, when the CPR numbers are split over several batches.
+    """
+    # Two CPR numbers per batch, so the five patients take three batches
+    monkeypatch.setitem(fixture_database_class.get_patient_snapshot.__globals__, "MAX_QUERY_PARAMETERS", 8)
+    database = fixture_database_class("fixture", query_cache=QueryCache(), row_type=row_type)
+    cprs = [cpr_for(patient_id) for patient_id in range(5, 10)]
+
+    snapshots = database.get_patient_snapshot(cprs + [cprs[0]])
+
+    assert list(snapshots) == cprs
+    for cpr in cprs:
+        for section, (getter, order_by) in SNAPSHOT_GETTERS.items():
+            assert snapshots[cpr][section] == getattr(database, getter)(filters={"p.cpr": cpr}, order_by=order_by)
+    assert any(snapshots[cpr]["bookings"] for cpr in cprs)
+    assert any(snapshots[cpr]["events"] for cpr in cprs)
+    if row_type == "record":
+        assert snapshots[cprs[0]]["primary_dental_clinics"][0].cpr == cprs[0]
+
+
+def test_patient_snapshot_of_single_and_unknown_cpr(fixture_database_class):
+    """Ensure that a single CPR number returns its snapshot, and an unknown CPR number empty sections."""
+    database = fixture_database_class("fixture", query_cache=QueryCache())
+
+    snapshot = database.get_patient_snapshot(cpr_for(5))
+    snapshots = database.get_patient_snapshot([cpr_for(5), "0000000000"])
+
+    assert snapshot == snapshots[cpr_for(5)]
+    assert snapshot["primary_dental_clinics"][0]["cpr"] == cpr_for(5)
+    assert snapshots["0000000000"] == {section: [] for section in SNAPSHOT_GETTERS}
+
+
+def test_diagnostics_are_labelled_with_the_getter(fixture_database_class):
+    """Ensure that every query is labelled with the getter that ran it, also when it is served through the cache."""
+    diagnostics = QueryDiagnostics(capture_statistics=False)
+    database = fixture_database_class("fixture", query_cache=QueryCache(), diagnostics=diagnostics)
+
+    database.get_list_of_clinics()
+    database.get_list_of_events(filters={"p.cpr": cpr_for(7)})
+    database.get_patient_snapshot(cpr_for(7))
+
+    assert [trace.label for trace in diagnostics.traces] == ["get_list_of_clinics", "get_list_of_events", "get_patient_snapshot"]
+
+
+# Incremental getter: the getter it reads with, its ordering, and the table, id and timestamp column of its rows
+INCREMENTAL_GETTERS = {
+    "get_new_events": ("get_list_of_events", "e.[timestamp]", "EVENT", "eventId", "timestamp"),
+    "get_new_bookings": ("get_list_of_bookings", "b.LastModifiedDateTime", "BOOKING", "BookingID", "LastModifiedDateTime"),
+}
+
+
+@pytest.mark.parametrize("getter", INCREMENTAL_GETTERS)
+def test_incremental_getters_skip_rows_reread_in_the_overlap(fixture_database_class, tmp_path, getter):
+    """
+    Ensure that a second run re-reads the overlap window before the watermark, but only returns
+    the row added after the watermark and the row committed late inside the window.
+    """
+    list_getter, order_by, table, id_column, timestamp_column = INCREMENTAL_GETTERS[getter]
+    connection = connect(":memory:")
+    # pylint: disable=protected-access
+    populate(connection._connection, FixtureSize(patients=30), seed=5)
+
+    class SyncDatabase(fixture_database_class):
+        """The fixture database class on a database of its own, as the test adds rows."""
+
+        def _connect(self):
+            return connection
+
+    database = SyncDatabase("fixture", query_cache=QueryCache())
+    sync = IncrementalSync(str(tmp_path / "sync.json"), overlap=datetime.timedelta(minutes=10))
+    list_rows, queried = getattr(database, list_getter), []
+    setattr(database, list_getter, lambda *args, **kwargs: queried.append(list_rows(*args, **kwargs)) or queried[-1])
+
+    first = getattr(database, getter)(sync, "all")
+
+    assert first == list_rows(order_by=order_by)
+    assert {row["cpr"] for row in first} <= {cpr_for(patient_id) for patient_id in range(1, 31)}
+
+    # Copies of the first row: one after the watermark, and one committed late inside the overlap window
+    watermark = max(row[timestamp_column] for row in first)
+    columns = [column[1] for column in connection._connection.execute(f"PRAGMA table_info({table})") if column[1] != id_column]
+    for minutes in (1, -5):
+        connection._connection.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(columns)} FROM {table} WHERE {id_column} = 1")
+        connection._connection.execute(f"UPDATE {table} SET {timestamp_column} = ? WHERE {id_column} = last_insert_rowid()",
+                                       (watermark + datetime.timedelta(minutes=minutes),))
+    connection.commit()
+
+    second = getattr(database, getter)(sync, "all")
+
+    assert [row[timestamp_column] for row in second] == [watermark - datetime.timedelta(minutes=5), watermark + datetime.timedelta(minutes=1)]
+    # The rows read again in the overlap window were returned by the first run, and are suppressed
+    assert len(queried[1]) > len(second)
+    assert min(row[timestamp_column] for row in queried[1]) >= watermark - datetime.timedelta(minutes=10)
+
+
+def test_translate_tsql_strips_database_names():
+    """Ensure that three part names are reduced to table names."""
+    assert translate_tsql("FROM [tmtdata_prod].[dbo].[PATIENT] p JOIN [Romexis_db].[dbo].[RRM_Person]") == "FROM [PATIENT] p JOIN [RRM_Person]"